@@ -12,6 +12,9 @@ DROP TABLE IF EXISTS notificacao CASCADE;
 DROP TABLE IF EXISTS municipio CASCADE;
 DROP TABLE IF EXISTS estado CASCADE;
 DROP TABLE IF EXISTS log_carga CASCADE;
+DROP TABLE IF EXISTS rollup_casos_diario CASCADE;
+DROP TABLE IF EXISTS rollup_sintomas_diario CASCADE;
+DROP TABLE IF EXISTS status_classificacao CASCADE;
 CREATE TABLE IF NOT EXISTS estado (
     estado_ibge INTEGER PRIMARY KEY, 
     nome VARCHAR(100),
@@ -32,9 +35,13 @@ CREATE TABLE IF NOT EXISTS notificacao (
     municipio_notificacao_ibge INTEGER REFERENCES municipio(municipio_ibge),
     estado_notificacao_ibge INTEGER REFERENCES estado(estado_ibge),
     excluido BOOLEAN DEFAULT FALSE,
-    validado BOOLEAN DEFAULT FALSE
+    validado BOOLEAN DEFAULT FALSE,
+    hash_registro BIGINT -- hash da linha normalizada, usado pela carga incremental
 );
 
+-- Chave natural da carga incremental (não é UNIQUE: exportações antigas podem repetir source_id)
+CREATE INDEX IF NOT EXISTS idx_notificacao_source_id ON notificacao (source_id);
+
 -- 3. Tabelas Satélites (1:1 com Notificação)
 
 CREATE TABLE IF NOT EXISTS dados_demograficos (
@@ -130,7 +137,16 @@ CREATE TABLE IF NOT EXISTS log_carga (
     id SERIAL PRIMARY KEY,
     data_execucao TIMESTAMP DEFAULT NOW(),
     registros_processados INTEGER,
-    mensagem TEXT
+    mensagem TEXT,
+    -- Linhas de etapa (instrumentação do ETL): apontam para a linha-resumo da execução
+    execucao_id INTEGER REFERENCES log_carga(id) ON DELETE CASCADE,
+    etapa VARCHAR(100),
+    chamadas INTEGER,
+    duracao_s DOUBLE PRECISION,
+    cpu_s DOUBLE PRECISION,
+    pico_memoria_mb DOUBLE PRECISION,
+    linhas_entrada BIGINT,
+    linhas_saida BIGINT
 );
 
 --Etapa 3 pra baixo
@@ -190,27 +206,164 @@ CREATE TABLE IF NOT EXISTS indicadores_regionais (
     UNIQUE(municipio_ibge, periodo_inicio, periodo_fim)
 );
 
+-- 5. Rollups diários (município × classificação × dose × sintoma), mantidos pela carga com fx_atualizar_rollups
+--    e lidos pelas views, pelas funções e pelo painel no lugar de varrer notificacao + dados_clinicos
+
+-- Cada valor distinto de classificacao_final é classificado uma vez, na carga, em vez de ILIKE por linha em cada consulta
+CREATE TABLE IF NOT EXISTS status_classificacao (
+    status_id SERIAL PRIMARY KEY,
+    classificacao_final VARCHAR(150) UNIQUE NULLS NOT DISTINCT,
+    status VARCHAR(20),        -- regra do painel: Confirmado, Descartado, Suspeito ou Em Análise
+    is_confirmado BOOLEAN,     -- ILIKE '%Confirmado%'
+    is_laboratorial BOOLEAN,   -- ILIKE '%Laboratorial%'
+    is_descartado BOOLEAN,     -- ILIKE '%Descartado%'
+    is_suspeito BOOLEAN        -- ILIKE '%Suspeito%' ou sem classificação
+);
+
+-- status_id NULL = notificação sem dados_clinicos; max_dose NULL = sem vacina aplicada
+CREATE TABLE IF NOT EXISTS rollup_casos_diario (
+    data_notificacao DATE,
+    municipio_ibge INTEGER,
+    status_id INTEGER,
+    max_dose SMALLINT,
+    is_obito BOOLEAN,
+    total INTEGER NOT NULL,
+    soma_dias_ate_notificacao BIGINT,  -- data_notificacao - data_inicio_sintomas, só quando >= 0
+    n_dias_ate_notificacao INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_casos_data ON rollup_casos_diario (data_notificacao);
+
+CREATE TABLE IF NOT EXISTS rollup_sintomas_diario (
+    data_notificacao DATE,
+    municipio_ibge INTEGER,
+    status_id INTEGER,
+    max_dose SMALLINT,
+    sintoma_id INTEGER,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_sintomas_data ON rollup_sintomas_diario (data_notificacao);
+
+-- Recalcula os rollups dos dias em p_datas (NULL no array = notificações sem data); sem p_datas, recalcula tudo
+CREATE OR REPLACE FUNCTION fx_atualizar_rollups(p_datas DATE[] DEFAULT NULL)
+RETURNS VOID AS $$
+DECLARE
+    v_sem_classificacao INTEGER;
+BEGIN
+    -- Notificações dos dias recalculados, com estatísticas próprias: poucos dias => junções pelos índices, não varreduras
+    IF to_regclass('pg_temp.rollup_alvo') IS NOT NULL THEN DROP TABLE pg_temp.rollup_alvo; END IF;
+    CREATE TEMP TABLE rollup_alvo ON COMMIT DROP AS
+    SELECT n.notificacao_id, n.data_notificacao, n.municipio_notificacao_ibge
+    FROM notificacao n
+    WHERE (p_datas IS NULL OR n.data_notificacao = ANY(p_datas) OR (n.data_notificacao IS NULL AND array_position(p_datas, NULL) IS NOT NULL));
+    ANALYZE rollup_alvo;
+
+    INSERT INTO status_classificacao (classificacao_final, status, is_confirmado, is_laboratorial, is_descartado, is_suspeito)
+    SELECT 
+        c,
+        CASE
+            WHEN lower(c) LIKE '%confirmado%' OR lower(c) LIKE '%laboratorial%' THEN 'Confirmado'
+            WHEN lower(c) LIKE '%descartado%' THEN 'Descartado'
+            WHEN lower(c) LIKE '%cura%' THEN 'Confirmado'
+            WHEN lower(c) LIKE '%sindrome%' OR lower(c) LIKE '%suspeito%' THEN 'Suspeito'
+            ELSE 'Em Análise'
+        END,
+        COALESCE(c ILIKE '%Confirmado%', FALSE),
+        COALESCE(c ILIKE '%Laboratorial%', FALSE),
+        COALESCE(c ILIKE '%Descartado%', FALSE),
+        COALESCE(c ILIKE '%Suspeito%', TRUE)
+    FROM (
+        SELECT DISTINCT dc.classificacao_final AS c
+        FROM rollup_alvo n
+        JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
+        UNION SELECT NULL
+    ) d
+    ON CONFLICT (classificacao_final) DO NOTHING;
+
+    SELECT status_id INTO v_sem_classificacao FROM status_classificacao WHERE classificacao_final IS NULL;
+
+    IF p_datas IS NULL THEN
+        TRUNCATE rollup_casos_diario, rollup_sintomas_diario;
+    ELSE
+        DELETE FROM rollup_casos_diario n WHERE (p_datas IS NULL OR n.data_notificacao = ANY(p_datas) OR (n.data_notificacao IS NULL AND array_position(p_datas, NULL) IS NOT NULL));
+        DELETE FROM rollup_sintomas_diario n WHERE (p_datas IS NULL OR n.data_notificacao = ANY(p_datas) OR (n.data_notificacao IS NULL AND array_position(p_datas, NULL) IS NOT NULL));
+    END IF;
+
+    INSERT INTO rollup_casos_diario (data_notificacao, municipio_ibge, status_id, max_dose, is_obito, total,
+                                     soma_dias_ate_notificacao, n_dias_ate_notificacao)
+    SELECT 
+        n.data_notificacao,
+        n.municipio_notificacao_ibge,
+        CASE WHEN dc.notificacao_id IS NULL THEN NULL ELSE COALESCE(sc.status_id, v_sem_classificacao) END,
+        v.max_dose,
+        COALESCE(dc.evolucao_caso = 'Obito', FALSE),
+        COUNT(*),
+        SUM(n.data_notificacao - dc.data_inicio_sintomas) FILTER (WHERE n.data_notificacao >= dc.data_inicio_sintomas),
+        COUNT(*) FILTER (WHERE n.data_notificacao >= dc.data_inicio_sintomas)
+    FROM rollup_alvo n
+    LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
+    LEFT JOIN status_classificacao sc ON dc.classificacao_final = sc.classificacao_final
+    LEFT JOIN (
+        SELECT va.notificacao_id, MAX(va.dose_numero) as max_dose 
+        FROM vacina_aplicada va
+        JOIN rollup_alvo a ON va.notificacao_id = a.notificacao_id
+        GROUP BY va.notificacao_id
+    ) v ON n.notificacao_id = v.notificacao_id
+    GROUP BY 1, 2, 3, 4, 5;
+
+    INSERT INTO rollup_sintomas_diario (data_notificacao, municipio_ibge, status_id, max_dose, sintoma_id, total)
+    SELECT 
+        n.data_notificacao,
+        n.municipio_notificacao_ibge,
+        CASE WHEN dc.notificacao_id IS NULL THEN NULL ELSE COALESCE(sc.status_id, v_sem_classificacao) END,
+        v.max_dose,
+        ns.sintoma_id,
+        COUNT(*)
+    FROM notificacao_sintoma ns
+    JOIN rollup_alvo n ON ns.notificacao_id = n.notificacao_id
+    LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
+    LEFT JOIN status_classificacao sc ON dc.classificacao_final = sc.classificacao_final
+    LEFT JOIN (
+        SELECT va.notificacao_id, MAX(va.dose_numero) as max_dose 
+        FROM vacina_aplicada va
+        JOIN rollup_alvo a ON va.notificacao_id = a.notificacao_id
+        GROUP BY va.notificacao_id
+    ) v ON n.notificacao_id = v.notificacao_id
+    GROUP BY 1, 2, 3, 4, 5;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 6. Índices de acesso (além das PKs): período e município do painel e da atualização incremental dos rollups,
+--    MAX(dose_numero) por notificação, regravação das dependentes na carga incremental e o lado N das pontes
+--    notificacao não é particionada por mês: a chave de partição teria de entrar na PK (e a data pode faltar), e as FKs
+--    das satélites e o upsert incremental dependem de notificacao_id ser único sozinho
+CREATE INDEX IF NOT EXISTS idx_notificacao_data ON notificacao (data_notificacao, municipio_notificacao_ibge) INCLUDE (notificacao_id);
+CREATE INDEX IF NOT EXISTS idx_notificacao_municipio ON notificacao (municipio_notificacao_ibge);
+CREATE INDEX IF NOT EXISTS idx_teste_laboratorial_notificacao ON teste_laboratorial (notificacao_id);
+CREATE INDEX IF NOT EXISTS idx_vacina_aplicada_notificacao ON vacina_aplicada (notificacao_id, dose_numero);
+CREATE INDEX IF NOT EXISTS idx_notificacao_sintoma_sintoma ON notificacao_sintoma (sintoma_id);
+CREATE INDEX IF NOT EXISTS idx_notificacao_condicao_condicao ON notificacao_condicao (condicao_id);
+
 -- Calcular Taxa de Positividade
 CREATE OR REPLACE FUNCTION fx_calcular_taxa_positividade(p_inicio DATE, p_fim DATE)
 RETURNS VOID AS $$
 BEGIN
     INSERT INTO indicadores_regionais (municipio_ibge, periodo_inicio, periodo_fim, total_testes, total_positivos, taxa_positividade)
     SELECT 
-        n.municipio_notificacao_ibge,
+        r.municipio_ibge,
         p_inicio,
         p_fim,
-        COUNT(*) as total_casos,
-        SUM(CASE WHEN dc.classificacao_final ILIKE '%Confirmado%' OR dc.classificacao_final ILIKE '%Laboratorial%' THEN 1 ELSE 0 END) as total_positivos,
+        SUM(r.total) as total_casos,
+        SUM(CASE WHEN sc.is_confirmado OR sc.is_laboratorial THEN r.total ELSE 0 END) as total_positivos,
         CASE 
-            WHEN COUNT(*) > 0 THEN 
-                ROUND((SUM(CASE WHEN dc.classificacao_final ILIKE '%Confirmado%' OR dc.classificacao_final ILIKE '%Laboratorial%' THEN 1 ELSE 0 END)::DECIMAL / COUNT(*)) * 100, 2)
+            WHEN SUM(r.total) > 0 THEN 
+                ROUND((SUM(CASE WHEN sc.is_confirmado OR sc.is_laboratorial THEN r.total ELSE 0 END)::DECIMAL / SUM(r.total)) * 100, 2)
             ELSE 0 
         END as taxa
-    FROM notificacao n
-    JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
-    WHERE n.data_notificacao BETWEEN p_inicio AND p_fim
-      AND n.municipio_notificacao_ibge IS NOT NULL
-    GROUP BY n.municipio_notificacao_ibge
+    FROM rollup_casos_diario r
+    JOIN status_classificacao sc ON r.status_id = sc.status_id
+    WHERE r.data_notificacao BETWEEN p_inicio AND p_fim
+      AND r.municipio_ibge IS NOT NULL
+    GROUP BY r.municipio_ibge
     
     ON CONFLICT (municipio_ibge, periodo_inicio, periodo_fim) 
     DO UPDATE SET 
@@ -230,64 +383,59 @@ BEGIN
     RETURN QUERY
     SELECT 
         m.nome,
-        CAST(AVG(n.data_notificacao - dc.data_inicio_sintomas) AS INT)
-    FROM notificacao n
-    JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
-    JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
-    WHERE dc.data_inicio_sintomas IS NOT NULL 
-      AND n.data_notificacao >= dc.data_inicio_sintomas
-    GROUP BY m.nome;
+        CAST(SUM(r.soma_dias_ate_notificacao)::DECIMAL / SUM(r.n_dias_ate_notificacao) AS INT)
+    FROM rollup_casos_diario r
+    JOIN municipio m ON r.municipio_ibge = m.municipio_ibge
+    WHERE r.status_id IS NOT NULL
+    GROUP BY m.nome
+    HAVING SUM(r.n_dias_ate_notificacao) > 0;
 END;
 $$ LANGUAGE plpgsql;
 
 -- Casos por Município e Data
 CREATE OR REPLACE VIEW vw_casos_por_municipio AS
 SELECT 
-    n.data_notificacao,
+    r.data_notificacao,
     m.nome as municipio_nome,
     m.municipio_ibge,
-    COUNT(*) as total_notificacoes,
-    SUM(CASE WHEN dc.classificacao_final ILIKE '%Confirmado%' THEN 1 ELSE 0 END) as confirmados,
-    SUM(CASE WHEN dc.classificacao_final ILIKE '%Descartado%' THEN 1 ELSE 0 END) as descartados,
-    SUM(CASE WHEN dc.classificacao_final ILIKE '%Suspeito%' OR dc.classificacao_final IS NULL THEN 1 ELSE 0 END) as suspeitos
-FROM notificacao n
-LEFT JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
-LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
-GROUP BY n.data_notificacao, m.nome, m.municipio_ibge;
+    SUM(r.total) as total_notificacoes,
+    SUM(CASE WHEN sc.is_confirmado THEN r.total ELSE 0 END) as confirmados,
+    SUM(CASE WHEN sc.is_descartado THEN r.total ELSE 0 END) as descartados,
+    SUM(CASE WHEN sc.is_suspeito OR r.status_id IS NULL THEN r.total ELSE 0 END) as suspeitos
+FROM rollup_casos_diario r
+LEFT JOIN municipio m ON r.municipio_ibge = m.municipio_ibge
+LEFT JOIN status_classificacao sc ON r.status_id = sc.status_id
+GROUP BY r.data_notificacao, m.nome, m.municipio_ibge;
 
 -- Vacinação x Resultado (Cruza status vacinal com resultado clínico)
 CREATE OR REPLACE VIEW vw_vacinacao_por_resultado AS
 SELECT 
-    COALESCE(v.max_dose, 0) || ' Doses' as status_vacinal,
+    COALESCE(r.max_dose, 0) || ' Doses' as status_vacinal,
     CASE 
-        WHEN dc.classificacao_final ILIKE '%Confirmado%' THEN 'Positivo'
-        WHEN dc.classificacao_final ILIKE '%Descartado%' THEN 'Negativo'
+        WHEN sc.is_confirmado THEN 'Positivo'
+        WHEN sc.is_descartado THEN 'Negativo'
         ELSE 'Suspeito/Outros'
     END as resultado_teste,
-    COUNT(*) as quantidade
-FROM notificacao n
-LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
-LEFT JOIN (
-    SELECT notificacao_id, MAX(dose_numero) as max_dose 
-    FROM vacina_aplicada 
-    GROUP BY notificacao_id
-) v ON n.notificacao_id = v.notificacao_id
+    SUM(r.total) as quantidade
+FROM rollup_casos_diario r
+LEFT JOIN status_classificacao sc ON r.status_id = sc.status_id
 GROUP BY 1, 2;
 
 -- Sintomas Mais Frequentes 
 CREATE OR REPLACE VIEW vw_sintomas_frequentes AS
 SELECT 
     s.nome as sintoma,
-    COUNT(*) as ocorrencias
-FROM notificacao_sintoma ns
-JOIN sintoma s ON ns.sintoma_id = s.sintoma_id
-JOIN dados_clinicos dc ON ns.notificacao_id = dc.notificacao_id
-WHERE dc.classificacao_final ILIKE '%Confirmado%'
+    SUM(r.total) as ocorrencias
+FROM rollup_sintomas_diario r
+JOIN sintoma s ON r.sintoma_id = s.sintoma_id
+JOIN status_classificacao sc ON r.status_id = sc.status_id
+WHERE sc.is_confirmado
 GROUP BY s.nome
 ORDER BY ocorrencias DESC;
 
 
 --Testes pra ver c ta funcionando
+SELECT fx_atualizar_rollups();
 SELECT fx_calcular_taxa_positividade('2020-01-01', '2025-12-31');
 SELECT * FROM indicadores_regionais ORDER BY taxa_positividade DESC;
 
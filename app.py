@@ -1,10 +1,16 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
 import numpy as np
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from consultas import (ConsultasBanco, ConsultasMemoria, CacheEmDisco, criar_engine_painel, estado_pool, executar_em_paralelo,
+                       tabela_latencias, versao_do_banco, versao_do_estagio)
+from instrumentacao import Instrumentacao
+from modelo_risco import PASTA_MODELOS, ultimo_artefato, carregar_artefato, pontuar
 
 
 st.set_page_config(page_title="Dashboard COVID-19 (Final)", layout="wide")
@@ -15,94 +21,88 @@ DB_HOST = "localhost"
 DB_PORT = "5432"
 DB_NAME = "Deus Me Ajude"
 
-@st.cache_data(ttl=0)
-def load_data():
-    engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-    
-    query = """
-    SELECT 
-        n.notificacao_id,
-        n.data_notificacao,
-        COALESCE(m.nome, 'Município Desconhecido') as municipio,
-        n.municipio_notificacao_ibge,
-        dc.classificacao_final,
-        dc.evolucao_caso,
-        dd.idade,
-        dd.sexo,
-        dd.raca_cor,
-        dd.cbo,
-        v.dose_numero as vacina_dose
-    FROM notificacao n
-    LEFT JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
-    LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
-    LEFT JOIN dados_demograficos dd ON n.notificacao_id = dd.notificacao_id
-    LEFT JOIN (
-        SELECT notificacao_id, MAX(dose_numero) as dose_numero 
-        FROM vacina_aplicada 
-        GROUP BY notificacao_id
-    ) v ON n.notificacao_id = v.notificacao_id
-    """
-    
-    df = pd.read_sql(query, engine)
-    
-
-    df['data_notificacao'] = pd.to_datetime(df['data_notificacao'], errors='coerce').fillna(pd.Timestamp('2020-01-01'))
-    
-    def definir_status(x):
-        x = str(x).lower()
-        if 'confirmado' in x or 'laboratorial' in x: return 'Confirmado'
-        if 'descartado' in x: return 'Descartado'
-        if 'cura' in x: return 'Confirmado'
-        if 'sindrome' in x or 'suspeito' in x: return 'Suspeito'
-        return 'Em Análise'
-
-    df['status'] = df['classificacao_final'].apply(definir_status)
-    df['vacina_status'] = df['vacina_dose'].fillna(0).astype(int).astype(str) + " Doses"
-    
-    df['idade'] = pd.to_numeric(df['idade'], errors='coerce').fillna(0)
-    df['sexo'] = df['sexo'].fillna('Indefinido')
-    df['raca_cor'] = df['raca_cor'].fillna('Não Informado')
-    
- 
-    df['cbo'] = df['cbo'].fillna('Não Informado').astype(str)
- 
-    df['cbo_curto'] = df['cbo'].apply(lambda x: x[:30] + '...' if len(x) > 30 else x)
-    
-    return df
+# FONTE DOS DADOS: "banco" (agregações feitas no PostgreSQL) ou "estagio" (Parquet gravado pelo ETL com --gravar-estagio, funciona offline)
+FONTE_DADOS = os.environ.get("FONTE_DADOS", "banco")
+PASTA_ESTAGIO = os.path.join("csv_final", "estagio")
+
+# CACHE EM DISCO: resultados por versão dos dados, reaproveitados entre reinícios; a versão é reconsultada a cada INTERVALO_VERSAO_S
+PASTA_CACHE = "cache_painel"
+INTERVALO_VERSAO_S = 60
+URL_COORDENADAS = "https://raw.githubusercontent.com/kelvins/municipios-brasileiros/main/csv/municipios.csv"
+ARQUIVO_COORDENADAS = os.path.join(PASTA_CACHE, "coordenadas_municipios.csv")
+
+# Uma engine (e um pool de conexões) por processo do servidor, dividida por todas as sessões do painel
+@st.cache_resource
+def get_engine():
+    return criar_engine_painel(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+# Latência de cada consulta e espera por conexão, acumuladas no processo do servidor (sobrevivem à troca de versão)
+@st.cache_resource
+def get_medicoes():
+    return Instrumentacao()
+
+@st.cache_resource
+def get_cache():
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    return CacheEmDisco(PASTA_CACHE)
+
+@st.cache_data(ttl=INTERVALO_VERSAO_S)
+def data_version():
+    if FONTE_DADOS == "estagio":
+        return versao_do_estagio(PASTA_ESTAGIO)
+    return versao_do_banco(get_engine())
+
+# Uma fonte por versão: um estágio regravado é relido, e a versão anterior sai da memória
+@st.cache_resource(max_entries=1)
+def get_source(versao):
+    if FONTE_DADOS == "estagio":
+        return ConsultasMemoria.do_estagio(PASTA_ESTAGIO, get_medicoes())
+    return ConsultasBanco(get_engine(), get_medicoes())
 
 @st.cache_data
-def load_test_data():
-    engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-    query = "SELECT tipo_teste, fabricante_teste, resultado_teste FROM teste_laboratorial"
-    df = pd.read_sql(query, engine)
-    
-    df['tipo_teste'] = df['tipo_teste'].fillna('Outros')
-    
-    df['fabricante_teste'] = df['fabricante_teste'].fillna('Não Informado').astype(str).str.upper()
- 
-    df['fabricante_curto'] = df['fabricante_teste'].apply(lambda x: x[:25] + '...' if len(x) > 25 else x)
-    
-    def check_positivo(res):
-        res = str(res).lower()
-        if 'reagente' in res and 'não' not in res: return 1
-        if 'positivo' in res: return 1
-        if 'detectavel' in res and 'não' not in res: return 1
-        return 0
-        
-    df['is_positivo'] = df['resultado_teste'].apply(check_positivo)
-    return df
+def _consultar(versao, nome, *args):
+    # A fonte só é acionada quando o disco não tem o resultado desta versão
+    return get_cache().obter(versao, nome, args, lambda: get_source(versao).executar(nome, *args))
+
+# Cada widget pede só o seu agregado (por nome do método da fonte + filtros)
+def query(nome, *args):
+    return _consultar(data_version(), nome, *args)
+
+def pre_carregar(versao, pedidos, extras=None):
+    """Roda juntas as consultas (nome, args) desta renderização que ainda não estão no cache em disco, mais as
+    tarefas de extras; cada uma usa a sua conexão do pool.
+
+    Os widgets depois só leem o disco: o início frio custa a consulta mais lenta, não a soma delas.
+    """
+    cache = get_cache()
+    faltando = [(nome, args) for nome, args in pedidos if not cache.contem(versao, nome, args)]
+    if not faltando and not extras: return
+    fonte = get_source(versao) if faltando else None
+    tarefas = {(nome, args): partial(cache.obter, versao, nome, args, partial(fonte.executar, nome, *args)) for nome, args in faltando}
+    executar_em_paralelo({**tarefas, **(extras or {})})
+
+def baixar_coordenadas():
+    # Baixa uma vez e guarda localmente: os próximos inícios não dependem da rede
+    if os.path.exists(ARQUIVO_COORDENADAS): return
+    colunas = ['codigo_ibge', 'latitude', 'longitude']
+    df = pd.read_csv(URL_COORDENADAS, usecols=colunas)[colunas]
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    temporario = f"{ARQUIVO_COORDENADAS}.{os.getpid()}.tmp"
+    df.to_csv(temporario, index=False)
+    os.replace(temporario, ARQUIVO_COORDENADAS)
 
 @st.cache_data
 def load_coordinates():
-    url = "https://raw.githubusercontent.com/kelvins/municipios-brasileiros/main/csv/municipios.csv"
-    return pd.read_csv(url, usecols=['codigo_ibge', 'latitude', 'longitude'])
+    baixar_coordenadas()
+    return pd.read_csv(ARQUIVO_COORDENADAS)
 
 try:
     with st.spinner('Carregando dados...'):
-        df = load_data()
-        df_testes = load_test_data()
-        df_geo = load_coordinates()
-        df = df.merge(df_geo, left_on='municipio_notificacao_ibge', right_on='codigo_ibge', how='left')
+        versao = data_version()
+        # O download das coordenadas não segura mais o resumo: os dois saem juntos
+        pre_carregar(versao, [('resumo', ())], None if os.path.exists(ARQUIVO_COORDENADAS) else {'coordenadas': baixar_coordenadas})
+        resumo = query('resumo')
+        load_coordinates()
 except Exception as e:
     st.error(f"Erro: {e}")
     st.stop()
@@ -111,167 +111,253 @@ except Exception as e:
 # FILTROS
 
 st.sidebar.header("Filtros")
-st.sidebar.success(f"Registros: {len(df):,}")
+st.sidebar.success(f"Registros: {resumo['total']:,}")
 
-min_d = df['data_notificacao'].min()
-max_d = df['data_notificacao'].max()
+min_d = resumo['data_min']
+max_d = resumo['data_max']
 start_date, end_date = st.sidebar.date_input("Período", [min_d, max_d])
 
-municipios = sorted([str(x) for x in df['municipio'].unique()])
+municipios = resumo['municipios']
 cidade_selecionada = st.sidebar.multiselect("Municípios", municipios)
 
-df_filtered = df[
-    (df['data_notificacao'].dt.date >= start_date) & 
-    (df['data_notificacao'].dt.date <= end_date)
-]
-
-if cidade_selecionada:
-    df_filtered = df_filtered[df_filtered['municipio'].isin(cidade_selecionada)]
+filtros = (start_date, end_date, tuple(cidade_selecionada))
 
 
 st.title("📊 Painel COVID-19 (PA)")
 
 c1, c2, c3, c4 = st.columns(4)
-total = len(df_filtered)
-conf = len(df_filtered[df_filtered['status'] == 'Confirmado'])
-obit = len(df_filtered[df_filtered['evolucao_caso'] == 'Obito'])
-desc = len(df_filtered[df_filtered['status'] == 'Descartado'])
+st.markdown("---")
+
+
+# ABAS PREGUIÇOSAS: só a aba aberta roda; cada gráfico é cacheado por (versão dos dados, filtros)
+t1, t2, t3, t4 = st.tabs(["🌎 Mapa/Tempo", "👥 Perfil/Ocupação", "💉 Laboratório", "🤖 IA"], key="aba", on_change="rerun")
+tempos = {}
+
+# Os KPIs e os agregados da aba aberta são pedidos de uma vez, antes de qualquer widget esperar pelo seu
+pedidos = [('kpis', filtros)]
+if t1.open:
+    mapa = 'casos_por_municipio_mes' if st.session_state.get("mapa_mensal") else 'casos_por_municipio'
+    pedidos += [(mapa, filtros), ('casos_por_mes', filtros)]
+if t2.open: pedidos += [(nome, filtros) for nome in ['por_sexo', 'por_raca_cor', 'por_idade', 'top_cbo']]
+if t3.open: pedidos += [('vacinacao', filtros), ('testes_por_fabricante', ())]
+with st.spinner('Consultando...'):
+    pre_carregar(versao, pedidos)
+
+kpis = query('kpis', *filtros)
+total = kpis['total']
+conf = kpis['confirmados']
+obit = kpis['obitos']
+desc = kpis['descartados']
 
 c1.metric("Total", f"{total:,}".replace(",", "."))
 c2.metric("Confirmados", f"{conf:,}".replace(",", "."), delta_color="inverse")
 c3.metric("Óbitos", f"{obit:,}".replace(",", "."), delta_color="inverse")
 c4.metric("Descartados", f"{desc:,}".replace(",", "."))
 
-st.markdown("---")
+@contextmanager
+def cronometro(nome):
+    inicio = time.perf_counter()
+    yield
+    tempos[nome] = time.perf_counter() - inicio
+
+# MAPA: resolução -> (tamanho da célula da grade em graus, raio do kernel em px); None = um ponto por município
+NIVEIS_MAPA = {"Municípios": (None, 13), "Grade 1°": (1.0, 40), "Grade 0,5°": (0.5, 22), "Grade 0,25°": (0.25, 12)}
 
+def agregar_em_grade(df, tamanho, chaves):
+    # Cada município cai numa célula; a célula vai para o centro dela com a soma dos casos
+    df = df.assign(latitude=(np.floor(df['latitude'] / tamanho) + 0.5) * tamanho,
+                   longitude=(np.floor(df['longitude'] / tamanho) + 0.5) * tamanho)
+    return df.groupby(chaves + ['latitude', 'longitude'], as_index=False)['casos'].sum()
 
-t1, t2, t3, t4 = st.tabs(["🌎 Mapa/Tempo", "👥 Perfil/Ocupação", "💉 Laboratório", "🤖 IA"])
+@st.cache_data(max_entries=64)
+def ladrilhos_mapa(versao, filtros, mensal):
+    """Casos por município (e mês) com coordenadas, já agregados em todos os níveis de NIVEIS_MAPA.
+
+    O que vai para o navegador cresce com o número de municípios/células, não de notificações.
+    """
+    if mensal:
+        df = _consultar(versao, 'casos_por_municipio_mes', *filtros)
+        df['mes'] = df['mes'].dt.strftime('%Y-%m')
+    else:
+        df = _consultar(versao, 'casos_por_municipio', *filtros)
+    df = df.merge(load_coordinates(), left_on='municipio_notificacao_ibge', right_on='codigo_ibge', how='inner').dropna(subset=['latitude'])
+    chaves = ['mes'] if mensal else []
+    return {nivel: df[chaves + ['latitude', 'longitude', 'casos']] if tamanho is None else agregar_em_grade(df, tamanho, chaves)
+            for nivel, (tamanho, _) in NIVEIS_MAPA.items()}
+
+@st.cache_data(max_entries=64)
+def fig_mapa(versao, filtros, nivel, mensal):
+    df_mapa = ladrilhos_mapa(versao, filtros, mensal)[nivel]
+    if df_mapa.empty: return None
+    return px.density_mapbox(df_mapa, lat='latitude', lon='longitude', z='casos', radius=NIVEIS_MAPA[nivel][1],
+                             animation_frame='mes' if mensal else None,
+                             center=dict(lat=-3.5, lon=-52), zoom=5,
+                             mapbox_style="carto-positron", height=500)
+
+@st.cache_data(max_entries=64)
+def fig_linha(versao, filtros):
+    df_chart = _consultar(versao, 'casos_por_mes', *filtros)
+    return px.line(df_chart, x='data_notificacao', y='Casos', color='status', markers=True, height=500)
+
+@st.cache_data(max_entries=64)
+def fig_sexo(versao, filtros):
+    return px.pie(_consultar(versao, 'por_sexo', *filtros), names='sexo', values='casos', hole=0.4)
+
+@st.cache_data(max_entries=64)
+def fig_raca_cor(versao, filtros):
+    return px.bar(_consultar(versao, 'por_raca_cor', *filtros), x='raca_cor', y='count')
+
+@st.cache_data(max_entries=64)
+def fig_idade(versao, filtros):
+    return px.histogram(_consultar(versao, 'por_idade', *filtros), x='idade', y='casos', color='status', nbins=20, histfunc='sum')
+
+@st.cache_data(max_entries=64)
+def fig_ocupacao(versao, filtros):
+    # Ocupações vêm truncadas em 30 caracteres para o gráfico não quebrar
+    top_cbo = _consultar(versao, 'top_cbo', *filtros)
+    if top_cbo.empty: return None
+    return px.bar(top_cbo, y='Ocupação', x='Casos', orientation='h')
+
+@st.cache_data(max_entries=64)
+def fig_vacinacao(versao, filtros):
+    df_vac = _consultar(versao, 'vacinacao', *filtros)
+    df_vac = pd.crosstab(df_vac['vacina_status'], df_vac['status'], values=df_vac['casos'], aggfunc='sum', normalize='index') * 100
+    df_vac_long = df_vac.reset_index().melt(id_vars='vacina_status')
+    return px.bar(df_vac_long, x='vacina_status', y='value', color='status')
+
+@st.cache_data(max_entries=4)
+def fig_fabricantes(versao):
+    df_fab = _consultar(versao, 'testes_por_fabricante').copy()
+    if df_fab.empty: return None
+
+    df_fab['Total'] = pd.to_numeric(df_fab['Total'], errors='coerce').fillna(0)
+    df_fab['Positivos'] = pd.to_numeric(df_fab['Positivos'], errors='coerce').fillna(0)
+    
+    df_fab['Taxa'] = 0.0
+    mask = df_fab['Total'] > 0
+    df_fab.loc[mask, 'Taxa'] = (df_fab.loc[mask, 'Positivos'] / df_fab.loc[mask, 'Total'] * 100)
+    
+    df_fab['Positividade (%)'] = df_fab['Taxa'].round(1)
+    
+    df_fab = df_fab.sort_values('Total', ascending=False).head(10)
+    
+    return px.bar(df_fab, x='fabricante_curto', y='Total', 
+                  color='Positividade (%)', 
+                  title="Volume e Positividade")
+
+# O modelo é treinado fora do painel (python modelo_risco.py, depois do ETL): aqui só se carrega o último artefato
+@st.cache_resource(max_entries=1)
+def get_modelo(caminho):
+    return carregar_artefato(caminho)
 
 # TEMPO E MAPA
-with t1:
-    col_map, col_line = st.columns([1, 1])
-    with col_map:
-        st.subheader("Mapa de Calor")
-        if not df_filtered.empty and 'latitude' in df_filtered.columns:
-            fig_map = px.density_mapbox(df_filtered.dropna(subset=['latitude']), 
-                                        lat='latitude', lon='longitude', radius=13,
-                                        center=dict(lat=-3.5, lon=-52), zoom=5,
-                                        mapbox_style="carto-positron", height=500)
-            st.plotly_chart(fig_map, use_container_width=True)
-        else:
-            st.warning("Sem dados GPS.")
-
-    with col_line:
-        st.subheader("Linha do Tempo")
-        df_chart = df_filtered.groupby([pd.Grouper(key='data_notificacao', freq='ME'), 'status']).size().reset_index(name='Casos')
-        fig_line = px.line(df_chart, x='data_notificacao', y='Casos', color='status', markers=True, height=500)
-        st.plotly_chart(fig_line, use_container_width=True)
+if t1.open:
+    with t1:
+        col_map, col_line = st.columns([1, 1])
+        with col_map, cronometro("Mapa de Calor"):
+            st.subheader("Mapa de Calor")
+            c_nivel, c_mensal = st.columns([3, 1])
+            nivel = c_nivel.radio("Resolução", list(NIVEIS_MAPA), horizontal=True, label_visibility="collapsed")
+            mensal = c_mensal.toggle("Por mês", key="mapa_mensal")
+            fig_map = fig_mapa(versao, filtros, nivel, mensal)
+            if fig_map is not None:
+                st.plotly_chart(fig_map, use_container_width=True)
+            else:
+                st.warning("Sem dados GPS.")
+
+        with col_line, cronometro("Linha do Tempo"):
+            st.subheader("Linha do Tempo")
+            st.plotly_chart(fig_linha(versao, filtros), use_container_width=True)
 
 # TAB 2: DEMOGRÁFICO E OCUPAÇÃO
-with t2:
-    r1c1, r1c2 = st.columns(2)
-    with r1c1:
-        st.subheader("Sexo")
-        st.plotly_chart(px.pie(df_filtered, names='sexo', hole=0.4), use_container_width=True)
-    with r1c2:
-        st.subheader("Raça/Cor")
-        st.plotly_chart(px.bar(df_filtered['raca_cor'].value_counts().reset_index(), x='raca_cor', y='count'), use_container_width=True)
-    
-    r2c1, r2c2 = st.columns(2)
-    with r2c1:
-        st.subheader("Idade")
-        st.plotly_chart(px.histogram(df_filtered, x='idade', color='status', nbins=20), use_container_width=True)
-    with r2c2:
-        st.subheader("Top 10 Ocupações")
-        # Usa a coluna truncada 'cbo_curto' para o gráfico não quebrar
-        df_cbo = df_filtered[~df_filtered['cbo'].isin(['Não Informado', 'None', 'nan'])]
-        if not df_cbo.empty:
-            top_cbo = df_cbo['cbo_curto'].value_counts().head(10).reset_index()
-            top_cbo.columns = ['Ocupação', 'Casos']
-            st.plotly_chart(px.bar(top_cbo, y='Ocupação', x='Casos', orientation='h'), use_container_width=True)
-        else:
-            st.info("Sem dados de ocupação.")
+if t2.open:
+    with t2:
+        r1c1, r1c2 = st.columns(2)
+        with r1c1, cronometro("Sexo"):
+            st.subheader("Sexo")
+            st.plotly_chart(fig_sexo(versao, filtros), use_container_width=True)
+        with r1c2, cronometro("Raça/Cor"):
+            st.subheader("Raça/Cor")
+            st.plotly_chart(fig_raca_cor(versao, filtros), use_container_width=True)
+        
+        r2c1, r2c2 = st.columns(2)
+        with r2c1, cronometro("Idade"):
+            st.subheader("Idade")
+            st.plotly_chart(fig_idade(versao, filtros), use_container_width=True)
+        with r2c2, cronometro("Top 10 Ocupações"):
+            st.subheader("Top 10 Ocupações")
+            fig_cbo = fig_ocupacao(versao, filtros)
+            if fig_cbo is not None:
+                st.plotly_chart(fig_cbo, use_container_width=True)
+            else:
+                st.info("Sem dados de ocupação.")
 
 # TAB 3: TESTES
-with t3:
-    c_vac, c_test = st.columns([1, 1])
-    
-    with c_vac:
-        st.subheader("Vacinação")
-        df_vac = pd.crosstab(df_filtered['vacina_status'], df_filtered['status'], normalize='index') * 100
-        df_vac_long = df_vac.reset_index().melt(id_vars='vacina_status')
-        st.plotly_chart(px.bar(df_vac_long, x='vacina_status', y='value', color='status'), use_container_width=True)
-
-    with c_test:
-        st.subheader("Laboratório")
+if t3.open:
+    with t3:
+        c_vac, c_test = st.columns([1, 1])
         
-        st.write("**Fabricantes (Top 10)**")
-        if not df_testes.empty:
-            
-            df_fab = df_testes.groupby('fabricante_curto').agg(
-                Total=('is_positivo', 'count'),
-                Positivos=('is_positivo', 'sum')
-            ).reset_index()
-            
+        with c_vac, cronometro("Vacinação"):
+            st.subheader("Vacinação")
+            st.plotly_chart(fig_vacinacao(versao, filtros), use_container_width=True)
 
-            df_fab['Total'] = pd.to_numeric(df_fab['Total'], errors='coerce').fillna(0)
-            df_fab['Positivos'] = pd.to_numeric(df_fab['Positivos'], errors='coerce').fillna(0)
-            
+        with c_test, cronometro("Laboratório"):
+            st.subheader("Laboratório")
             
-            df_fab['Taxa'] = 0.0
-            mask = df_fab['Total'] > 0
-            df_fab.loc[mask, 'Taxa'] = (df_fab.loc[mask, 'Positivos'] / df_fab.loc[mask, 'Total'] * 100)
-            
-            
-            df_fab['Positividade (%)'] = df_fab['Taxa'].round(1)
-            
-            df_fab = df_fab.sort_values('Total', ascending=False).head(10)
-            
-            fig_combo = px.bar(df_fab, x='fabricante_curto', y='Total', 
-                               color='Positividade (%)', 
-                               title="Volume e Positividade")
-            st.plotly_chart(fig_combo, use_container_width=True)
-        else:
-            st.warning("Sem dados.")
+            st.write("**Fabricantes (Top 10)**")
+            fig_combo = fig_fabricantes(versao)
+            if fig_combo is not None:
+                st.plotly_chart(fig_combo, use_container_width=True)
+            else:
+                st.warning("Sem dados.")
 
 
-with t4:
-    st.subheader("🤖 IA Preditiva")
-    
-    df_ml = df[['idade', 'sexo', 'status']].dropna().copy()
-    df_ml = df_ml[df_ml['status'].isin(['Confirmado', 'Descartado'])]
-    df_ml['target'] = df_ml['status'].apply(lambda x: 1 if x == 'Confirmado' else 0)
-    
-    if len(df_ml) > 100:
-        le_sex = LabelEncoder()
-        df_ml['sex_c'] = le_sex.fit_transform(df_ml['sexo'].astype(str))
-        
-        n_min = min(len(df_ml[df_ml['target']==1]), len(df_ml[df_ml['target']==0]))
+if t4.open:
+    with t4, cronometro("IA Preditiva"):
+        st.subheader("🤖 IA Preditiva")
         
-        if n_min > 10:
-            df_b = pd.concat([
-                df_ml[df_ml['target']==1].sample(n_min, random_state=42),
-                df_ml[df_ml['target']==0].sample(n_min, random_state=42)
-            ])
-            
-            model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)
-            model.fit(df_b[['idade', 'sex_c']], df_b['target'])
-            
+        caminho_modelo = ultimo_artefato(PASTA_MODELOS)
+        if caminho_modelo is not None:
+            modelo = get_modelo(caminho_modelo)
+            vocabulario = modelo['vocabulario']
+            st.caption(f"Modelo de {modelo['treinado_em']} ({modelo['versao_dados']}) | "
+                       f"AUC {modelo['metricas']['auc']:.3f} | acurácia {modelo['metricas']['acuracia']:.3f}")
+
             with st.form("ia"):
-                c1, c2 = st.columns(2)
+                c1, c2, c3 = st.columns(3)
                 i = c1.number_input("Idade", 0, 120, 30)
-                s = c2.selectbox("Sexo", df_ml['sexo'].unique())
+                s = c2.selectbox("Sexo", vocabulario['sexos'])
+                d = c3.number_input("Doses de vacina", 0, 2, 0)
+                sintomas = st.multiselect("Sintomas", vocabulario['sintomas'])
+                condicoes = st.multiselect("Condições", vocabulario['condicoes'])
                 
                 if st.form_submit_button("Calcular"):
                     try:
-                        p = model.predict_proba([[i, le_sex.transform([s])[0]]])[0][1]
+                        p = pontuar(modelo, pd.DataFrame({'idade': [i], 'sexo': [s], 'doses': [d],
+                                                          'sintomas': [";".join(sintomas)], 'condicoes': [";".join(condicoes)]}))[0]
                         st.metric("Risco Positivo", f"{p*100:.1f}%")
-                        st.progress(p)
+                        st.progress(float(p))
                         if p > 0.5: st.error("Alto")
                         else: st.success("Baixo")
                     except: st.error("Erro.")
-        else: st.warning("Balanceamento impossível.")
-    else: st.warning("Dados insuficientes.")
+
+            st.write("**Pontuação em lote**")
+            arquivo = st.file_uploader("CSV com idade, sexo, doses, sintomas e condicoes (listas separadas por ;)", type="csv")
+            if arquivo is not None:
+                df_lote = pd.read_csv(arquivo)
+                df_lote['risco'] = pontuar(modelo, df_lote)
+                st.dataframe(df_lote, hide_index=True)
+                st.download_button("Baixar resultado", df_lote.to_csv(index=False).encode('utf-8'), "risco.csv", "text/csv")
+        else: st.warning("Nenhum modelo treinado: rode `python modelo_risco.py` depois do ETL.")
+
+with st.sidebar.expander("⏱️ Tempos de renderização"):
+    st.dataframe(pd.DataFrame({'Widget': list(tempos), 'ms': [round(t * 1000, 1) for t in tempos.values()]}), hide_index=True)
+
+with st.sidebar.expander("🗄️ Consultas e conexões"):
+    if FONTE_DADOS != "estagio":
+        st.caption("Pool: {tamanho} conexões, {em_uso} em uso, {livres} livres, {extras} extras".format(**estado_pool(get_engine())))
+    st.caption("Consultas que de fato foram à fonte neste servidor (as respondidas pelo cache não entram)")
+    st.dataframe(tabela_latencias(get_medicoes()), hide_index=True)
 
 st.markdown("---")
-st.caption("Projeto Banco de Dados")
\ No newline at end of file
+st.caption("Projeto Banco de Dados")
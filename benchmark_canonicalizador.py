@@ -0,0 +1,113 @@
+import argparse
+import re
+import time
+import unicodedata
+from difflib import get_close_matches
+
+import numpy as np
+import pandas as pd
+
+from etl_datasus import SINTOMAS_VALIDOS, CONDICOES_VALIDAS, DE_PARA_FORCADO, CANON_SINTOMAS, CANON_CONDICOES, preparar_tabelas_dim
+from gerador_datasus import FRAGMENTOS_SINTOMAS, FRAGMENTOS_CONDICOES, SEPARADORES
+
+# PARSER ORIGINAL (linha a linha), mantido aqui como referência de resultado e de tempo
+def identificar_termo_canonico(texto_sujo, lista_valida):
+    if not isinstance(texto_sujo, str): return None
+    limpo = re.sub(r'^[\d\W_]+', '', texto_sujo).strip().replace(";", "").replace('"', '').replace("'", "")
+    if len(limpo) < 3: return None
+    busca = limpo.lower()
+    busca_norm = ''.join(c for c in unicodedata.normalize('NFD', busca) if unicodedata.category(c) != 'Mn')
+
+    termos_bloqueados = ['teste', 'exame', 'covid', 'positivo', 'negativo', 'reagente', 'igg', 'igm', 'saturacao']
+    if any(x in busca_norm for x in termos_bloqueados): return None
+
+    for chave, valor in DE_PARA_FORCADO.items():
+        if chave in busca_norm:
+            if valor is None: return None
+            if valor in lista_valida: return valor
+
+    matches = get_close_matches(limpo.title(), lista_valida, n=1, cutoff=0.75)
+    if matches: return matches[0]
+    return None
+
+def processar_multivalorados(row, col_padrao, col_outros, lista_referencia):
+    items = set()
+    regex_split = r"[;,/|+]|\s+[eE]\s+|\s+-\s+"
+    raw_text_list = []
+    if col_padrao in row and pd.notna(row[col_padrao]): raw_text_list.append(str(row[col_padrao]))
+    if col_outros in row and pd.notna(row[col_outros]): raw_text_list.append(str(row[col_outros]))
+    for texto in raw_text_list:
+        pedacos = re.split(regex_split, texto)
+        for p in pedacos:
+            termo_correto = identificar_termo_canonico(p, lista_referencia)
+            if termo_correto: items.add(termo_correto)
+    return list(items) if items else np.nan
+
+# DADOS SINTÉTICOS (mesmos fragmentos do gerador de exportações)
+
+def gerar_coluna(rng, n, fragmentos, prob_nulo):
+    escolhas = np.array(fragmentos, dtype=object)
+    qtd = rng.integers(1, 4, size=n)
+    valores = []
+    for k in qtd:
+        partes = rng.choice(escolhas, size=k)
+        sep = SEPARADORES[rng.integers(len(SEPARADORES))]
+        valores.append(sep.join(partes))
+    serie = pd.Series(valores, dtype=object)
+    serie[rng.random(n) < prob_nulo] = None
+    return serie
+
+def gerar_dataframe(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "sintomas": gerar_coluna(rng, n, FRAGMENTOS_SINTOMAS, 0.1),
+        "outrosSintomas": gerar_coluna(rng, n, FRAGMENTOS_SINTOMAS, 0.8),
+        "condicoes": gerar_coluna(rng, n, FRAGMENTOS_CONDICOES, 0.6),
+        "outrasCondicoes": gerar_coluna(rng, n, FRAGMENTOS_CONDICOES, 0.9),
+    })
+
+# O QUE O ETL FAZ: códigos inteiros -> dimensão + ponte (notificacao_id = posição da linha + 1)
+def montar_ponte(canonicalizador, df, col_padrao, col_outros, col_id):
+    dim, ponte = preparar_tabelas_dim(canonicalizador.codificar(df, col_padrao, col_outros), {}, col_id)
+    return ponte.merge(dim, on=col_id)[['notificacao_id', 'nome']]
+
+def ponte_de_referencia(listas):
+    # A ponte que sairia das listas do parser original (antes: explode + merge com a dimensão)
+    pares = listas.explode().dropna()
+    return pd.DataFrame({'notificacao_id': pares.index + 1, 'nome': pares.values})
+
+def comparar(ref, novo):
+    def ordenada(ponte): return ponte.astype({'notificacao_id': 'int64', 'nome': str}).sort_values(['notificacao_id', 'nome'], ignore_index=True)
+    ref, novo = ordenada(ref), ordenada(novo)
+    return len(ref) == len(novo) and ref.equals(novo)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do canonicalizador de sintomas/condições")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sem-referencia", action="store_true", help="não roda o parser original (lento)")
+    args = parser.parse_args()
+
+    print(f"--- Gerando {args.linhas} linhas sintéticas ---")
+    df = gerar_dataframe(args.linhas, args.seed)
+
+    t0 = time.perf_counter()
+    sintomas = montar_ponte(CANON_SINTOMAS, df, "sintomas", "outrosSintomas", 'sintoma_id')
+    condicoes = montar_ponte(CANON_CONDICOES, df, "condicoes", "outrasCondicoes", 'condicao_id')
+    t_novo = time.perf_counter() - t0
+    print(f"  Canonicalizador + pontes: {t_novo:.2f}s ({args.linhas / t_novo:,.0f} linhas/s)")
+
+    if args.sem_referencia: return
+
+    t0 = time.perf_counter()
+    ref_sintomas = df.apply(lambda x: processar_multivalorados(x, "sintomas", "outrosSintomas", SINTOMAS_VALIDOS), axis=1)
+    ref_condicoes = df.apply(lambda x: processar_multivalorados(x, "condicoes", "outrasCondicoes", CONDICOES_VALIDAS), axis=1)
+    t_ref = time.perf_counter() - t0
+    print(f"  Parser original: {t_ref:.2f}s ({args.linhas / t_ref:,.0f} linhas/s)")
+    print(f"  Speedup: {t_ref / t_novo:.1f}x")
+
+    iguais = comparar(ponte_de_referencia(ref_sintomas), sintomas) and comparar(ponte_de_referencia(ref_condicoes), condicoes)
+    print(f"  Resultados idênticos: {'SIM' if iguais else 'NÃO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from etl_datasus import (CONN_STRING, ARQUIVO_CSV, CONEXOES_CARGA, TABELAS_CARGA, EstadoGlobalETL, processar_bloco,
+                         carregar_tabelas, limpar_banco)
+from carga import verificar_superusuario, remover_indices_secundarios, recriar_indices, validar_chaves_estrangeiras
+
+def contar_auditoria(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT count(*) FROM log_alteracoes").scalar()
+
+def medir_carga(engine, tabelas, conexoes, em_massa):
+    limpar_banco(engine)
+    auditoria_antes = contar_auditoria(engine)
+    inicio = time.perf_counter()
+    indices = []
+    try:
+        if em_massa:
+            verificar_superusuario(engine)
+            indices = remover_indices_secundarios(engine, TABELAS_CARGA)
+        carregar_tabelas(engine, {n: df.copy() for n, df in tabelas.items()}, conexoes=conexoes, em_massa=em_massa)
+        if em_massa: validar_chaves_estrangeiras(engine, TABELAS_CARGA)
+    finally:
+        if indices: recriar_indices(engine, indices)
+    return time.perf_counter() - inicio, contar_auditoria(engine) - auditoria_antes
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de carga com e sem o modo carga em massa")
+    parser.add_argument("--arquivo", default=ARQUIVO_CSV)
+    parser.add_argument("--conexoes", type=int, default=CONEXOES_CARGA)
+    args = parser.parse_args()
+
+    print("--- Processando CSV (uma vez só) ---")
+    df = pd.read_csv(args.arquivo, sep=",", dtype=str, low_memory=False)
+    tabelas = processar_bloco(df, EstadoGlobalETL())
+    engine = create_engine(CONN_STRING, pool_size=args.conexoes, max_overflow=0)
+
+    resultados = {}
+    for em_massa in (False, True):
+        print(f"\n--- Carga {'em massa' if em_massa else 'normal'} ---")
+        resultados[em_massa] = medir_carga(engine, tabelas, args.conexoes, em_massa)
+
+    print("\n--- RESULTADO ---")
+    for em_massa, (duracao, auditoria) in resultados.items():
+        print(f"  {'Em massa' if em_massa else 'Normal':<10}: {duracao:.2f}s ({auditoria} linhas em log_alteracoes)")
+    print(f"  Ganho: {resultados[False][0] / resultados[True][0]:.1f}x")
+
+if __name__ == "__main__":
+    main()
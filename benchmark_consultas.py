@@ -0,0 +1,233 @@
+import argparse
+import re
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+
+from etl_datasus import CONN_STRING, SINTOMAS_VALIDOS, CONDICOES_VALIDAS, INDICES_ACESSO, limpar_banco, atualizar_rollups
+from consultas import ConsultasBanco
+
+ARQUIVO_RELATORIO = "benchmark_consultas.txt"
+UFS = [11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29, 31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53]
+CLASSIFICACOES = ['Confirmado Laboratorial', 'Confirmado Clínico-Epidemiológico', 'Confirmado Clínico-Imagem',
+                  'Descartado', 'Síndrome Gripal Não Especificada', None]
+EVOLUCOES = ['Cura', 'Obito', 'Ignorado', 'Em tratamento domiciliar', None]
+SEXOS = ['Masculino', 'Feminino', 'Indefinido', None]
+RACAS = ['Branca', 'Parda', 'Preta', 'Amarela', 'Indigena', 'Ignorado', None]
+CBOS = ['2235 - Enfermeiro', '2251 - Médico clínico', '5151 - Agente comunitário de saúde', '3222 - Técnico de enfermagem', None]
+FABRICANTES = ['ABBOTT', 'BIO-MANGUINHOS', 'WAMA', 'ECO DIAGNÓSTICA', None]
+RESULTADOS = ['Reagente', 'Não Reagente', 'Inconclusivo ou Indeterminado', None]
+
+# DADOS SINTÉTICOS: gerados no próprio banco (generate_series + setseed), reprodutíveis pela semente
+SQL_SINTETICO = [
+    """INSERT INTO estado (estado_ibge, nome, sigla)
+       SELECT uf, 'UF ' || uf, NULL FROM unnest(CAST(:ufs AS INTEGER[])) uf""",
+    # municipio_ibge = UF * 100000 + i: a notificação deriva o estado do próprio código
+    """INSERT INTO municipio (municipio_ibge, nome, estado_ibge)
+       SELECT u.uf * 100000 + i, 'Municipio ' || i, u.uf
+       FROM generate_series(1, :municipios) i
+       CROSS JOIN LATERAL (SELECT (CAST(:ufs AS INTEGER[]))[1 + i % cardinality(CAST(:ufs AS INTEGER[]))] AS uf) u""",
+    """INSERT INTO sintoma (sintoma_id, nome) SELECT i, nome FROM unnest(CAST(:sintomas AS TEXT[])) WITH ORDINALITY t(nome, i)""",
+    """INSERT INTO condicao (condicao_id, nome) SELECT i, nome FROM unnest(CAST(:condicoes AS TEXT[])) WITH ORDINALITY t(nome, i)""",
+    # Municípios com cubo de uniforme: poucos concentram a maior parte das notificações, como nas capitais
+    # (o "g * 0" amarra o LATERAL à linha, senão o sorteio roda uma vez só)
+    """INSERT INTO notificacao (notificacao_id, source_id, data_notificacao, municipio_notificacao_ibge, estado_notificacao_ibge)
+       SELECT g, 'sintetico-' || g,
+              CASE WHEN random() < 0.02 THEN NULL ELSE DATE '2020-03-01' + floor(random() * 1035)::int END,
+              u.uf * 100000 + m.i, u.uf
+       FROM generate_series(1, :linhas) g
+       CROSS JOIN LATERAL (SELECT 1 + floor(power(random(), 3) * :municipios)::int + g * 0 AS i) m
+       CROSS JOIN LATERAL (SELECT (CAST(:ufs AS INTEGER[]))[1 + m.i % cardinality(CAST(:ufs AS INTEGER[]))] AS uf) u""",
+    """INSERT INTO dados_clinicos (notificacao_id, data_inicio_sintomas, classificacao_final, evolucao_caso)
+       SELECT n.notificacao_id, n.data_notificacao - floor(random() * 15)::int,
+              (CAST(:classificacoes AS TEXT[]))[1 + floor(random() * cardinality(CAST(:classificacoes AS TEXT[])))::int],
+              (CAST(:evolucoes AS TEXT[]))[1 + floor(random() * cardinality(CAST(:evolucoes AS TEXT[])))::int]
+       FROM notificacao n WHERE random() < 0.97""",
+    """INSERT INTO dados_demograficos (notificacao_id, idade, sexo, raca_cor, cbo)
+       SELECT n.notificacao_id, floor(random() * 100)::int,
+              (CAST(:sexos AS TEXT[]))[1 + floor(random() * cardinality(CAST(:sexos AS TEXT[])))::int],
+              (CAST(:racas AS TEXT[]))[1 + floor(random() * cardinality(CAST(:racas AS TEXT[])))::int],
+              CASE WHEN random() < 0.8 THEN NULL
+                   ELSE (CAST(:cbos AS TEXT[]))[1 + floor(random() * cardinality(CAST(:cbos AS TEXT[])))::int] END
+       FROM notificacao n""",
+    """INSERT INTO vacina_aplicada (notificacao_id, dose_numero, data_aplicacao)
+       SELECT n.notificacao_id, d, DATE '2021-01-18' + floor(random() * 600)::int
+       FROM (SELECT notificacao_id, floor(random() * 3)::int AS doses FROM notificacao) n
+       CROSS JOIN LATERAL generate_series(1, n.doses) d""",
+    """INSERT INTO teste_laboratorial (notificacao_id, numero_sequencial, tipo_teste, fabricante_teste, resultado_teste, data_coleta)
+       SELECT n.notificacao_id, t, 'RT-PCR',
+              (CAST(:fabricantes AS TEXT[]))[1 + floor(random() * cardinality(CAST(:fabricantes AS TEXT[])))::int],
+              (CAST(:resultados AS TEXT[]))[1 + floor(random() * cardinality(CAST(:resultados AS TEXT[])))::int],
+              n.data_notificacao
+       FROM (SELECT notificacao_id, data_notificacao, floor(random() * 3)::int AS testes FROM notificacao) n
+       CROSS JOIN LATERAL generate_series(1, n.testes) t""",
+    """INSERT INTO notificacao_sintoma (notificacao_id, sintoma_id)
+       SELECT DISTINCT n.notificacao_id, 1 + floor(random() * cardinality(CAST(:sintomas AS TEXT[])))::int
+       FROM notificacao n CROSS JOIN generate_series(1, 3) WHERE random() < 0.6""",
+    """INSERT INTO notificacao_condicao (notificacao_id, condicao_id)
+       SELECT DISTINCT n.notificacao_id, 1 + floor(random() * cardinality(CAST(:condicoes AS TEXT[])))::int
+       FROM notificacao n CROSS JOIN generate_series(1, 2) WHERE random() < 0.2""",
+]
+
+def gerar_dados_sinteticos(engine, linhas, municipios, semente):
+    params = {'linhas': linhas, 'municipios': municipios, 'ufs': UFS, 'sintomas': SINTOMAS_VALIDOS,
+              'condicoes': CONDICOES_VALIDAS, 'classificacoes': CLASSIFICACOES, 'evolucoes': EVOLUCOES, 'sexos': SEXOS,
+              'racas': RACAS, 'cbos': CBOS, 'fabricantes': FABRICANTES, 'resultados': RESULTADOS}
+    limpar_banco(engine)
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("SELECT setseed(:semente)"), {'semente': semente})
+        for sql in SQL_SINTETICO:
+            conn.execute(text(sql), {k: v for k, v in params.items() if f":{k}" in sql})
+    print(f"  [TEMPO] {linhas} notificações sintéticas geradas: {time.perf_counter() - inicio:.2f}s")
+    atualizar_rollups(engine)
+
+class ConsultasRegistradas(ConsultasBanco):
+    """ConsultasBanco que só guarda o SQL de cada chamada, para o benchmark rodar com EXPLAIN ANALYZE."""
+
+    def __init__(self):
+        super().__init__(None)
+        self.registradas = []
+
+    def _ler(self, sql, params=None, tipos=None):
+        self.registradas.append((sql, params or {}))
+        raise _Registrada()
+
+class _Registrada(Exception):
+    pass
+
+def consultas_do_painel(inicio, fim, municipios):
+    registro = ConsultasRegistradas()
+    chamadas = [(nome, (inicio, fim, municipios)) for nome in ['kpis', 'casos_por_mes', 'casos_por_municipio', 'por_sexo',
+                                                                 'por_raca_cor', 'por_idade', 'top_cbo', 'vacinacao']]
+    chamadas += [('testes_por_fabricante', ())]
+    for nome, args in chamadas:
+        try: getattr(registro, nome)(*args)
+        except _Registrada: pass
+    return dict(zip((nome for nome, _ in chamadas), registro.registradas))
+
+def montar_consultas(engine):
+    with engine.connect() as conn:
+        datas = [r[0] for r in conn.execute(text(
+            "SELECT DISTINCT data_notificacao FROM notificacao WHERE data_notificacao IS NOT NULL ORDER BY 1"))]
+        municipio = conn.execute(text("""
+            SELECT m.nome FROM notificacao n JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
+            GROUP BY m.nome ORDER BY count(*) DESC LIMIT 1
+        """)).scalar()
+    semana = datas[-7:]
+    consultas = {
+        'vw_casos_por_municipio': ("SELECT * FROM vw_casos_por_municipio", {}),
+        'vw_vacinacao_por_resultado': ("SELECT * FROM vw_vacinacao_por_resultado", {}),
+        'vw_sintomas_frequentes': ("SELECT * FROM vw_sintomas_frequentes", {}),
+        'fx_tempo_medio_atendimento': ("SELECT * FROM fx_tempo_medio_atendimento()", {}),
+        'fx_calcular_taxa_positividade': ("SELECT fx_calcular_taxa_positividade(:inicio, :fim)",
+                                          {'inicio': datas[0], 'fim': datas[-1]}),
+        'fx_atualizar_rollups (tudo)': ("SELECT fx_atualizar_rollups()", {}),
+        'fx_atualizar_rollups (7 dias)': ("SELECT fx_atualizar_rollups(CAST(:datas AS DATE[]))", {'datas': semana}),
+    }
+    # Regravação das dependentes na carga incremental (mil notificações alteradas)
+    for nome in ['teste_laboratorial', 'vacina_aplicada', 'dados_clinicos', 'notificacao_sintoma']:
+        consultas[f"incremental: {nome}"] = (f"""
+            DELETE FROM {nome} d
+            USING (SELECT notificacao_id FROM notificacao ORDER BY notificacao_id DESC LIMIT 1000) s
+            WHERE d.notificacao_id = s.notificacao_id
+        """, {})
+    # O painel (antigo load_data()): período inteiro, e o último mês filtrado pelo município com mais notificações
+    for nome, consulta in consultas_do_painel(datas[0], datas[-1], ()).items():
+        consultas[f"painel: {nome}"] = consulta
+    for nome, consulta in consultas_do_painel(datas[-30], datas[-1], (municipio,)).items():
+        if 'inicio' in consulta[1]: consultas[f"painel filtrado: {nome}"] = consulta
+    return consultas
+
+def ativar_auto_explain(conn):
+    # Planos dos comandos dentro das funções PL/pgSQL; o EXPLAIN de fora só mostra o Function Scan
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("LOAD 'auto_explain'")
+    except Exception:
+        return False
+    conn.exec_driver_sql("SET auto_explain.log_min_duration = 0")
+    conn.exec_driver_sql("SET auto_explain.log_analyze = on")
+    conn.exec_driver_sql("SET auto_explain.log_nested_statements = on")
+    conn.exec_driver_sql("SET client_min_messages = log")
+    return True
+
+def explicar(engine, sql, params, repeticoes):
+    tempos, plano, internos = [], [], []
+    for _ in range(repeticoes):
+        with engine.connect() as conn:
+            # Funções que gravam (rollups, indicadores, DELETE) rodam numa transação desfeita no fim
+            with conn.begin() as transacao:
+                com_auto_explain = ativar_auto_explain(conn)
+                bruto = conn.connection.driver_connection
+                del bruto.notices[:]
+                plano = [r[0] for r in conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params)]
+                internos = [n.strip() for n in bruto.notices if "Query Text" in n] if com_auto_explain else []
+                transacao.rollback()
+        tempos.append(float(re.search(r"Execution Time: ([\d.]+) ms", plano[-1]).group(1)))
+    return statistics.median(tempos), plano, internos
+
+def definir_indices(engine, criar):
+    with engine.begin() as conn:
+        for nome, definicao in INDICES_ACESSO.items():
+            if criar: conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {definicao}"))
+            else: conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM ANALYZE")
+
+def medir(engine, consultas, repeticoes):
+    resultados = {}
+    for nome, (sql, params) in consultas.items():
+        resultados[nome] = explicar(engine, sql, params, repeticoes)
+        print(f"  [TEMPO] {nome:<45}: {resultados[nome][0]:9.1f} ms")
+    return resultados
+
+def gravar_relatorio(caminho, cabecalho, antes, depois):
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("BENCHMARK DAS CONSULTAS (EXPLAIN ANALYZE, mediana em ms)\n\n")
+        f.write(cabecalho + "\n\n")
+        f.write(f"{'consulta':<45} {'sem índices':>12} {'com índices':>12} {'ganho':>7}\n")
+        for nome in antes:
+            a, d = antes[nome][0], depois[nome][0]
+            f.write(f"{nome:<45} {a:12.1f} {d:12.1f} {a / d if d else float('inf'):6.1f}x\n")
+        for fase, resultados in (("SEM ÍNDICES DE ACESSO", antes), ("COM ÍNDICES DE ACESSO", depois)):
+            f.write(f"\n\n=== {fase} ===\n")
+            for nome, (tempo, plano, internos) in resultados.items():
+                f.write(f"\n--- {nome} ({tempo:.1f} ms) ---\n" + "\n".join(plano) + "\n")
+                for interno in internos: f.write("\n" + interno + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE das views, funções e consultas do painel, sem e com os índices de acesso")
+    parser.add_argument("--linhas", type=int, default=200_000, help="notificações sintéticas (apaga os dados do banco)")
+    parser.add_argument("--municipios", type=int, default=500)
+    parser.add_argument("--semente", type=float, default=0.42, help="setseed() do gerador, entre -1 e 1")
+    parser.add_argument("--banco-atual", action="store_true", help="mede sobre os dados já carregados, sem gerar sintéticos")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=ARQUIVO_RELATORIO)
+    args = parser.parse_args()
+
+    engine = create_engine(CONN_STRING)
+    if args.banco_atual:
+        cabecalho = "Dados: banco atual"
+    else:
+        print("--- Gerando dados sintéticos ---")
+        gerar_dados_sinteticos(engine, args.linhas, args.municipios, args.semente)
+        cabecalho = f"Dados: {args.linhas} notificações sintéticas, {args.municipios} municípios, semente {args.semente}"
+    with engine.connect() as conn:
+        cabecalho += f"\nPostgreSQL: {conn.exec_driver_sql('SHOW server_version').scalar()}"
+    consultas = montar_consultas(engine)
+
+    print("\n--- Sem os índices de acesso ---")
+    definir_indices(engine, criar=False)
+    antes = medir(engine, consultas, args.repeticoes)
+    print("\n--- Com os índices de acesso ---")
+    definir_indices(engine, criar=True)
+    depois = medir(engine, consultas, args.repeticoes)
+
+    gravar_relatorio(args.saida, cabecalho, antes, depois)
+    total_antes, total_depois = sum(r[0] for r in antes.values()), sum(r[0] for r in depois.values())
+    print(f"\n  [OK] Total: {total_antes:.0f} ms -> {total_depois:.0f} ms ({total_antes / total_depois:.1f}x). Planos em '{args.saida}'.")
+
+if __name__ == "__main__":
+    main()
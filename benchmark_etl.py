@@ -0,0 +1,235 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from consultas import ConsultasBanco, ConsultasMemoria, criar_engine_painel, executar_em_paralelo
+from etl_datasus import (CONN_STRING, CONEXOES_CARGA, LIMITE_MEMORIA_MB, PROCESSOS_LIMPEZA, EstadoGlobalETL, executar_etl,
+                         ler_blocos, listar_arquivos)
+from gerador_datasus import SEMENTE, gerar_csv
+from instrumentacao import pico_rss_mb
+
+# BENCHMARK PONTA A PONTA: exportações sintéticas -> limpeza/estágio -> carga no PostgreSQL -> consultas do painel.
+# Cada medição roda num processo novo (pico de memória limpo) dentro de PASTA_DADOS, para os relatórios e o csv_final
+# do benchmark não se misturarem com os do projeto. A carga APAGA os dados do banco.
+PASTA_DADOS = "benchmark_dados"
+ARQUIVO_HISTORICO = "benchmark_etl.jsonl"
+ARQUIVO_RELATORIO = "benchmark_etl.txt"
+TAMANHOS = [10_000, 100_000]
+ETAPAS = ['limpeza', 'carga', 'painel_banco', 'painel_estagio', 'conferencia']  # nessa ordem: cada uma parte do que a anterior gravou
+CONSULTAS_PAINEL = ['kpis', 'casos_por_mes', 'casos_por_municipio', 'casos_por_municipio_mes', 'por_sexo', 'por_raca_cor',
+                    'por_idade', 'top_cbo', 'vacinacao']
+DIAS_FILTRADOS = 30
+# Regressão: mais lento ou mais memória que a última medição igual além da tolerância (e da margem, contra ruído)
+TOLERANCIA = 0.25
+MARGEM_MINIMA_S = 0.5
+MARGEM_MINIMA_MB = 50
+MARCADOR = "RESULTADO_BENCHMARK "
+# CONFERÊNCIA: caminhos que precisam dar o mesmo resultado; uma divergência derruba a medição (e o benchmark)
+LIMITE_MEMORIA_CONFERENCIA_MB = 1  # blocos do tamanho mínimo: o streaming corta o arquivo no maior número de blocos
+
+# MEDIÇÕES (rodam no processo filho)
+def medir_limpeza(args):
+    estado = executar_etl(args.arquivo, streaming=args.streaming, limite_memoria_mb=args.limite_memoria_mb,
+                          gravar_estagio=True, sem_carga=True, processos=args.processos, pasta_estagio=args.estagio)
+    return estado.total_linhas, {n: round(m['parede_s'], 3) for n, m in estado.medicoes.ordenadas()}
+
+def medir_carga(args):
+    estado = executar_etl(None, streaming=args.streaming, conexoes=args.conexoes, do_estagio=True, pasta_estagio=args.estagio)
+    return estado.linhas_notificacao, {n: round(m['parede_s'], 3) for n, m in estado.medicoes.ordenadas()}
+
+def medir_painel(fonte_de):
+    # Início frio do painel sem o cache em disco: resumo, todos os agregados no período inteiro e no último mês de
+    # um município, e os testes por fabricante; por fim, os agregados do período inteiro de uma vez, como o app pede
+    def medir(args):
+        tempos = {}
+        inicio = time.perf_counter()
+        fonte = fonte_de(args)
+        resumo = fonte.resumo()
+        tempos['resumo'] = time.perf_counter() - inicio
+        data_min, data_max = pd.Timestamp(resumo['data_min']).date(), pd.Timestamp(resumo['data_max']).date()
+        filtros = {'': (data_min, data_max, ()),
+                   ' (filtrado)': (data_max - datetime.timedelta(days=DIAS_FILTRADOS), data_max, tuple(resumo['municipios'][:1]))}
+        for sufixo, filtro in filtros.items():
+            for nome in CONSULTAS_PAINEL:
+                t0 = time.perf_counter()
+                getattr(fonte, nome)(*filtro)
+                tempos[nome + sufixo] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        fonte.testes_por_fabricante()
+        tempos['testes_por_fabricante'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        executar_em_paralelo({nome: (lambda nome=nome: getattr(fonte, nome)(*filtros[''])) for nome in CONSULTAS_PAINEL})
+        tempos['todas em paralelo'] = time.perf_counter() - t0
+        return resumo['total'], {n: round(t, 3) for n, t in sorted(tempos.items(), key=lambda x: -x[1])}
+    return medir
+
+class Divergencia(Exception):
+    pass
+
+def hashes_registro(arquivo, streaming, limite_memoria_mb, processos):
+    blocos = ler_blocos(listar_arquivos(arquivo), EstadoGlobalETL(), streaming, limite_memoria_mb, processos=processos)
+    return pd.concat([t['notificacao'][['notificacao_id', 'hash_registro']] for t in blocos], ignore_index=True)
+
+def filtros_conferencia(resumo):
+    data_min, data_max = pd.Timestamp(resumo['data_min']).date(), pd.Timestamp(resumo['data_max']).date()
+    municipio = tuple(resumo['municipios'][:1])
+    return {'período inteiro': (data_min, data_max, ()),
+            'último mês do município': (data_max - datetime.timedelta(days=DIAS_FILTRADOS), data_max, municipio),
+            'período invertido': (data_max, data_min, ()), 'período invertido no município': (data_max, data_min, municipio)}
+
+def medir_conferencia(args):
+    # hash_registro de cada notificação igual lendo o arquivo inteiro e em blocos: senão a carga incremental
+    # acusa como alteradas linhas que não mudaram
+    tempos = {}
+    t0 = time.perf_counter()
+    lote = hashes_registro(args.arquivo, False, args.limite_memoria_mb, args.processos)
+    blocos = hashes_registro(args.arquivo, True, LIMITE_MEMORIA_CONFERENCIA_MB, args.processos)
+    tempos['hash_registro (lote x streaming)'] = time.perf_counter() - t0
+    if not lote.equals(blocos):
+        diferentes = len(lote) if len(lote) != len(blocos) else int((lote['hash_registro'] != blocos['hash_registro']).sum())
+        raise Divergencia(f"hash_registro difere entre lote e streaming em {diferentes} de {len(lote)} notificações")
+
+    # KPIs do painel iguais no banco e no estágio, inclusive com o período invertido (fim antes do início)
+    t0 = time.perf_counter()
+    banco, estagio = ConsultasBanco(criar_engine_painel(CONN_STRING)), ConsultasMemoria.do_estagio(args.estagio)
+    for nome, filtro in filtros_conferencia(banco.resumo()).items():
+        kpis_banco, kpis_estagio = banco.kpis(*filtro), estagio.kpis(*filtro)
+        if kpis_banco != kpis_estagio:
+            raise Divergencia(f"kpis ({nome}) diferem: banco {kpis_banco}, estágio {kpis_estagio}")
+    tempos['kpis (banco x estágio)'] = time.perf_counter() - t0
+    return len(lote), {n: round(t, 3) for n, t in tempos.items()}
+
+MEDICOES = {
+    'limpeza': medir_limpeza,
+    'carga': medir_carga,
+    'painel_banco': medir_painel(lambda args: ConsultasBanco(criar_engine_painel(CONN_STRING))),
+    'painel_estagio': medir_painel(lambda args: ConsultasMemoria.do_estagio(args.estagio)),
+    'conferencia': medir_conferencia,
+}
+
+def medir_no_filho(args):
+    inicio = time.perf_counter()
+    linhas, detalhes = MEDICOES[args.medir](args)
+    duracao = time.perf_counter() - inicio
+    print(MARCADOR + json.dumps({'duracao_s': round(duracao, 3), 'linhas_saida': linhas, 'pico_mb': pico_rss_mb(),
+                                 'pico_filhos_mb': pico_rss_mb(filhos=True), 'detalhes': detalhes}))
+
+# ORQUESTRAÇÃO
+def executar_medicao(etapa, arquivo, linhas, args):
+    pasta_estagio = os.path.abspath(os.path.join(args.pasta, f"estagio_{linhas}"))
+    comando = [sys.executable, os.path.abspath(__file__), "--medir", etapa, "--arquivo", os.path.abspath(arquivo),
+               "--estagio", pasta_estagio, "--processos", str(args.processos), "--conexoes", str(args.conexoes),
+               "--limite-memoria-mb", str(args.limite_memoria_mb)] + (["--streaming"] if args.streaming else [])
+    processo = subprocess.run(comando, cwd=args.pasta, capture_output=True, text=True)
+    saida = [l for l in processo.stdout.splitlines() if l.startswith(MARCADOR)]
+    if processo.returncode != 0 or not saida:
+        print(f"  [ERRO] {etapa} ({linhas:,} linhas) falhou:\n" + (processo.stderr or processo.stdout)[-2000:])
+        return None
+    resultado = json.loads(saida[-1][len(MARCADOR):])
+    resultado.update(etapa=etapa, linhas=linhas, processos=args.processos, conexoes=args.conexoes, streaming=args.streaming,
+                     linhas_por_s=round(linhas / resultado['duracao_s'], 1) if resultado['duracao_s'] else None)
+    return resultado
+
+def chave(r):
+    return (r['etapa'], r['linhas'], r['processos'], r['conexoes'], r['streaming'])
+
+def ler_historico(caminho):
+    if not os.path.exists(caminho): return {}
+    with open(caminho, encoding="utf-8") as f:
+        return {chave(r): r for r in map(json.loads, filter(None, map(str.strip, f)))}  # a última medição de cada chave
+
+def comparar(resultado, anterior, tolerancia):
+    if anterior is None: return []
+    regressoes = []
+    a, d = anterior['duracao_s'], resultado['duracao_s']
+    if d > a * (1 + tolerancia) and d - a > MARGEM_MINIMA_S:
+        regressoes.append(f"tempo {a:.2f}s -> {d:.2f}s (+{d / a - 1:.0%})")
+    a, d = anterior.get('pico_mb'), resultado.get('pico_mb')
+    if a and d and d > a * (1 + tolerancia) and d - a > MARGEM_MINIMA_MB:
+        regressoes.append(f"memória {a:.0f} MB -> {d:.0f} MB (+{d / a - 1:.0%})")
+    return regressoes
+
+def versao_do_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def gravar_relatorio(caminho, resultados, regressoes):
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("BENCHMARK PONTA A PONTA (ETL -> BANCO -> PAINEL)\n\n")
+        f.write(f"{'etapa':<16} {'linhas':>12} {'tempo s':>9} {'linhas/s':>12} {'pico MB':>9} {'filhos MB':>10}\n")
+        for r in resultados:
+            filhos = "-" if r['pico_filhos_mb'] is None else f"{r['pico_filhos_mb']:.0f}"
+            pico = "-" if r['pico_mb'] is None else f"{r['pico_mb']:.0f}"
+            f.write(f"{r['etapa']:<16} {r['linhas']:>12,} {r['duracao_s']:>9.2f} {r['linhas_por_s']:>12,.0f} {pico:>9} {filhos:>10}\n")
+        for r in resultados:
+            f.write(f"\n--- {r['etapa']} ({r['linhas']:,} linhas): detalhes em segundos ---\n")
+            for nome, tempo in r['detalhes'].items(): f.write(f"{nome:<40} {tempo:>9.3f}\n")
+        if regressoes:
+            f.write("\nREGRESSÕES\n")
+            for linha in regressoes: f.write(linha + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do ETL, da carga e das consultas do painel sobre dados sintéticos "
+                                                 "(apaga os dados do banco)")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS, help="linhas de cada exportação sintética")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=ETAPAS)
+    parser.add_argument("--pasta", default=PASTA_DADOS, help="CSVs sintéticos, estágios e saídas do ETL")
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    parser.add_argument("--processos", type=int, default=PROCESSOS_LIMPEZA)
+    parser.add_argument("--conexoes", type=int, default=CONEXOES_CARGA)
+    parser.add_argument("--streaming", action="store_true", help="limpeza em blocos (necessário nos tamanhos que não cabem na RAM)")
+    parser.add_argument("--limite-memoria-mb", type=int, default=LIMITE_MEMORIA_MB)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="piora relativa tolerada antes de acusar regressão")
+    parser.add_argument("--historico", default=ARQUIVO_HISTORICO)
+    parser.add_argument("--saida", default=ARQUIVO_RELATORIO)
+    # Uso interno: uma medição no processo filho
+    parser.add_argument("--medir", choices=ETAPAS, help=argparse.SUPPRESS)
+    parser.add_argument("--arquivo", help=argparse.SUPPRESS)
+    parser.add_argument("--estagio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir_no_filho(args)
+        return
+
+    os.makedirs(args.pasta, exist_ok=True)
+    historico = ler_historico(args.historico)
+    codigo, carimbo = versao_do_codigo(), datetime.datetime.now().isoformat(timespec='seconds')
+    resultados, regressoes = [], []
+    for linhas in args.tamanhos:
+        arquivo = os.path.join(args.pasta, f"sintetico_{linhas}_{args.semente}.csv")
+        if not os.path.exists(arquivo):
+            print(f"--- Gerando {linhas:,} linhas sintéticas ---")
+            gerar_csv(arquivo, linhas, args.semente, processos=args.processos)
+        for etapa in args.etapas:
+            print(f"--- {etapa} ({linhas:,} linhas) ---")
+            resultado = executar_medicao(etapa, arquivo, linhas, args)
+            if resultado is None:
+                regressoes.append(f"{etapa} ({linhas:,} linhas): falhou")
+                continue
+            resultado.update(versao_codigo=codigo, executado_em=carimbo)
+            print(f"  [TEMPO] {resultado['duracao_s']:.2f}s ({resultado['linhas_por_s']:,.0f} linhas/s), "
+                  f"pico {resultado['pico_mb'] or 0:.0f} MB (filhos {resultado['pico_filhos_mb'] or 0:.0f} MB)")
+            for problema in comparar(resultado, historico.get(chave(resultado)), args.tolerancia):
+                print(f"  [AVISO] Regressão: {problema}")
+                regressoes.append(f"{etapa} ({linhas:,} linhas): {problema}")
+            resultados.append(resultado)
+            with open(args.historico, "a", encoding="utf-8") as f: f.write(json.dumps(resultado) + "\n")
+
+    gravar_relatorio(args.saida, resultados, regressoes)
+    print(f"\n[OK] {len(resultados)} medições em '{args.saida}' (histórico em '{args.historico}').")
+    if regressoes:
+        print(f"[ERRO] {len(regressoes)} regressão(ões) em relação à última medição igual.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import re
+import unicodedata
+from difflib import get_close_matches
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+REGEX_SPLIT = r"[;,/|+]|\s+[eE]\s+|\s+-\s+"
+TERMOS_BLOQUEADOS = ['teste', 'exame', 'covid', 'positivo', 'negativo', 'reagente', 'igg', 'igm', 'saturacao']
+TAMANHO_CACHE_FUZZY = 65536
+
+def remover_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+class Canonicalizador:
+    """Mapeia fragmentos de texto livre para um termo de lista_valida (ou None).
+
+    Trabalha sobre o conjunto de fragmentos únicos: cada fragmento distinto é resolvido uma vez,
+    com uma única regex pré-compilada para termos bloqueados + DE_PARA e cache LRU para o fuzzy.
+    """
+
+    def __init__(self, lista_valida, de_para, termos_bloqueados=TERMOS_BLOQUEADOS, tamanho_cache=TAMANHO_CACHE_FUZZY):
+        self.lista_valida = tuple(lista_valida)
+        validos = set(self.lista_valida)
+
+        # Ordem das alternativas = prioridade: bloqueados primeiro, depois o DE_PARA na ordem do dicionário.
+        # Chaves cujo destino não está na lista (ex.: "Dor") nunca decidem nada e ficam de fora.
+        self.prioridade = {}
+        for termo in termos_bloqueados:
+            self.prioridade.setdefault(termo, (len(self.prioridade), None))
+        for chave, valor in de_para.items():
+            if valor is None or valor in validos:
+                self.prioridade.setdefault(chave, (len(self.prioridade), valor))
+
+        # Lookahead para achar também ocorrências sobrepostas (ex.: "pressao" dentro de "depressao")
+        alternativas = '|'.join(re.escape(t) for t in self.prioridade)
+        self.regex_termos = re.compile(f"(?=({alternativas}))")
+        self.regex_split = re.compile(REGEX_SPLIT)
+        self.codigos = {termo: i for i, termo in enumerate(self.lista_valida)}
+        self.buscar_aproximado = lru_cache(maxsize=tamanho_cache)(self._buscar_aproximado)
+
+    def _buscar_aproximado(self, titulo):
+        matches = get_close_matches(titulo, self.lista_valida, n=1, cutoff=0.75)
+        return matches[0] if matches else None
+
+    def termo(self, texto_sujo):
+        if not isinstance(texto_sujo, str): return None
+        limpo = re.sub(r'^[\d\W_]+', '', texto_sujo).strip().replace(";", "").replace('"', '').replace("'", "")
+        if len(limpo) < 3: return None
+        busca_norm = remover_acentos(limpo.lower())
+
+        achados = [self.prioridade[m.group(1)] for m in self.regex_termos.finditer(busca_norm)]
+        if achados: return min(achados)[1]
+        return self.buscar_aproximado(limpo.title())
+
+    def termos_do_texto(self, texto, cache_fragmentos):
+        termos = []
+        for p in self.regex_split.split(texto):
+            if p not in cache_fragmentos: cache_fragmentos[p] = self.termo(p)
+            if cache_fragmentos[p]: termos.append(cache_fragmentos[p])
+        return tuple(termos)
+
+    def codificar(self, df, col_padrao, col_outros):
+        """Termos de cada linha como MatrizTermos (códigos = posição em lista_valida), sem lista Python por linha.
+
+        Cada valor distinto vira uma máscara de bits dos seus termos; a linha é o OU das máscaras das duas colunas,
+        o que já elimina termos repetidos entre elas.
+        """
+        palavras = max(1, -(-len(self.lista_valida) // 64))
+        mascaras = np.zeros((len(df), palavras), dtype=np.uint64)
+        cache_fragmentos = {}
+        for col in (col_padrao, col_outros):
+            if col not in df.columns: continue
+            fatores, distintos = pd.factorize(df[col])
+            # Última linha zerada: o fator -1 (nulo) cai nela
+            por_valor = np.zeros((len(distintos) + 1, palavras), dtype=np.uint64)
+            for i, valor in enumerate(distintos.astype(str)):
+                for termo in self.termos_do_texto(valor, cache_fragmentos):
+                    codigo = self.codigos[termo]
+                    por_valor[i, codigo // 64] |= np.uint64(1) << np.uint64(codigo % 64)
+            mascaras |= por_valor[fatores]
+        return MatrizTermos.das_mascaras(mascaras, self.lista_valida)
+
+class MatrizTermos:
+    """Matriz esparsa linha × termo (CSR): os termos da linha i são codigos[inicio[i]:inicio[i + 1]], em ordem crescente.
+
+    É o que as pontes notificacao_sintoma/notificacao_condicao precisam (pares linha, código) e também a base das
+    análises de coocorrência, sem passar por listas ou explode.
+    """
+
+    def __init__(self, inicio, codigos, termos):
+        self.inicio = inicio
+        self.codigos = codigos
+        self.termos = tuple(termos)
+
+    @classmethod
+    def das_mascaras(cls, mascaras, termos):
+        # Bit j da palavra w = código 64 * w + j (bytes little-endian, bits do menos significativo ao mais)
+        bits = np.unpackbits(mascaras.astype('<u8').view(np.uint8), axis=1, bitorder='little')[:, :len(termos)]
+        linhas, codigos = np.nonzero(bits)
+        inicio = np.zeros(len(mascaras) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(linhas, minlength=len(mascaras)), out=inicio[1:])
+        return cls(inicio, codigos.astype(np.int16 if len(termos) < 2**15 else np.int32), termos)
+
+    def __len__(self):
+        return len(self.inicio) - 1
+
+    def linhas(self):
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.inicio))
+
+    def sem_termos(self):
+        return int((np.diff(self.inicio) == 0).sum())
+
+    def coocorrencia(self, linhas_por_bloco=1_000_000):
+        """Quantas linhas têm cada par de termos (diagonal = contagem do termo), em blocos densos de 0/1."""
+        total = np.zeros((len(self.termos), len(self.termos)), dtype=np.int64)
+        todas = self.linhas()
+        for de in range(0, len(self), linhas_por_bloco):
+            ate = min(de + linhas_por_bloco, len(self))
+            a, b = self.inicio[de], self.inicio[ate]
+            densa = np.zeros((ate - de, len(self.termos)), dtype=np.float32)
+            densa[todas[a:b] - de, self.codigos[a:b]] = 1
+            total += np.rint(densa.T @ densa).astype(np.int64)  # float32 é exato até 2^24 linhas por bloco
+        return pd.DataFrame(total, index=list(self.termos), columns=list(self.termos))
@@ -0,0 +1,268 @@
+import datetime
+import io
+import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain
+
+import pandas as pd
+from sqlalchemy import text
+
+TAMANHO_LOTE_COPY = 50000       # linhas serializadas por vez
+TAMANHO_LEITURA_COPY = 1 << 20  # bytes pedidos pelo psycopg2 a cada read()
+
+# FORMATO BINÁRIO DO COPY (https://www.postgresql.org/docs/current/sql-copy.html)
+CABECALHO_BINARIO = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+TRAILER_BINARIO = struct.pack('>h', -1)
+CAMPO_NULO = struct.pack('>i', -1)
+EPOCH_PG = datetime.date(2000, 1, 1).toordinal()
+
+_INT2 = struct.Struct('>ih')
+_INT4 = struct.Struct('>ii')
+_INT8 = struct.Struct('>iq')
+_BOOL = struct.Struct('>ib')
+_TAM = struct.Struct('>i')
+
+def _texto(v):
+    b = str(v).encode('utf-8')
+    return _TAM.pack(len(b)) + b
+
+def _data(v):
+    if isinstance(v, datetime.datetime): v = v.date()
+    return _INT4.pack(4, v.toordinal() - EPOCH_PG)
+
+CODIFICADORES_BINARIOS = {
+    'int2': lambda v: _INT2.pack(2, int(v)),
+    'int4': lambda v: _INT4.pack(4, int(v)),
+    'int8': lambda v: _INT8.pack(8, int(v)),
+    'bool': lambda v: _BOOL.pack(1, 1 if v else 0),
+    'date': _data,
+    'varchar': _texto,
+    'text': _texto,
+    'bpchar': _texto,
+}
+
+class FluxoCopy(io.RawIOBase):
+    """Arquivo somente-leitura alimentado por um gerador de blocos (str ou bytes) para o cursor.copy_expert."""
+
+    def __init__(self, blocos, vazio):
+        self.blocos = iter(blocos)
+        self.vazio = vazio
+        self.atual = vazio
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        partes = []
+        faltam = size
+        while size < 0 or faltam > 0:
+            if self.pos >= len(self.atual):
+                try: self.atual, self.pos = next(self.blocos), 0
+                except StopIteration: break
+                continue
+            fim = len(self.atual) if size < 0 else min(len(self.atual), self.pos + faltam)
+            partes.append(self.atual[self.pos:fim])
+            faltam -= fim - self.pos
+            self.pos = fim
+        return self.vazio.join(partes)
+
+def _lotes(df, tamanho_lote):
+    for inicio in range(0, len(df), tamanho_lote):
+        yield df.iloc[inicio:inicio + tamanho_lote]
+
+def gerar_texto(df, tamanho_lote=TAMANHO_LOTE_COPY):
+    # Mesma serialização do antigo CSV temporário, só que em memória e lote a lote
+    for lote in _lotes(df, tamanho_lote):
+        yield lote.to_csv(index=False, header=False, sep=';', na_rep='')
+
+def gerar_binario(df, tipos, tamanho_lote=TAMANHO_LOTE_COPY):
+    yield CABECALHO_BINARIO
+    n_campos = struct.pack('>h', len(df.columns))
+    codificadores = [CODIFICADORES_BINARIOS[t] for t in tipos]
+    for lote in _lotes(df, tamanho_lote):
+        colunas = []
+        for (_, serie), codificar in zip(lote.items(), codificadores):
+            nulos = serie.isna().to_numpy()
+            colunas.append([CAMPO_NULO if nulo else codificar(v) for v, nulo in zip(serie.tolist(), nulos)])
+        yield b''.join(chain.from_iterable((n_campos, *campos) for campos in zip(*colunas)))
+    yield TRAILER_BINARIO
+
+def tipos_das_colunas(cursor, nome_tabela, colunas):
+    cursor.execute("""
+        SELECT a.attname, t.typname
+        FROM pg_attribute a JOIN pg_type t ON a.atttypid = t.oid
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+    """, (nome_tabela,))
+    tipos = dict(cursor.fetchall())
+    return [tipos[c] for c in colunas]
+
+def copiar_dataframe(cursor, nome_tabela, df, colunas, binario=False, tamanho_lote=TAMANHO_LOTE_COPY):
+    lista_colunas = ', '.join(colunas)
+    if binario:
+        tipos = tipos_das_colunas(cursor, nome_tabela, colunas)
+        nao_suportados = [t for t in tipos if t not in CODIFICADORES_BINARIOS]
+        if nao_suportados:
+            raise ValueError(f"COPY binário não suporta os tipos {nao_suportados} de '{nome_tabela}'")
+        fluxo = FluxoCopy(gerar_binario(df, tipos, tamanho_lote), b'')
+        sql = f"COPY {nome_tabela} ({lista_colunas}) FROM STDIN WITH (FORMAT binary)"
+    else:
+        fluxo = FluxoCopy(gerar_texto(df, tamanho_lote), '')
+        sql = f"COPY {nome_tabela} ({lista_colunas}) FROM STDIN WITH (FORMAT text, DELIMITER ';', NULL '')"
+    cursor.copy_expert(sql, fluxo, size=TAMANHO_LEITURA_COPY)
+
+
+# AGENDAMENTO DA CARGA PELAS FKs DO SCHEMA
+class ErroCarga(Exception):
+    pass
+
+def dependencias_do_schema(caminho_sql):
+    with open(caminho_sql, encoding='utf-8') as f:
+        sql = f.read()
+    dependencias = {}
+    for nome, corpo in re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)\s*\((.*?)\n\);", sql, flags=re.S):
+        dependencias[nome] = set(re.findall(r"REFERENCES\s+(\w+)", corpo)) - {nome}
+    return dependencias
+
+def chaves_estrangeiras_do_schema(caminho_sql):
+    """Lista de (tabela, coluna, tabela_referenciada, coluna_referenciada) das FKs declaradas em linha no schema."""
+    with open(caminho_sql, encoding='utf-8') as f:
+        sql = f.read()
+    chaves = []
+    for nome, corpo in re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)\s*\((.*?)\n\);", sql, flags=re.S):
+        for coluna, referenciada, coluna_ref in re.findall(r"^\s*(\w+)\s[^\n]*?REFERENCES\s+(\w+)\s*\((\w+)\)", corpo, flags=re.M):
+            chaves.append((nome, coluna, referenciada, coluna_ref))
+    return chaves
+
+def _cronometrar(funcao, nome):
+    inicio = time.perf_counter()
+    funcao(nome)
+    return time.perf_counter() - inicio
+
+def carregar_em_paralelo(nomes_tabelas, dependencias, carregar_tabela, n_conexoes):
+    """Chama carregar_tabela(nome) em até n_conexoes threads; uma tabela só começa quando todas as
+    que ela referencia já terminaram. Na primeira falha nada novo é disparado, as cargas em andamento
+    terminam e ErroCarga é levantado. Retorna o tempo (s) de cada tabela."""
+    nomes = set(nomes_tabelas)
+    pendentes = {n: dependencias.get(n, set()) & nomes for n in nomes_tabelas}
+    concluidas, tempos, falha = set(), {}, None
+    with ThreadPoolExecutor(max_workers=n_conexoes) as pool:
+        em_execucao = {}
+
+        def disparar_prontas():
+            for nome in [n for n, deps in pendentes.items() if deps <= concluidas]:
+                del pendentes[nome]
+                em_execucao[pool.submit(_cronometrar, carregar_tabela, nome)] = nome
+
+        disparar_prontas()
+        while em_execucao:
+            feitos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in feitos:
+                nome = em_execucao.pop(futuro)
+                try:
+                    tempos[nome] = futuro.result()
+                    concluidas.add(nome)
+                except Exception as e:
+                    if falha is None: falha = (nome, e)
+            if falha is None: disparar_prontas()
+
+    if falha: raise ErroCarga(f"Falha em '{falha[0]}': {falha[1]}") from falha[1]
+    if pendentes: raise ErroCarga(f"Dependência circular entre {sorted(pendentes)}")
+    return tempos
+
+
+# MODO CARGA EM MASSA: sem gatilhos/FKs por linha durante o COPY, índices recriados e FKs validadas no final
+def verificar_superusuario(engine):
+    # session_replication_role (que desliga gatilhos de auditoria e de FK) exige superusuário
+    with engine.connect() as conn:
+        if not conn.exec_driver_sql("SELECT rolsuper FROM pg_roles WHERE rolname = current_user").scalar():
+            raise ErroCarga("O modo carga em massa exige um usuário superusuário no PostgreSQL")
+
+def remover_indices_secundarios(engine, nomes_tabelas):
+    # Índices que não sustentam PK/UNIQUE/FK: podem ser reconstruídos de uma vez depois do COPY
+    with engine.begin() as conn:
+        indices = conn.exec_driver_sql("""
+            SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = ANY(%(tabelas)s::regclass[])
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+        """, {'tabelas': list(nomes_tabelas)}).fetchall()
+        for nome, _ in indices:
+            conn.exec_driver_sql(f"DROP INDEX {nome}")
+    return [definicao for _, definicao in indices]
+
+def recriar_indices(engine, definicoes):
+    with engine.begin() as conn:
+        for definicao in definicoes:
+            conn.exec_driver_sql(definicao)
+
+def validar_chaves_estrangeiras(engine, nomes_tabelas):
+    with engine.connect() as conn:
+        fks = conn.exec_driver_sql("""
+            SELECT c.conname, c.conrelid::regclass::text, c.confrelid::regclass::text,
+                   array_agg(a.attname ORDER BY k.ord), array_agg(af.attname ORDER BY k.ord)
+            FROM pg_constraint c
+            CROSS JOIN LATERAL unnest(c.conkey, c.confkey) WITH ORDINALITY AS k(col, fcol, ord)
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.col
+            JOIN pg_attribute af ON af.attrelid = c.confrelid AND af.attnum = k.fcol
+            WHERE c.contype = 'f' AND c.conrelid = ANY(%(tabelas)s::regclass[])
+            GROUP BY 1, 2, 3
+        """, {'tabelas': list(nomes_tabelas)}).fetchall()
+
+        violacoes = {}
+        for nome, tabela, referenciada, colunas, colunas_ref in fks:
+            nao_nulas = ' AND '.join(f"t.{c} IS NOT NULL" for c in colunas)
+            junta = ' AND '.join(f"r.{cr} = t.{c}" for c, cr in zip(colunas, colunas_ref))
+            orfaos = conn.exec_driver_sql(
+                f"SELECT count(*) FROM {tabela} t WHERE {nao_nulas} AND NOT EXISTS (SELECT 1 FROM {referenciada} r WHERE {junta})"
+            ).scalar()
+            if orfaos: violacoes[nome] = orfaos
+    if violacoes:
+        raise ErroCarga(f"Chaves estrangeiras violadas após a carga em massa: {violacoes}")
+
+def registrar_log_carga(engine, registros, mensagem, etapas=None):
+    # etapas: nome -> medidas (Instrumentacao.etapas); viram linhas ligadas à linha-resumo por execucao_id
+    with engine.begin() as conn:
+        execucao_id = conn.execute(text("INSERT INTO log_carga (registros_processados, mensagem) VALUES (:n, :msg) RETURNING id"),
+                                   {'n': int(registros), 'msg': mensagem}).scalar()
+        if etapas:
+            conn.execute(text("""
+                INSERT INTO log_carga (execucao_id, etapa, chamadas, duracao_s, cpu_s, pico_memoria_mb, linhas_entrada, linhas_saida,
+                                       registros_processados)
+                VALUES (:execucao_id, :etapa, :chamadas, :parede_s, :cpu_s, :pico_rss_mb, :linhas_entrada, :linhas_saida, :linhas_saida)
+            """), [{**m, 'execucao_id': execucao_id, 'etapa': nome} for nome, m in etapas.items()])
+    return execucao_id
+
+
+# CARGA INCREMENTAL: COPY para tabela temporária + upsert na tabela final
+def copiar_para_staging(cursor, nome_tabela, df, binario=False):
+    staging = f"stg_{nome_tabela}"
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {nome_tabela}) ON COMMIT DROP")
+    copiar_dataframe(cursor, staging, df, list(df.columns), binario=binario)
+    return staging
+
+def upsert_via_staging(cursor, nome_tabela, df, chave, atualizar=True, binario=False):
+    if df.empty: return 0
+    staging = copiar_para_staging(cursor, nome_tabela, df, binario=binario)
+    colunas = list(df.columns)
+    lista = ', '.join(colunas)
+    a_atualizar = [c for c in colunas if c not in chave] if atualizar else []
+    conflito = f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in a_atualizar)}" if a_atualizar else "DO NOTHING"
+    cursor.execute(f"INSERT INTO {nome_tabela} ({lista}) SELECT {lista} FROM {staging} ON CONFLICT ({', '.join(chave)}) {conflito}")
+    return cursor.rowcount
+
+def classificar_por_source_id(cursor, chaves):
+    """chaves: DataFrame (id_provisorio, source_id, hash_registro). Devolve, por id_provisorio, o notificacao_id
+    já gravado para aquele source_id (<NA> se a notificação é nova) e o hash_registro gravado."""
+    cursor.execute("CREATE TEMP TABLE stg_chaves (id_provisorio BIGINT, source_id VARCHAR(100), hash_registro BIGINT) ON COMMIT DROP")
+    copiar_dataframe(cursor, 'stg_chaves', chaves, ['id_provisorio', 'source_id', 'hash_registro'])
+    cursor.execute("""
+        SELECT DISTINCT ON (k.id_provisorio) k.id_provisorio, n.notificacao_id, n.hash_registro
+        FROM stg_chaves k LEFT JOIN notificacao n ON n.source_id = k.source_id
+        ORDER BY k.id_provisorio, n.notificacao_id
+    """)
+    banco = pd.DataFrame(cursor.fetchall(), columns=['id_provisorio', 'notificacao_id', 'hash_banco'], dtype=object)
+    return banco.astype('Int64').set_index('id_provisorio')
@@ -0,0 +1,468 @@
+import datetime
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+from sqlalchemy import create_engine, text
+
+from estagio import ler_tabela, ARQUIVO_METADADOS
+from instrumentacao import Instrumentacao
+
+DATA_PADRAO = "2020-01-01"  # notificações sem data entram no painel nesse dia
+MUNICIPIO_DESCONHECIDO = "Município Desconhecido"
+CBO_SEM_INFORMACAO = ['Não Informado', 'None', 'nan']
+
+# ACESSO AO BANCO DO PAINEL: um pool por processo do servidor, dividido entre as sessões. As consultas de uma
+# renderização rodam juntas (uma conexão cada) e os resultados vêm por cursor no servidor, em lotes já tipados
+TAMANHO_POOL = 8
+CONEXOES_EXTRAS = 4
+TIMEOUT_POOL_S = 30
+LINHAS_POR_LOTE = 50_000
+THREADS_CONSULTAS = TAMANHO_POOL
+ETAPA_POOL = "pool: espera por conexão"
+TIPOS_CONTAGEM = {'casos': 'int64', 'Casos': 'int64', 'count': 'int64'}  # mesmo tipo em todo lote, venha ele vazio ou não
+
+# CLASSIFICAÇÕES (a versão SQL precisa dar exatamente o mesmo resultado da versão Python)
+def classificar_status(x):
+    x = str(x).lower()
+    if 'confirmado' in x or 'laboratorial' in x: return 'Confirmado'
+    if 'descartado' in x: return 'Descartado'
+    if 'cura' in x: return 'Confirmado'
+    if 'sindrome' in x or 'suspeito' in x: return 'Suspeito'
+    return 'Em Análise'
+
+# A mesma regra roda no banco uma vez por valor distinto (status_classificacao, via fx_atualizar_rollups);
+# sem classificação ou sem dados_clinicos o status é 'Em Análise', como str(None) aqui
+SQL_STATUS = "COALESCE(sc.status, 'Em Análise')"
+
+def teste_positivo(res):
+    res = str(res).lower()
+    if 'reagente' in res and 'não' not in res: return 1
+    if 'positivo' in res: return 1
+    if 'detectavel' in res and 'não' not in res: return 1
+    return 0
+
+def encurtar(texto, tamanho):
+    return texto[:tamanho] + '...' if len(texto) > tamanho else texto
+
+def mapear_categorias(serie, funcao):
+    """funcao aplicada uma vez por valor distinto (e uma para os nulos), não por linha; devolve um Categorical."""
+    categorica = serie.astype('category')
+    resultados = [funcao(v) for v in categorica.cat.categories]
+    if categorica.isna().any(): resultados.append(funcao(None))
+    categorias = pd.Index(pd.unique(pd.Series(resultados, dtype=object)))
+    # Nulos têm código -1, que indexa justamente o último resultado (o de funcao(None))
+    codigos = categorias.get_indexer(resultados)[categorica.cat.codes.to_numpy()]
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+def _sem_categorias(df):
+    for coluna in df.select_dtypes('category').columns: df[coluna] = df[coluna].astype(object)
+    return df
+
+def _contagem(df, colunas, nome='casos', dropna=True):
+    # observed=True: categorias sem linhas no recorte não viram contagens zeradas
+    return _sem_categorias(df.groupby(colunas, observed=True, dropna=dropna).size().reset_index(name=nome))
+
+def _fim_do_mes(datas):
+    # Mesmo rótulo do pd.Grouper(freq='ME')
+    return pd.to_datetime(datas) + pd.offsets.MonthEnd(0)
+
+def _testes_por_fabricante(df):
+    # df: fabricante_teste, resultado_teste, casos (uma linha por combinação distinta)
+    df = df.copy()
+    df['fabricante_curto'] = df['fabricante_teste'].fillna('Não Informado').astype(str).str.upper().map(lambda x: encurtar(x, 25))
+    df['positivos'] = df['resultado_teste'].map(teste_positivo) * df['casos']
+    return df.groupby('fabricante_curto').agg(Total=('casos', 'sum'), Positivos=('positivos', 'sum')).reset_index()
+
+def criar_engine_painel(url):
+    # pre_ping: conexões derrubadas pelo servidor enquanto o painel estava parado são trocadas sem erro para o usuário
+    return create_engine(url, pool_size=TAMANHO_POOL, max_overflow=CONEXOES_EXTRAS, pool_timeout=TIMEOUT_POOL_S,
+                         pool_pre_ping=True)
+
+def executar_em_paralelo(tarefas, threads=THREADS_CONSULTAS):
+    # tarefas: chave -> função sem argumentos. As consultas passam o tempo esperando o banco (ou no pandas, que
+    # solta o GIL), então threads bastam; o tempo total fica sendo o da tarefa mais lenta
+    if not tarefas: return {}
+    with ThreadPoolExecutor(max_workers=min(threads, len(tarefas))) as pool:
+        futuros = {chave: pool.submit(funcao) for chave, funcao in tarefas.items()}
+        return {chave: futuro.result() for chave, futuro in futuros.items()}
+
+def estado_pool(engine):
+    pool = engine.pool
+    return {'tamanho': pool.size(), 'em_uso': pool.checkedout(), 'livres': pool.checkedin(), 'extras': max(pool.overflow(), 0)}
+
+def tabela_latencias(medicoes):
+    return pd.DataFrame([{'Consulta': nome, 'Chamadas': m['chamadas'], 'Média ms': round(m['parede_s'] / m['chamadas'] * 1000, 1),
+                          'Total s': round(m['parede_s'], 2), 'Linhas': m['linhas_saida']}
+                         for nome, m in medicoes.ordenadas()])
+
+class ConsultasMedidas:
+    """Base das fontes do painel: executar(nome, *args) chama o método e soma a latência dele em medicoes.
+
+    medicoes (Instrumentacao) pode vir de fora para sobreviver à troca da fonte quando os dados mudam de versão.
+    """
+
+    def __init__(self, medicoes=None):
+        self.medicoes = medicoes if medicoes is not None else Instrumentacao()
+
+    def executar(self, nome, *args):
+        with self.medicoes.etapa(nome) as medida:
+            resultado = getattr(self, nome)(*args)
+            if isinstance(resultado, pd.DataFrame): medida['linhas_saida'] = len(resultado)
+        return resultado
+
+class ConsultasBanco(ConsultasMedidas):
+    """Agregações do painel calculadas no PostgreSQL; só o resultado agregado vem para o app.
+
+    Período, município, status, óbito e dose saem do rollup diário (rollup_casos_diario); o que depende de
+    colunas de dados_demograficos é agregado sobre as tabelas, com o status vindo de status_classificacao.
+    Os filtros são sempre (inicio, fim, municipios): datas inclusivas e uma tupla de nomes de município (vazia = todos).
+    A engine deve ser compartilhada (criar_engine_painel): cada consulta pega uma conexão do pool só enquanto lê.
+    """
+
+    BASE = """
+        FROM notificacao n
+        LEFT JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
+        LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
+        LEFT JOIN status_classificacao sc ON dc.classificacao_final = sc.classificacao_final
+        LEFT JOIN dados_demograficos dd ON n.notificacao_id = dd.notificacao_id
+    """
+    ROLLUP = """
+        FROM rollup_casos_diario n
+        LEFT JOIN municipio m ON n.municipio_ibge = m.municipio_ibge
+        LEFT JOIN status_classificacao sc ON n.status_id = sc.status_id
+    """
+
+    def __init__(self, engine, medicoes=None):
+        super().__init__(medicoes)
+        self.engine = engine
+
+    def _ler(self, sql, params=None, tipos=TIPOS_CONTAGEM):
+        with self.medicoes.etapa(ETAPA_POOL):
+            conn = self.engine.connect()
+        with conn:
+            # stream_results: cursor no servidor, o resultado não é materializado inteiro pelo driver antes do pandas
+            conn = conn.execution_options(stream_results=True, max_row_buffer=LINHAS_POR_LOTE)
+            lotes = [lote.astype({c: t for c, t in tipos.items() if c in lote.columns})
+                     for lote in pd.read_sql(text(sql), conn, params=params or {}, chunksize=LINHAS_POR_LOTE)]
+        return pd.concat(lotes, ignore_index=True) if len(lotes) > 1 else lotes[0]
+
+    def _where(self, inicio, fim, municipios):
+        # Sem COALESCE na coluna: o planejador estima o intervalo pelas estatísticas (e pode usar índice)
+        sql = "WHERE (n.data_notificacao BETWEEN :inicio AND :fim"
+        if inicio <= datetime.date.fromisoformat(DATA_PADRAO) <= fim: sql += " OR n.data_notificacao IS NULL"
+        sql += ")"
+        params = {'inicio': inicio, 'fim': fim}
+        if municipios:
+            sql += f" AND COALESCE(m.nome, '{MUNICIPIO_DESCONHECIDO}') = ANY(:municipios)"
+            params['municipios'] = list(municipios)
+        return sql, params
+
+    def resumo(self):
+        sql_totais = f"""
+            SELECT SUM(total) AS total, MIN(COALESCE(data_notificacao, DATE '{DATA_PADRAO}')) AS data_min,
+                   MAX(COALESCE(data_notificacao, DATE '{DATA_PADRAO}')) AS data_max
+            FROM rollup_casos_diario
+        """
+        sql_municipios = f"""
+            SELECT DISTINCT COALESCE(m.nome, '{MUNICIPIO_DESCONHECIDO}') AS municipio
+            FROM (SELECT DISTINCT municipio_ibge FROM rollup_casos_diario) n
+            LEFT JOIN municipio m ON n.municipio_ibge = m.municipio_ibge
+        """
+        resultados = executar_em_paralelo({'totais': lambda: self._ler(sql_totais), 'municipios': lambda: self._ler(sql_municipios)})
+        df, municipios = resultados['totais'], resultados['municipios']
+        linha = df.iloc[0]
+        return {'total': int(linha['total'] or 0), 'data_min': linha['data_min'], 'data_max': linha['data_max'],
+                'municipios': sorted(municipios['municipio'].astype(str))}
+
+    def kpis(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        linha = self._ler(f"""
+            SELECT COALESCE(SUM(n.total), 0) AS total,
+                   COALESCE(SUM(n.total) FILTER (WHERE {SQL_STATUS} = 'Confirmado'), 0) AS confirmados,
+                   COALESCE(SUM(n.total) FILTER (WHERE n.is_obito), 0) AS obitos,
+                   COALESCE(SUM(n.total) FILTER (WHERE {SQL_STATUS} = 'Descartado'), 0) AS descartados
+            {self.ROLLUP} {where}
+        """, params, tipos=dict.fromkeys(['total', 'confirmados', 'obitos', 'descartados'], 'int64')).iloc[0]
+        return {k: int(v) for k, v in linha.items()}
+
+    def casos_por_mes(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        df = self._ler(f"""
+            SELECT date_trunc('month', COALESCE(n.data_notificacao, DATE '{DATA_PADRAO}'))::date AS data_notificacao,
+                   {SQL_STATUS} AS status, SUM(n.total) AS "Casos"
+            {self.ROLLUP} {where}
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """, params)
+        df['data_notificacao'] = _fim_do_mes(df['data_notificacao'])
+        return df
+
+    def casos_por_municipio(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        return self._ler(f"""
+            SELECT n.municipio_ibge AS municipio_notificacao_ibge, SUM(n.total) AS casos
+            {self.ROLLUP} {where}
+            GROUP BY 1
+        """, params)
+
+    def casos_por_municipio_mes(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        df = self._ler(f"""
+            SELECT n.municipio_ibge AS municipio_notificacao_ibge,
+                   date_trunc('month', COALESCE(n.data_notificacao, DATE '{DATA_PADRAO}'))::date AS mes, SUM(n.total) AS casos
+            {self.ROLLUP} {where}
+            GROUP BY 1, 2 ORDER BY 2, 1
+        """, params)
+        df['mes'] = _fim_do_mes(df['mes'])
+        return df
+
+    def por_sexo(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        return self._ler(f"""
+            SELECT COALESCE(dd.sexo, 'Indefinido') AS sexo, COUNT(*) AS casos
+            {self.BASE} {where}
+            GROUP BY 1 ORDER BY 2 DESC
+        """, params)
+
+    def por_raca_cor(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        return self._ler(f"""
+            SELECT COALESCE(dd.raca_cor, 'Não Informado') AS raca_cor, COUNT(*) AS count
+            {self.BASE} {where}
+            GROUP BY 1 ORDER BY 2 DESC
+        """, params)
+
+    def por_idade(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        return self._ler(f"""
+            SELECT COALESCE(dd.idade, 0) AS idade, {SQL_STATUS} AS status, COUNT(*) AS casos
+            {self.BASE} {where}
+            GROUP BY 1, 2 ORDER BY 1, 2
+        """, params)
+
+    def top_cbo(self, inicio, fim, municipios, n=10):
+        where, params = self._where(inicio, fim, municipios)
+        params['excluidos'] = CBO_SEM_INFORMACAO
+        params['n'] = n
+        return self._ler(f"""
+            SELECT CASE WHEN length(dd.cbo) > 30 THEN left(dd.cbo, 30) || '...' ELSE dd.cbo END AS "Ocupação",
+                   COUNT(*) AS "Casos"
+            {self.BASE} {where} AND dd.cbo IS NOT NULL AND dd.cbo <> ALL(:excluidos)
+            GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT :n
+        """, params)
+
+    def vacinacao(self, inicio, fim, municipios):
+        where, params = self._where(inicio, fim, municipios)
+        return self._ler(f"""
+            SELECT COALESCE(n.max_dose, 0)::int || ' Doses' AS vacina_status, {SQL_STATUS} AS status, SUM(n.total) AS casos
+            {self.ROLLUP} {where}
+            GROUP BY 1, 2
+        """, params)
+
+    def testes_por_fabricante(self):
+        # A positividade depende de texto livre: agrupa no banco e classifica cada combinação distinta uma vez aqui
+        return _testes_por_fabricante(self._ler("""
+            SELECT fabricante_teste, resultado_teste, COUNT(*) AS casos
+            FROM teste_laboratorial
+            GROUP BY 1, 2
+        """))
+
+def _dia(data):
+    # Chave inteira de data: dias desde 1970-01-01 (aceita date, datetime, Timestamp e arrays datetime64)
+    return np.asarray(data, dtype='datetime64[D]').astype(np.int64)
+
+class ConsultasMemoria(ConsultasMedidas):
+    """Mesma interface de ConsultasBanco sobre DataFrames em memória (ex.: lidos do estágio Parquet, offline).
+
+    O DataFrame fica ordenado por data: um período vira um intervalo de linhas achado por busca binária, e cada
+    município guarda as posições das suas linhas (também em ordem de data), de modo que filtrar não varre a tabela.
+    """
+
+    def __init__(self, df, df_testes, medicoes=None):
+        super().__init__(medicoes)
+        # Colunas de texto viram Categorical (códigos inteiros + poucas centenas de valores): menos memória no cache
+        # e derivações (status, CBO curto, rótulo da dose) calculadas uma vez por valor distinto
+        df['data_notificacao'] = pd.to_datetime(df['data_notificacao'], errors='coerce').fillna(pd.Timestamp(DATA_PADRAO))
+        df['status'] = mapear_categorias(df['classificacao_final'], classificar_status)
+        df['vacina_status'] = mapear_categorias(df['vacina_dose'].fillna(0).astype(int), lambda d: f"{d} Doses")
+        df['idade'] = pd.to_numeric(df['idade'], errors='coerce').fillna(0)
+        df['sexo'] = df['sexo'].fillna('Indefinido').astype('category')
+        df['raca_cor'] = df['raca_cor'].fillna('Não Informado').astype('category')
+        df['cbo'] = df['cbo'].fillna('Não Informado').astype(str).astype('category')
+        df['cbo_curto'] = mapear_categorias(df['cbo'], lambda x: encurtar(x, 30))
+        for coluna in ['municipio', 'evolucao_caso']: df[coluna] = df[coluna].astype('category')
+        self.df = df.drop(columns=['classificacao_final', 'vacina_dose']).sort_values('data_notificacao', kind='stable', ignore_index=True)
+        self.df_testes = df_testes.astype('category')
+
+        # ÍNDICES: data como inteiro (dias) em ordem crescente; por município, as posições das linhas em CSR
+        # (linhas_por_municipio[inicio_municipio[c]:inicio_municipio[c + 1]] são as do município de código c)
+        self._dias = _dia(self.df['data_notificacao'].to_numpy())
+        codigos = self.df['municipio'].cat.codes.to_numpy()
+        self._linhas_por_municipio = np.argsort(codigos, kind='stable')
+        self._inicio_municipio = np.searchsorted(codigos[self._linhas_por_municipio], np.arange(len(self.df['municipio'].cat.categories) + 1))
+        # KPIs: um código por linha (status * 2 + óbito), contado num único bincount. Sem município, nem isso: a
+        # contagem acumulada de cada código até cada dia dá qualquer período pela diferença de duas linhas
+        self._codigo_kpi = self.df['status'].cat.codes.to_numpy().astype(np.int16) * 2 + (self.df['evolucao_caso'] == 'Obito').to_numpy()
+        self._dias_distintos, dia_da_linha = np.unique(self._dias, return_inverse=True)
+        n_codigos = 2 * len(self.df['status'].cat.categories)
+        por_dia = np.bincount(dia_da_linha * n_codigos + self._codigo_kpi, minlength=len(self._dias_distintos) * n_codigos)
+        self._kpi_acumulado = np.vstack([np.zeros((1, n_codigos), dtype=np.int64), por_dia.reshape(len(self._dias_distintos), n_codigos).cumsum(axis=0)])
+
+    @classmethod
+    def do_estagio(cls, pasta, medicoes=None):
+        # Mesmas colunas da consulta do painel, montadas a partir das tabelas do estágio
+        n = ler_tabela(pasta, 'notificacao', ['notificacao_id', 'data_notificacao', 'municipio_notificacao_ibge'])
+        m = ler_tabela(pasta, 'municipio', ['municipio_ibge', 'nome'])
+        dc = ler_tabela(pasta, 'dados_clinicos', ['notificacao_id', 'classificacao_final', 'evolucao_caso'])
+        dd = ler_tabela(pasta, 'dados_demograficos', ['notificacao_id', 'idade', 'sexo', 'raca_cor', 'cbo'])
+        v = ler_tabela(pasta, 'vacina_aplicada', ['notificacao_id', 'dose_numero'])
+        if v is None: v = pd.DataFrame({'notificacao_id': pd.Series(dtype='int64'), 'dose_numero': pd.Series(dtype='float64')})
+        v = v.groupby('notificacao_id', as_index=False)['dose_numero'].max().rename(columns={'dose_numero': 'vacina_dose'})
+
+        m = m.rename(columns={'municipio_ibge': 'municipio_notificacao_ibge', 'nome': 'municipio'})
+        df = n.merge(m, on='municipio_notificacao_ibge', how='left')
+        df['municipio'] = df['municipio'].fillna(MUNICIPIO_DESCONHECIDO)
+        for tabela in (dc, dd, v):
+            df = df.merge(tabela, on='notificacao_id', how='left')
+
+        colunas_testes = ['fabricante_teste', 'resultado_teste']
+        df_testes = ler_tabela(pasta, 'teste_laboratorial', colunas_testes)
+        if df_testes is None: df_testes = pd.DataFrame(columns=colunas_testes)
+        return cls(df, df_testes, medicoes)
+
+    def _posicoes(self, inicio, fim, municipios):
+        # Um slice quando só há período; com municípios, as posições de cada um dentro do período, unidas
+        primeira, ultima = np.searchsorted(self._dias, _dia(inicio), 'left'), np.searchsorted(self._dias, _dia(fim), 'right')
+        ultima = max(ultima, primeira)  # período invertido (fim < início): nenhuma linha, como no banco
+        if not municipios: return slice(primeira, ultima)
+        codigos = self.df['municipio'].cat.categories.get_indexer(list(municipios))
+        partes = []
+        for codigo in np.unique(codigos[codigos >= 0]):
+            linhas = self._linhas_por_municipio[self._inicio_municipio[codigo]:self._inicio_municipio[codigo + 1]]
+            partes.append(linhas[np.searchsorted(linhas, primeira):np.searchsorted(linhas, ultima)])
+        return np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype=np.intp)
+
+    def _filtrar(self, inicio, fim, municipios):
+        posicoes = self._posicoes(inicio, fim, municipios)
+        return self.df.iloc[posicoes] if isinstance(posicoes, slice) else self.df.take(posicoes)
+
+    def resumo(self):
+        return {'total': len(self.df), 'data_min': self.df['data_notificacao'].min(), 'data_max': self.df['data_notificacao'].max(),
+                'municipios': sorted(str(x) for x in self.df['municipio'].unique())}
+
+    def kpis(self, inicio, fim, municipios):
+        status = self.df['status'].cat.categories
+        if municipios:
+            contagem = np.bincount(self._codigo_kpi[self._posicoes(inicio, fim, municipios)], minlength=2 * len(status))
+        else:
+            primeiro, ultimo = np.searchsorted(self._dias_distintos, _dia(inicio), 'left'), np.searchsorted(self._dias_distintos, _dia(fim), 'right')
+            ultimo = max(ultimo, primeiro)
+            contagem = self._kpi_acumulado[ultimo] - self._kpi_acumulado[primeiro]
+        contagem = contagem.reshape(-1, 2)
+        por_status = dict(zip(status, contagem.sum(axis=1)))
+        return {'total': int(contagem.sum()), 'confirmados': int(por_status.get('Confirmado', 0)),
+                'obitos': int(contagem[:, 1].sum()), 'descartados': int(por_status.get('Descartado', 0))}
+
+    def casos_por_mes(self, inicio, fim, municipios):
+        df = self._filtrar(inicio, fim, municipios)
+        return _contagem(df, [pd.Grouper(key='data_notificacao', freq='ME'), 'status'], 'Casos')
+
+    def casos_por_municipio(self, inicio, fim, municipios):
+        df = self._filtrar(inicio, fim, municipios)
+        return _contagem(df, 'municipio_notificacao_ibge', dropna=False)
+
+    def casos_por_municipio_mes(self, inicio, fim, municipios):
+        df = self._filtrar(inicio, fim, municipios)
+        df = _contagem(df, ['municipio_notificacao_ibge', pd.Grouper(key='data_notificacao', freq='ME')], dropna=False)
+        return df.rename(columns={'data_notificacao': 'mes'}).sort_values(['mes', 'municipio_notificacao_ibge'], ignore_index=True)
+
+    def por_sexo(self, inicio, fim, municipios):
+        return _contagem(self._filtrar(inicio, fim, municipios), 'sexo').sort_values('casos', ascending=False, ignore_index=True)
+
+    def por_raca_cor(self, inicio, fim, municipios):
+        return _contagem(self._filtrar(inicio, fim, municipios), 'raca_cor', 'count').sort_values('count', ascending=False, ignore_index=True)
+
+    def por_idade(self, inicio, fim, municipios):
+        return _contagem(self._filtrar(inicio, fim, municipios), ['idade', 'status'])
+
+    def top_cbo(self, inicio, fim, municipios, n=10):
+        df = self._filtrar(inicio, fim, municipios)
+        top = _contagem(df[~df['cbo'].isin(CBO_SEM_INFORMACAO)], 'cbo_curto', 'Casos')
+        top = top.sort_values(['Casos', 'cbo_curto'], ascending=[False, True], ignore_index=True).head(n)
+        return top.rename(columns={'cbo_curto': 'Ocupação'})
+
+    def vacinacao(self, inicio, fim, municipios):
+        return _contagem(self._filtrar(inicio, fim, municipios), ['vacina_status', 'status'])
+
+    def testes_por_fabricante(self):
+        return _testes_por_fabricante(_contagem(self.df_testes, ['fabricante_teste', 'resultado_teste'], dropna=False))
+
+# VERSÃO DOS DADOS: muda a cada carga do ETL (ou edição auditada); a chave do cache em disco parte dela
+def versao_do_banco(engine):
+    with engine.connect() as conn:
+        linha = conn.execute(text("""
+            SELECT (SELECT max(id) FROM log_carga), (SELECT max(log_id) FROM log_alteracoes),
+                   (SELECT max(notificacao_id) FROM notificacao)
+        """)).fetchone()
+    return "banco-" + "-".join(str(v) for v in linha)
+
+def versao_do_estagio(pasta):
+    # O arquivo de metadados é o último a ser escrito pelo ETL: regravar o estágio troca o mtime
+    return f"estagio-{os.stat(os.path.join(pasta, ARQUIVO_METADADOS)).st_mtime_ns}"
+
+class CacheEmDisco:
+    """Resultados das consultas do painel em disco, por versão dos dados: sobrevivem a reinícios do servidor.
+
+    DataFrames vão em Arrow/Feather sem compressão (lidos com memory map); o resto (dicionários) em pickle.
+    Ao aparecer uma versão nova, as pastas das anteriores são apagadas.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._versao_limpa = None
+        self._trava = threading.Lock()
+
+    def _caminho(self, versao, nome, args):
+        chave = hashlib.sha1(repr(args).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.pasta, versao, f"{nome}-{chave}")
+
+    def _limpar_versoes_antigas(self, versao):
+        for outra in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, outra)
+            if outra != versao and os.path.isdir(caminho): shutil.rmtree(caminho, ignore_errors=True)
+
+    def _preparar_pasta(self, versao):
+        # O pré-carregamento do painel grava várias consultas ao mesmo tempo: a limpeza roda uma vez por versão
+        with self._trava:
+            if self._versao_limpa != versao:
+                self._limpar_versoes_antigas(versao)
+                self._versao_limpa = versao
+        os.makedirs(os.path.join(self.pasta, versao), exist_ok=True)
+
+    def contem(self, versao, nome, args):
+        base = self._caminho(versao, nome, args)
+        return os.path.exists(base + ".feather") or os.path.exists(base + ".pkl")
+
+    def obter(self, versao, nome, args, calcular):
+        base = self._caminho(versao, nome, args)
+        if os.path.exists(base + ".feather"): return feather.read_table(base + ".feather", memory_map=True).to_pandas()
+        if os.path.exists(base + ".pkl"):
+            with open(base + ".pkl", "rb") as f: return pickle.load(f)
+
+        resultado = calcular()
+        self._preparar_pasta(versao)
+        # Grava num temporário e renomeia: outra sessão nunca lê um arquivo pela metade
+        temporario = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if isinstance(resultado, pd.DataFrame):
+            resultado.to_feather(temporario, compression="uncompressed")
+            os.replace(temporario, base + ".feather")
+        else:
+            with open(temporario, "wb") as f: pickle.dump(resultado, f)
+            os.replace(temporario, base + ".pkl")
+        return resultado
@@ -1,49 +1,190 @@
-import pandas as pd
-from sqlalchemy import create_engine
-
-# Configuração
-DB_USER = "postgres"
-DB_PASS = "201005"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "projeto 3"
-
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-
-print("--- INICIANDO DIAGNÓSTICO DO BANCO DE DADOS ---")
-
-# 1. Contagem Bruta
-qtd_raw = pd.read_sql("SELECT count(*) FROM notificacao", engine).iloc[0,0]
-print(f"1. Total na tabela 'notificacao': {qtd_raw} (Esperado: ~148k)")
-
-# 2. Verificando Datas Nulas (O Grande Vilão)
-qtd_data_nula = pd.read_sql("SELECT count(*) FROM notificacao WHERE data_notificacao IS NULL", engine).iloc[0,0]
-print(f"2. Linhas com Data Nula: {qtd_data_nula}")
-
-# 3. Verificando Join com Município
-query_join = """
-SELECT count(*) 
-FROM notificacao n 
-JOIN municipio m ON n.municipio_notificacao_ibge = m.municipio_ibge
-"""
-qtd_join = pd.read_sql(query_join, engine).iloc[0,0]
-print(f"3. Total após JOIN com Município (INNER JOIN): {qtd_join}")
-
-# 4. Verificando Limites de Datas
-datas = pd.read_sql("SELECT min(data_notificacao), max(data_notificacao) FROM notificacao", engine)
-print(f"4. Período dos dados: De {datas.iloc[0,0]} até {datas.iloc[0,1]}")
-
-print("----------------------------------------------")
-if qtd_raw == 148741 and qtd_join < 60000:
-    print("CONCLUSÃO: O problema é o MUNICÍPIO. Muitos códigos IBGE da notificação não existem na tabela de municípios.")
-    print("SOLUÇÃO: O 'LEFT JOIN' no app.py é obrigatório.")
-
-elif qtd_raw == 148741 and qtd_data_nula > 50000:
-    print("CONCLUSÃO: O problema são DATAS NULAS. O Pandas/Streamlit filtra datas vazias.")
-    print("SOLUÇÃO: Preencher datas vazias no dashboard.py.")
-
-elif qtd_raw < 60000:
-    print("CONCLUSÃO: O problema é no ETL. Os dados NÃO entraram no banco.")
-    print("SOLUÇÃO: Rodar o ETL novamente ou verificar o CSV.")
-else:
-    print("CONCLUSÃO: O banco está correto. O problema é CACHE do Streamlit.")
\ No newline at end of file
+import argparse
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from carga import chaves_estrangeiras_do_schema
+from estagio import ARQUIVO_METADADOS, ler_tabela
+from etl_datasus import CONN_STRING, ARQUIVO_SCHEMA, PASTA_ESTAGIO, TABELAS_CARGA
+
+# PERFIL DE QUALIDADE: nulos por coluna, órfãos de FK, domínios e intervalos, tudo num lote de agregações em paralelo
+ARQUIVO_RELATORIO = "relatorio_qualidade.json"
+CONEXOES = 4
+LIMITE_DOMINIO = 200    # colunas com até tantos valores distintos ganham histograma
+TOP_DOMINIO = 20        # valores mais frequentes guardados no relatório
+LIMITE_AVISO_NULOS = 0.5
+TIPOS_INTERVALO = ('date', 'timestamp', 'smallint', 'integer', 'bigint', 'numeric', 'real', 'double')
+
+def _citar(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+def _histograma(pares):
+    # [[valor, n], ...] do mais frequente ao menos, só os TOP_DOMINIO primeiros
+    pares = sorted(pares, key=lambda p: (-p[1], str(p[0])))
+    return [[v, int(n)] for v, n in pares[:TOP_DOMINIO]]
+
+def _valor_json(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)): return None
+    if isinstance(v, pd.Timestamp): return v.date().isoformat()
+    if isinstance(v, datetime.date): return v.isoformat()
+    return v.item() if hasattr(v, 'item') else v
+
+# BANCO: catálogo numa consulta; depois, por tabela, um scan com todos os count/min/max e um com GROUPING SETS dos
+# domínios; por FK, um anti-join. Tudo numa fila só, consumida por CONEXOES conexões.
+def _catalogo(engine, tabelas):
+    with engine.connect() as conn:
+        # ANALYZE é por amostragem: barato mesmo em tabelas grandes, e dá as estimativas de distintos
+        sem_estatistica = conn.exec_driver_sql("""
+            SELECT c.relname FROM pg_class c
+            WHERE c.relname = ANY(%(t)s) AND NOT EXISTS (SELECT 1 FROM pg_stats s WHERE s.tablename = c.relname)
+        """, {'t': tabelas}).scalars().all()
+        for tabela in sem_estatistica: conn.exec_driver_sql(f"ANALYZE {tabela}")
+        conn.commit()
+        return pd.read_sql("""
+            SELECT c.table_name AS tabela, c.column_name AS coluna, c.data_type AS tipo, c.ordinal_position,
+                   CASE WHEN s.n_distinct >= 0 THEN s.n_distinct ELSE -s.n_distinct * GREATEST(pc.reltuples, 0) END AS distintos
+            FROM information_schema.columns c
+            JOIN pg_class pc ON pc.relname = c.table_name AND pc.relnamespace = 'public'::regnamespace
+            LEFT JOIN pg_stats s ON s.schemaname = 'public' AND s.tablename = c.table_name AND s.attname = c.column_name
+            WHERE c.table_schema = 'public' AND c.table_name = ANY(%(t)s)
+            ORDER BY c.table_name, c.ordinal_position
+        """, conn, params={'t': tabelas})
+
+def _tarefas_banco(catalogo, chaves):
+    tarefas = []
+    for tabela, cols in catalogo.groupby('tabela', sort=False):
+        colunas = cols['coluna'].tolist()
+        intervalo = cols.loc[cols['tipo'].str.startswith(TIPOS_INTERVALO), 'coluna'].tolist()
+        expressoes = ["count(*)"] + [f"count({_citar(c)})" for c in colunas] \
+            + [f"{f}({_citar(c)})" for c in intervalo for f in ('min', 'max')]
+        tarefas.append(('totais', tabela, (colunas, intervalo), f"SELECT {', '.join(expressoes)} FROM {tabela}"))
+
+        dominio = cols.loc[cols['distintos'].notna() & (cols['distintos'] <= LIMITE_DOMINIO), 'coluna'].tolist()
+        if dominio:
+            citadas = [_citar(c) for c in dominio]
+            sql = (f"SELECT {', '.join(citadas)}, GROUPING({', '.join(citadas)}), count(*) "
+                   f"FROM {tabela} GROUP BY GROUPING SETS ({', '.join(f'({c})' for c in citadas)})")
+            tarefas.append(('dominio', tabela, dominio, sql))
+
+    for tabela, coluna, referenciada, coluna_ref in chaves:
+        if tabela not in catalogo['tabela'].values or referenciada not in catalogo['tabela'].values: continue
+        sql = (f"SELECT count(*) FROM {tabela} t WHERE t.{coluna} IS NOT NULL "
+               f"AND NOT EXISTS (SELECT 1 FROM {referenciada} r WHERE r.{coluna_ref} = t.{coluna})")
+        tarefas.append(('orfaos', tabela, f"{coluna} -> {referenciada}.{coluna_ref}", sql))
+    return tarefas
+
+def perfil_do_banco(engine, tabelas=TABELAS_CARGA, conexoes=CONEXOES):
+    catalogo = _catalogo(engine, list(tabelas))
+    tarefas = _tarefas_banco(catalogo, chaves_estrangeiras_do_schema(ARQUIVO_SCHEMA))
+
+    def executar(tarefa):
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(tarefa[3]).fetchall()
+
+    with ThreadPoolExecutor(max_workers=conexoes) as pool:
+        resultados = list(pool.map(executar, tarefas))
+
+    tipos = {(t, c): tipo for t, c, tipo in catalogo[['tabela', 'coluna', 'tipo']].itertuples(index=False)}
+    perfil = {}
+    for (tipo, tabela, detalhe, _), linhas in zip(tarefas, resultados):
+        if tipo == 'totais':
+            colunas, intervalo = detalhe
+            valores = linhas[0]
+            total = valores[0]
+            perfil[tabela] = {'linhas': total, 'colunas': {}, 'orfaos': {}}
+            for i, coluna in enumerate(colunas, start=1):
+                nulos = total - valores[i]
+                perfil[tabela]['colunas'][coluna] = {'tipo': tipos[(tabela, coluna)], 'nulos': nulos,
+                                                     'taxa_nulos': round(nulos / total, 6) if total else 0.0}
+            for j, coluna in enumerate(intervalo):
+                base = 1 + len(colunas) + 2 * j
+                perfil[tabela]['colunas'][coluna].update(min=_valor_json(valores[base]), max=_valor_json(valores[base + 1]))
+        elif tipo == 'dominio':
+            n = len(detalhe)
+            for k, coluna in enumerate(detalhe):
+                # GROUPING(c1..cn): o bit da coluna agrupada está zerado, os das outras ligados
+                bit = 1 << (n - 1 - k)
+                pares = [(_valor_json(linha[k]), linha[n + 1]) for linha in linhas if not linha[n] & bit]
+                perfil[tabela]['colunas'][coluna]['dominio'] = _histograma(pares)
+        else:
+            perfil[tabela]['orfaos'][detalhe] = linhas[0][0]
+    return perfil
+
+# ESTÁGIO: uma tarefa por tabela (leitura do Parquet + agregações em pandas); órfãos comparam com as chaves do pai
+def _perfil_tabela_df(df):
+    total = len(df)
+    colunas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        nulos = int(serie.isna().sum())
+        info = {'tipo': str(serie.dtype), 'nulos': nulos, 'taxa_nulos': round(nulos / total, 6) if total else 0.0}
+        if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie) or coluna.startswith('data_'):
+            validos = serie.dropna()
+            if coluna.startswith('data_') and serie.dtype == object: validos = pd.to_datetime(validos, errors='coerce').dropna()
+            info.update(min=_valor_json(validos.min()) if len(validos) else None,
+                        max=_valor_json(validos.max()) if len(validos) else None)
+        if serie.nunique(dropna=False) <= LIMITE_DOMINIO:
+            contagem = serie.value_counts(dropna=False)
+            info['dominio'] = _histograma([(_valor_json(v), n) for v, n in contagem.items()])
+        colunas[coluna] = info
+    return {'linhas': total, 'colunas': colunas, 'orfaos': {}}
+
+def perfil_do_estagio(pasta, conexoes=CONEXOES):
+    tabelas = sorted(n for n in os.listdir(pasta) if os.path.isdir(os.path.join(pasta, n)))
+    with ThreadPoolExecutor(max_workers=conexoes) as pool:
+        dados = dict(zip(tabelas, pool.map(lambda t: ler_tabela(pasta, t), tabelas)))
+    dados = {t: df for t, df in dados.items() if df is not None}
+    with ThreadPoolExecutor(max_workers=conexoes) as pool:
+        perfil = dict(zip(dados, pool.map(_perfil_tabela_df, dados.values())))
+
+    for tabela, coluna, referenciada, coluna_ref in chaves_estrangeiras_do_schema(ARQUIVO_SCHEMA):
+        if tabela not in dados or referenciada not in dados: continue
+        filhos = dados[tabela][coluna].dropna()
+        perfil[tabela]['orfaos'][f"{coluna} -> {referenciada}.{coluna_ref}"] = int((~filhos.isin(dados[referenciada][coluna_ref])).sum())
+    return perfil
+
+def imprimir_resumo(relatorio):
+    print(f"--- PERFIL DE QUALIDADE ({relatorio['fonte']}) ---")
+    for tabela, info in relatorio['tabelas'].items():
+        print(f"{tabela:<26} {info['linhas']:>12,} linhas")
+        for coluna, c in info['colunas'].items():
+            if c['taxa_nulos'] >= LIMITE_AVISO_NULOS:
+                print(f"  [AVISO] {coluna}: {c['taxa_nulos']:.1%} nulos")
+        for chave, n in info['orfaos'].items():
+            if n: print(f"  [AVISO] {chave}: {n:,} órfãos")
+        if 'data_notificacao' in info['colunas']:
+            c = info['colunas']['data_notificacao']
+            print(f"  Período: {c.get('min')} a {c.get('max')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de qualidade dos dados carregados (banco ou estágio Parquet)")
+    parser.add_argument("--fonte", choices=['auto', 'banco', 'estagio'], default='auto',
+                        help="auto: usa o estágio se ele estiver completo, senão o banco")
+    parser.add_argument("--estagio", default=PASTA_ESTAGIO)
+    parser.add_argument("--conexoes", type=int, default=CONEXOES)
+    parser.add_argument("--saida", default=ARQUIVO_RELATORIO)
+    args = parser.parse_args()
+
+    fonte = args.fonte
+    if fonte == 'auto': fonte = 'estagio' if os.path.exists(os.path.join(args.estagio, ARQUIVO_METADADOS)) else 'banco'
+
+    inicio = time.time()
+    if fonte == 'estagio':
+        tabelas, descricao = perfil_do_estagio(args.estagio, args.conexoes), f"estagio:{args.estagio}"
+    else:
+        tabelas, descricao = perfil_do_banco(create_engine(CONN_STRING), conexoes=args.conexoes), "banco"
+    relatorio = {'fonte': descricao, 'gerado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'duracao_s': round(time.time() - inicio, 2), 'tabelas': tabelas}
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+    imprimir_resumo(relatorio)
+    print(f"[TEMPO] {relatorio['duracao_s']}s | [OK] Relatório salvo em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ESTÁGIO PARQUET: tabelas já limpas e tipadas, uma pasta por tabela, particionadas por mês e UF da notificação.
+# As partições não viram pastas (seriam arquivos demais: tabelas x meses x UFs x blocos); cada tabela recebe um
+# arquivo por parte (LINHAS_POR_PARTE notificações acumuladas), ordenado por partição, com o índice das partições
+# (mes, uf, primeira linha, linhas) no rodapé do arquivo
+TABELAS_DIMENSAO = ['estado', 'municipio', 'sintoma', 'condicao']
+PARTICAO_DESCONHECIDA = "desconhecido"
+ARQUIVO_METADADOS = "_metadados.json"
+LINHAS_POR_PARTE = 200_000
+LINHAS_POR_GRUPO = 65_536  # row group do Parquet: menor unidade lida quando só algumas partições interessam
+CHAVE_INDICE = b"particoes"
+
+def particoes_da_notificacao(df_notificacao):
+    datas = pd.to_datetime(df_notificacao['data_notificacao'], errors='coerce')
+    return pd.DataFrame({
+        'mes': datas.dt.strftime('%Y-%m').fillna(PARTICAO_DESCONHECIDA).to_numpy(),
+        'uf': df_notificacao['estado_notificacao_ibge'].astype('Int64').astype(str)
+              .replace('<NA>', PARTICAO_DESCONHECIDA).to_numpy(),
+    }, index=df_notificacao['notificacao_id'].to_numpy())
+
+class EstagioParquet:
+    """Grava os blocos do ETL em <pasta>/<tabela>/parteNNNNN.parquet.
+
+    Os blocos ficam na memória até somarem LINHAS_POR_PARTE notificações; aí cada tabela vira um arquivo, com as
+    linhas ordenadas por (mes, uf). Dimensões não são particionadas. O arquivo de metadados só é escrito no fim:
+    sem ele o estágio está incompleto.
+    """
+
+    def __init__(self, pasta, linhas_por_parte=LINHAS_POR_PARTE):
+        self.pasta = pasta
+        self.linhas_por_parte = linhas_por_parte
+        self.n_bloco = 0
+        self.n_parte = 0
+        self.pendentes = {}  # tabela -> DataFrames (com as colunas _mes/_uf) ainda não gravados
+        self.notificacoes_pendentes = 0
+        # Residências que ficam pendentes chegam em blocos seguintes, mas vão para a partição da sua notificação
+        self.particoes_pendentes = None
+        if os.path.exists(pasta): shutil.rmtree(pasta)
+        os.makedirs(pasta)
+
+    def gravar(self, tabelas, epidem_pendente=None):
+        self.n_bloco += 1
+        particoes = particoes_da_notificacao(tabelas['notificacao'])
+        if self.particoes_pendentes is not None: particoes = pd.concat([self.particoes_pendentes, particoes])
+        for nome, df in tabelas.items():
+            if nome not in TABELAS_DIMENSAO:
+                chaves = particoes.reindex(df['notificacao_id'].to_numpy()).fillna(PARTICAO_DESCONHECIDA)
+                df = df.assign(_mes=chaves['mes'].to_numpy(), _uf=chaves['uf'].to_numpy())
+            self.pendentes.setdefault(nome, []).append(df)
+        if epidem_pendente is not None:
+            self.particoes_pendentes = particoes[particoes.index.isin(epidem_pendente['notificacao_id'])]
+        self.notificacoes_pendentes += len(tabelas['notificacao'])
+        if self.notificacoes_pendentes >= self.linhas_por_parte: self._descarregar()
+
+    def _descarregar(self):
+        if not self.pendentes: return
+        self.n_parte += 1
+        for nome, partes in self.pendentes.items():
+            # Também grava tabelas vazias: o arquivo mantém o schema da tabela
+            df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+            indice = None
+            if nome not in TABELAS_DIMENSAO:
+                df = df.sort_values(['_mes', '_uf'], kind='stable', ignore_index=True)
+                tamanhos = df.groupby(['_mes', '_uf'], sort=False).size()
+                inicios = np.concatenate([[0], np.cumsum(tamanhos.to_numpy())[:-1]])
+                indice = [[mes, uf, int(i), int(n)] for (mes, uf), i, n in zip(tamanhos.index, inicios, tamanhos.to_numpy())]
+                df = df.drop(columns=['_mes', '_uf'])
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if indice is not None:
+                tabela = tabela.replace_schema_metadata({**tabela.schema.metadata, CHAVE_INDICE: json.dumps(indice).encode()})
+            caminho = os.path.join(self.pasta, nome, f"parte{self.n_parte:05d}.parquet")
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            pq.write_table(tabela, caminho, row_group_size=LINHAS_POR_GRUPO)
+        self.pendentes = {}
+        self.notificacoes_pendentes = 0
+
+    def finalizar(self, metadados):
+        self._descarregar()
+        with open(os.path.join(self.pasta, ARQUIVO_METADADOS), "w", encoding="utf-8") as f:
+            json.dump(dict(metadados, blocos=self.n_bloco, partes=self.n_parte), f, ensure_ascii=False, indent=2)
+
+def ler_metadados(pasta):
+    caminho = os.path.join(pasta, ARQUIVO_METADADOS)
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f"Estágio em '{pasta}' inexistente ou incompleto (sem {ARQUIVO_METADADOS})")
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+def _ler_arquivos(arquivos, colunas=None):
+    if not arquivos: return None
+    return pd.concat([pd.read_parquet(a, columns=colunas) for a in arquivos], ignore_index=True)
+
+def _ler_particoes(arquivo, colunas, meses, ufs):
+    # Só os row groups que contêm alguma partição pedida são lidos; dentro deles, só as linhas das partições
+    arquivo_pq = pq.ParquetFile(arquivo)
+    indice = (arquivo_pq.schema_arrow.metadata or {}).get(CHAVE_INDICE)
+    if indice is None: return arquivo_pq.read(columns=colunas).to_pandas()  # dimensão: não particionada
+    faixas = [(inicio, inicio + n) for mes, uf, inicio, n in json.loads(indice)
+              if (meses is None or mes in meses) and (ufs is None or uf in ufs)]
+    limites = np.cumsum([0] + [arquivo_pq.metadata.row_group(i).num_rows for i in range(arquivo_pq.num_row_groups)])
+    grupos = sorted({g for de, ate in faixas for g in range(np.searchsorted(limites, de, 'right') - 1, np.searchsorted(limites, ate, 'left'))})
+    df = arquivo_pq.read_row_groups(grupos, columns=colunas).to_pandas()
+    # Posição de cada linha pedida dentro dos row groups lidos
+    deslocamento = np.cumsum([0] + [limites[g + 1] - limites[g] for g in grupos])
+    inicio_grupo = dict(zip(grupos, deslocamento[:-1] - limites[grupos]))
+    posicoes = [np.arange(de, ate) + inicio_grupo[np.searchsorted(limites, de, 'right') - 1] for de, ate in faixas if ate > de]
+    return df.take(np.concatenate(posicoes)).reset_index(drop=True) if posicoes else df.iloc[:0]
+
+def arquivos_da_tabela(pasta, nome):
+    return sorted(glob.glob(os.path.join(pasta, nome, "*.parquet")))
+
+def ler_tabela(pasta, nome, colunas=None, meses=None, ufs=None):
+    """DataFrame da tabela no estágio (None se ela não foi gravada). meses/ufs descartam partições sem ler as linhas delas."""
+    arquivos = arquivos_da_tabela(pasta, nome)
+    if not arquivos or (meses is None and ufs is None): return _ler_arquivos(arquivos, colunas)
+    meses = None if meses is None else set(meses)
+    ufs = None if ufs is None else set(map(str, ufs))
+    return pd.concat([_ler_particoes(a, colunas, meses, ufs) for a in arquivos], ignore_index=True)
+
+def ler_estagio(pasta, por_parte=False):
+    """Gera dicionários tabela -> DataFrame prontos para a carga.
+
+    por_parte=False: um único dicionário com todas as tabelas.
+    por_parte=True: primeiro as dimensões, depois um dicionário por parte gravada, com as notificações dela e as
+    suas dependentes. Uma residência que ficou pendente pode cair numa parte seguinte à da sua notificação, mas
+    nunca numa anterior, então carregar as partes em ordem respeita as chaves estrangeiras.
+    """
+    ler_metadados(pasta)
+    nomes = sorted(n for n in os.listdir(pasta) if os.path.isdir(os.path.join(pasta, n)))
+    if not por_parte:
+        yield {n: _ler_arquivos(arquivos_da_tabela(pasta, n)) for n in nomes}
+        return
+
+    yield {n: _ler_arquivos(arquivos_da_tabela(pasta, n)) for n in nomes if n in TABELAS_DIMENSAO}
+    por_arquivo = {}
+    for nome in nomes:
+        if nome in TABELAS_DIMENSAO: continue
+        for arquivo in arquivos_da_tabela(pasta, nome):
+            por_arquivo.setdefault(os.path.basename(arquivo), {})[nome] = arquivo
+    for parte in sorted(por_arquivo):
+        yield {nome: pd.read_parquet(arquivo) for nome, arquivo in por_arquivo[parte].items()}
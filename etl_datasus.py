@@ -1,280 +1,853 @@
-import pandas as pd
-import numpy as np
-import os
-import re
-
-from sqlalchemy import create_engine, text 
-import time
-import unicodedata
-from difflib import get_close_matches
-
-# CONFIG
-DB_USER = "postgres"
-DB_PASS = "201005"   
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "Deus Me Ajude"
-
-CONN_STRING = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-ARQUIVO_CSV = "DataSUS.csv"
-PASTA_SAIDA = "csv_final"
-
-os.makedirs(PASTA_SAIDA, exist_ok=True)
-
-# TABELA DE REFERÊNCIA (A SALVAÇÃO DO ESTADO)
-
-MAPA_ESTADOS_IBGE = {
-    "PARA": 15, "PA": 15
-}
-
-# LISTAS DE WHITELIST
-SINTOMAS_VALIDOS = [
-    "Febre", "Tosse", "Dor De Garganta", "Dificuldade Respiratoria", 
-    "Mialgia", "Dor No Corpo", "Diarreia", "Vomito", "Nausea",
-    "Perda De Olfato", "Perda De Paladar", "Coriza", "Congestao Nasal",
-    "Dor De Cabeca", "Cefaleia", "Fadiga", "Adinamia", "Fraqueza",
-    "Dor Abdominal", "Dor Toracica", "Dor Lombar", "Dor Nos Olhos",
-    "Calafrios", "Tontura", "Irritabilidade", "Sonolencia", "Mal Estar",
-    "Assintomatico", "Cianose", "Hemoptise", "Espirros", "Producao De Catarro"
-]
-
-CONDICOES_VALIDAS = [
-    "Diabetes", "Doenca Cardiovascular", "Hipertensao", "Doenca Respiratoria",
-    "Obesidade", "Imunossupressao", "Doenca Renal", "Doenca Hepatica",
-    "Doenca Neurologica", "Gestante", "Puerpera", "Sindrome De Down",
-    "Neoplasia", "Cancer", "Asma", "Bronquite", "Tabagismo",
-    "Doenca Hematologica", "Hipotireoidismo", "Idoso", "Profissional De Saude"
-]
-
-DE_PARA_FORCADO = {
-    "agia": "Dor", "algia": "Dor", "dores": "Dor", "adinafagia": "Dor De Garganta",
-    "odinofagia": "Dor De Garganta", "ansia": "Nausea", "emese": "Vomito",
-    "cabeca": "Dor De Cabeca", "enxaqueca": "Dor De Cabeca",
-    "dispineia": "Dificuldade Respiratoria", "falta de ar": "Dificuldade Respiratoria",
-    "cansaco": "Fadiga", "anosmia": "Perda De Olfato", "ageusia": "Perda De Paladar",
-    "febril": "Febre", "temperatura": "Febre", "corpo": "Dor No Corpo", "juntas": "Dor No Corpo",
-    "vertigem": "Tontura", "vertiegem": "Tontura", "disenteria": "Diarreia",
-    "cardio": "Doenca Cardiovascular", "coracao": "Doenca Cardiovascular",
-    "pulmao": "Doenca Respiratoria", "dpoc": "Doenca Respiratoria",
-    "renal": "Doenca Renal", "rim": "Doenca Renal", "figado": "Doenca Hepatica",
-    "imuno": "Imunossupressao", "gravida": "Gestante", "pressao": "Hipertensao", "has": "Hipertensao",
-    "acidente": None, "trauma": None, "fratura": None, 
-    "alzaimer": "Doenca Neurologica", "alzheimer": "Doenca Neurologica",
-    "alergia": None, "ansiedade": None, "depressao": None 
-}
-
-# FUNÇÕES DE LIMPEZA
-def normalizar_texto(texto):
-    if not isinstance(texto, str): return ""
-    texto = texto.upper().strip() 
-    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-
-def recuperar_id_estado(row):
-    id_atual = row.get('estadoNotificacaoIBGE')
-    if pd.notna(id_atual):
-        try: return int(float(id_atual))
-        except: pass
-    nome_estado = row.get('estadoNotificacao')
-    if pd.notna(nome_estado):
-        nome_norm = normalizar_texto(str(nome_estado))
-        if nome_norm in MAPA_ESTADOS_IBGE:
-            return MAPA_ESTADOS_IBGE[nome_norm]
-    return None
-
-def identificar_termo_canonico(texto_sujo, lista_valida):
-    if not isinstance(texto_sujo, str): return None
-    limpo = re.sub(r'^[\d\W_]+', '', texto_sujo).strip().replace(";", "").replace('"', '').replace("'", "")
-    if len(limpo) < 3: return None 
-    busca = limpo.lower()
-    busca_norm = ''.join(c for c in unicodedata.normalize('NFD', busca) if unicodedata.category(c) != 'Mn')
-    
-    termos_bloqueados = ['teste', 'exame', 'covid', 'positivo', 'negativo', 'reagente', 'igg', 'igm', 'saturacao']
-    if any(x in busca_norm for x in termos_bloqueados): return None
-    
-    for chave, valor in DE_PARA_FORCADO.items():
-        if chave in busca_norm:
-            if valor is None: return None
-            if valor in lista_valida: return valor
-
-    matches = get_close_matches(limpo.title(), lista_valida, n=1, cutoff=0.75)
-    if matches: return matches[0]
-    return None
-
-def processar_multivalorados(row, col_padrao, col_outros, lista_referencia):
-    items = set()
-    regex_split = r"[;,/|+]|\s+[eE]\s+|\s+-\s+"
-    raw_text_list = []
-    if col_padrao in row and pd.notna(row[col_padrao]): raw_text_list.append(str(row[col_padrao]))
-    if col_outros in row and pd.notna(row[col_outros]): raw_text_list.append(str(row[col_outros]))
-    for texto in raw_text_list:
-        pedacos = re.split(regex_split, texto)
-        for p in pedacos:
-            termo_correto = identificar_termo_canonico(p, lista_referencia)
-            if termo_correto: items.add(termo_correto)
-    return list(items) if items else np.nan
-
-def limpar_string(x):
-    if isinstance(x, str):
-        x = x.strip().replace(';', ',').replace('\n', ' ').replace('\r', '').replace('\\', '')
-        if x in ["", "nan", "NaN", "null", "None", "undefined"]: return None
-        return x
-    return x
-
-def limpar_datas(df, colunas):
-    for col in colunas:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], dayfirst=True, errors="coerce", format='mixed').dt.date
-    return df
-
-def limpar_inteiros(df, colunas):
-    for col in colunas:
-        if col in df.columns:
-            series_num = pd.to_numeric(df[col], errors='coerce')
-            df[col] = series_num.astype('Int64')
-    return df
-
-def inserir_via_copy(engine, nome_tabela, df, colunas_explicit=None):
-    if df.empty: return
-    arquivo_tmp = os.path.join(PASTA_SAIDA, f"{nome_tabela}_temp.csv")
-    df.to_csv(arquivo_tmp, index=False, header=False, sep=';', na_rep='')
-    try:
-        with engine.connect() as conn:
-            with conn.begin(): 
-                cursor = conn.connection.cursor()
-                with open(arquivo_tmp, 'r', encoding='utf-8') as f:
-                    if colunas_explicit:
-                        cursor.copy_from(f, nome_tabela, sep=';', null='', columns=colunas_explicit)
-                    else:
-                        cursor.copy_from(f, nome_tabela, sep=';', null='')
-        print(f"  [OK] Inseridos {len(df)} registros em '{nome_tabela}'.")
-    except Exception as e:
-        print(f"  [ERRO] Falha em '{nome_tabela}': {e}")
-    finally:
-        if os.path.exists(arquivo_tmp): os.remove(arquivo_tmp)
-
-def gerar_relatorio_estatistico(df_raw, outliers_idade_count, linhas_finais):
-    total_linhas = len(df_raw)
-    nulos = df_raw.isnull().sum()
-    nulos_pct = (nulos / total_linhas) * 100
-    top_nulos = nulos_pct.sort_values(ascending=False).head(10)
-    with open("relatorio_integridade.txt", "w", encoding="utf-8") as f:
-        f.write("RELATÓRIO ESTATÍSTICO DE INTEGRIDADE DE DADOS (ETL)\n\n")
-        f.write(f"TOTAL DE REGISTROS: {total_linhas}\n\n1. DADOS FALTANTES\n")
-        for col, pct in top_nulos.items(): f.write(f"{col:<30}: {pct:.2f}% nulos\n")
-        f.write(f"\n2. OUTLIERS\nIdades Inválidas: {outliers_idade_count}\n")
-        f.write(f"\n3. SUCESSO\nRegistros no Banco: {linhas_finais}\n")
-    print(f"  [OK] Relatório salvo.")
-
-# EXECUÇÃO DO ETL
-print("--- Iniciando Leitura do CSV ---")
-start_time = time.time()
-
-df = pd.read_csv(ARQUIVO_CSV, sep=",", dtype=str, low_memory=False)
-df.columns = df.columns.str.strip()
-df["id_gerado"] = range(1, len(df) + 1)
-
-print("--- Reparando Códigos IBGE de Estados ---")
-df['estadoNotificacaoIBGE'] = df.apply(recuperar_id_estado, axis=1)
-df['estadoNotificacaoIBGE'] = df['estadoNotificacaoIBGE'].astype('Int64')
-
-outliers_idade = 0
-if 'idade' in df.columns:
-    idades_num = pd.to_numeric(df['idade'], errors='coerce')
-    outliers_idade = idades_num[(idades_num < 0) | (idades_num > 120)].count()
-
-print("--- Limpeza Básica ---")
-df = df.map(limpar_string)
-colunas_data = ["dataNotificacao", "dataInicioSintomas", "dataEncerramento", "dataPrimeiraDose", "dataSegundaDose"]
-df = limpar_datas(df, colunas_data)
-
-colunas_inteiras = ["idade", "totalTestesRealizados", "municipioNotificacaoIBGE", "municipioIBGE", "estadoIBGE"]
-df = limpar_inteiros(df, colunas_inteiras)
-if 'idade' in df.columns: df.loc[(df["idade"] < 0) | (df["idade"] > 130), "idade"] = None
-
-print("--- Processando Geografia ---")
-df_estados = df[['estadoNotificacaoIBGE', 'estadoNotificacao']].dropna(subset=['estadoNotificacaoIBGE'])
-df_estados = df_estados.sort_values('estadoNotificacao').drop_duplicates(subset=['estadoNotificacaoIBGE'])
-df_estados.columns = ['estado_ibge', 'nome']
-df_estados['sigla'] = None 
-
-df_mun = df[['municipioNotificacaoIBGE', 'municipioNotificacao', 'estadoNotificacaoIBGE']].dropna(subset=['municipioNotificacaoIBGE'])
-df_mun = df_mun.drop_duplicates(subset=['municipioNotificacaoIBGE'])
-df_mun.columns = ['municipio_ibge', 'nome', 'estado_ibge']
-municipios_validos = set(df_mun['municipio_ibge'].dropna().unique())
-
-df_notificacao = df[['id_gerado', 'source_id', 'dataNotificacao', 'municipioNotificacaoIBGE', 'estadoNotificacaoIBGE', 'excluido', 'validado']].copy()
-map_bool = {'True': True, 'False': False, 'Sim': True, 'Não': False, '1': True, '0': False}
-df_notificacao['excluido'] = df_notificacao['excluido'].map(map_bool).fillna(False)
-df_notificacao['validado'] = df_notificacao['validado'].map(map_bool).fillna(False)
-df_notificacao.columns = ['notificacao_id', 'source_id', 'data_notificacao', 'municipio_notificacao_ibge', 'estado_notificacao_ibge', 'excluido', 'validado']
-
-df_demog = df[['id_gerado', 'idade', 'sexo', 'racaCor', 'profissionalSaude', 'profissionalSeguranca', 'cbo', 'codigoContemComunidadeTradicional']].copy()
-df_demog['codigoContemComunidadeTradicional'] = df_demog['codigoContemComunidadeTradicional'].map({'1': True, '0': False}).fillna(False)
-df_demog.columns = ['notificacao_id', 'idade', 'sexo', 'raca_cor', 'is_profissional_saude', 'is_profissional_seguranca', 'cbo', 'pertence_comunidade_tradicional']
-
-df_clin = df[['id_gerado', 'dataInicioSintomas', 'dataEncerramento', 'classificacaoFinal', 'evolucaoCaso', 'outrosSintomas', 'outrasCondicoes', 'totalTestesRealizados']].copy()
-for c in ['classificacaoFinal', 'evolucaoCaso', 'outrosSintomas', 'outrasCondicoes']:
-    if c in df_clin.columns: df_clin[c] = df_clin[c].astype(str).str.replace(';', ',').str.slice(0, 149)
-df_clin.columns = ['notificacao_id', 'data_inicio_sintomas', 'data_encerramento', 'classificacao_final', 'evolucao_caso', 'outros_sintomas', 'outras_condicoes', 'total_testes_realizados']
-
-df_epidem = df[['id_gerado', 'origem', 'municipioIBGE', 'estadoIBGE']].copy()
-df_epidem.columns = ['notificacao_id', 'origem_dados', 'municipio_residencia_ibge', 'estado_residencia_ibge']
-df_epidem = df_epidem[df_epidem['municipio_residencia_ibge'].isin(municipios_validos)]
-
-cols_gestao = ['id_gerado', 'codigoEstrategiaCovid', 'codigoBuscaAtivaAssintomatico', 'outroBuscaAtivaAssintomatico', 'codigoTriagemPopulacaoEspecifica', 'outroTriagemPopulacaoEspecifica', 'codigoLocalRealizacaoTestagem', 'outroLocalRealizacaoTestagem']
-df_gestao = df[[c for c in cols_gestao if c in df.columns]].copy()
-col_names = ['notificacao_id', 'codigo_estrategia_covid', 'codigo_busca_ativa_assintomatico', 'outro_busca_ativa_assintomatico', 'codigo_triagem_populacao_especifica', 'outro_triagem_populacao_especifica', 'codigo_local_realizacao_testagem', 'outro_local_realizacao_testagem']
-df_gestao.columns = col_names[:len(df_gestao.columns)]
-
-print("--- Processando Sintomas e Condições ---")
-df["lista_final_sintomas"] = df.apply(lambda x: processar_multivalorados(x, "sintomas", "outrosSintomas", SINTOMAS_VALIDOS), axis=1)
-col_cond = "condicoes" if "condicoes" in df.columns else "comorbidades"
-df["lista_final_condicoes"] = df.apply(lambda x: processar_multivalorados(x, col_cond, "outrasCondicoes", CONDICOES_VALIDAS), axis=1)
-
-def preparar_tabelas_dim(df_source, col_lista):
-    df_temp = df_source[['id_gerado', col_lista]].explode(col_lista)
-    df_temp = df_temp.dropna(subset=[col_lista])
-    dim = df_temp[[col_lista]].drop_duplicates().sort_values(by=col_lista).reset_index(drop=True)
-    dim['id'] = dim.index + 1
-    dim.columns = ['nome', 'id']
-    bridge = df_temp.merge(dim, left_on=col_lista, right_on='nome', how='inner')
-    bridge = bridge[['id_gerado', 'id']]
-    return dim, bridge
-
-df_sintomas_dim, df_notificacao_sintoma = preparar_tabelas_dim(df, "lista_final_sintomas")
-df_condicoes_dim, df_notificacao_condicao = preparar_tabelas_dim(df, "lista_final_condicoes")
-
-print("\n--- INICIANDO CARGA ---")
-try:
-    engine = create_engine(CONN_STRING)
-    with engine.connect() as conn:
-        conn.execute(text("TRUNCATE TABLE notificacao CASCADE;"))
-        conn.execute(text("TRUNCATE TABLE municipio CASCADE;"))
-        conn.execute(text("TRUNCATE TABLE estado CASCADE;"))
-        conn.commit()
-
-    inserir_via_copy(engine, 'estado', df_estados)
-    inserir_via_copy(engine, 'municipio', df_mun)
-    inserir_via_copy(engine, 'notificacao', df_notificacao)
-    inserir_via_copy(engine, 'dados_demograficos', df_demog)
-    inserir_via_copy(engine, 'dados_clinicos', df_clin)
-    inserir_via_copy(engine, 'dados_epidemiologicos', df_epidem)
-    inserir_via_copy(engine, 'dados_gestao_estrategia', df_gestao)
-    
-    if not df_sintomas_dim.empty:
-        df_sintomas_dim = df_sintomas_dim[['id', 'nome']]
-        inserir_via_copy(engine, 'sintoma', df_sintomas_dim, colunas_explicit=['sintoma_id', 'nome'])
-        df_notificacao_sintoma.columns = ['notificacao_id', 'sintoma_id']
-        inserir_via_copy(engine, 'notificacao_sintoma', df_notificacao_sintoma)
-        
-    if not df_condicoes_dim.empty:
-        df_condicoes_dim = df_condicoes_dim[['id', 'nome']]
-        inserir_via_copy(engine, 'condicao', df_condicoes_dim, colunas_explicit=['condicao_id', 'nome'])
-        df_notificacao_condicao.columns = ['notificacao_id', 'condicao_id']
-        inserir_via_copy(engine, 'notificacao_condicao', df_notificacao_condicao)
-        
-    gerar_relatorio_estatistico(df, outliers_idade, len(df_notificacao))
-    print("\n--- SUCESSO! ---")
-
-except Exception as e:
-    print(f"\nERRO: {e}")
\ No newline at end of file
+import pandas as pd
+import numpy as np
+import os
+import sys
+import glob
+import argparse
+import datetime
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sqlalchemy import create_engine, text 
+import time
+import unicodedata
+
+from canonicalizador import Canonicalizador
+from instrumentacao import Instrumentacao, perfilar
+from estagio import EstagioParquet, ler_estagio, ler_metadados
+from carga import (copiar_dataframe, carregar_em_paralelo, dependencias_do_schema, verificar_superusuario,
+                   remover_indices_secundarios, recriar_indices, validar_chaves_estrangeiras, registrar_log_carga,
+                   upsert_via_staging, classificar_por_source_id)
+
+# CONFIG
+DB_USER = "postgres"
+DB_PASS = "201005"   
+DB_HOST = "localhost"
+DB_PORT = "5432"
+DB_NAME = "Deus Me Ajude"
+
+CONN_STRING = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ARQUIVO_CSV = "DataSUS.csv"
+PASTA_SAIDA = "csv_final"
+
+# MODO STREAMING: lê o CSV em blocos para o arquivo inteiro nunca precisar caber na RAM
+MODO_STREAMING = False
+LIMITE_MEMORIA_MB = 1024
+FATOR_EXPANSAO_MEMORIA = 6  # cópias intermediárias de um bloco durante limpeza e separação
+
+# LIMPEZA PARALELA: cada arquivo (ou bloco, no streaming) é lido e limpo num processo; ids e dimensões são
+# consolidados no processo principal, na ordem dos arquivos
+PROCESSOS_LIMPEZA = os.cpu_count() or 1
+
+# COPY direto da memória; o formato binário evita o parse de texto no servidor
+COPY_BINARIO = False
+
+# CARGA PARALELA: tabelas independentes (pelas FKs do schema) são copiadas ao mesmo tempo
+CONEXOES_CARGA = 4
+ARQUIVO_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Banco 689.0.sql")
+
+# CARGA EM MASSA: COPY sem gatilhos de auditoria nem checagem de FK por linha; índices e FKs tratados no final
+CARGA_EM_MASSA = False
+TABELAS_CARGA = ['estado', 'municipio', 'notificacao', 'dados_demograficos', 'dados_clinicos', 'dados_epidemiologicos',
+                 'dados_gestao_estrategia', 'sintoma', 'notificacao_sintoma', 'condicao', 'notificacao_condicao',
+                 'teste_laboratorial', 'vacina_aplicada']
+
+# CARGA INCREMENTAL: sem TRUNCATE; só notificações novas/alteradas (por source_id + hash da linha) são gravadas
+MODO_INCREMENTAL = False
+TABELAS_DEPENDENTES = ['dados_demograficos', 'dados_clinicos', 'dados_epidemiologicos', 'dados_gestao_estrategia',
+                       'notificacao_sintoma', 'notificacao_condicao', 'teste_laboratorial', 'vacina_aplicada']
+CHAVES_DIMENSOES = {'estado': ['estado_ibge'], 'municipio': ['municipio_ibge'], 'sintoma': ['sintoma_id'], 'condicao': ['condicao_id']}
+TABELAS_REPETIDAS = ['teste_laboratorial', 'vacina_aplicada']  # teste_id/vacina_id vêm da SERIAL do banco
+CHAVES_PONTES = {'notificacao_sintoma': ['notificacao_id', 'sintoma_id'], 'notificacao_condicao': ['notificacao_id', 'condicao_id']}
+# hash_registro: sempre as mesmas colunas (as do export do DataSUS; ausentes contam como nulas), cada valor como texto
+# canônico. Assim o hash não depende dos dtypes inferidos no bloco nem de como a entrada foi dividida
+COLUNAS_HASH = ['cbo', 'classificacaoFinal', 'codigoBuscaAtivaAssintomatico', 'codigoContemComunidadeTradicional',
+                'codigoDosesVacina', 'codigoEstadoTeste1', 'codigoEstadoTeste2', 'codigoEstadoTeste3',
+                'codigoEstadoTeste4', 'codigoEstrategiaCovid', 'codigoFabricanteTeste1', 'codigoFabricanteTeste2',
+                'codigoFabricanteTeste3', 'codigoFabricanteTeste4', 'codigoLaboratorioPrimeiraDose',
+                'codigoLaboratorioSegundaDose', 'codigoLocalRealizacaoTestagem', 'codigoRecebeuVacina',
+                'codigoResultadoTeste1', 'codigoResultadoTeste2', 'codigoResultadoTeste3', 'codigoResultadoTeste4',
+                'codigoTipoTeste1', 'codigoTipoTeste2', 'codigoTipoTeste3', 'codigoTipoTeste4',
+                'codigoTriagemPopulacaoEspecifica', 'condicoes', 'dataColetaTeste1', 'dataColetaTeste2',
+                'dataColetaTeste3', 'dataColetaTeste4', 'dataEncerramento', 'dataInicioSintomas', 'dataNotificacao',
+                'dataPrimeiraDose', 'dataSegundaDose', 'estado', 'estadoIBGE', 'estadoNotificacao',
+                'estadoNotificacaoIBGE', 'evolucaoCaso', 'excluido', 'idade', 'lotePrimeiraDose', 'loteSegundaDose',
+                'municipio', 'municipioIBGE', 'municipioNotificacao', 'municipioNotificacaoIBGE', 'origem',
+                'outrasCondicoes', 'outroBuscaAtivaAssintomatico', 'outroLocalRealizacaoTestagem',
+                'outroTriagemPopulacaoEspecifica', 'outrosSintomas', 'profissionalSaude', 'profissionalSeguranca',
+                'racaCor', 'sexo', 'sintomas', 'source_id', 'totalTestesRealizados', 'validado']
+NULO_HASH = "\\N"
+
+# ESTÁGIO PARQUET: tabelas limpas gravadas em disco entre a limpeza e a carga; a carga pode partir só dele
+GRAVAR_ESTAGIO = False
+PASTA_ESTAGIO = os.path.join(PASTA_SAIDA, "estagio")
+
+# ÍNDICES DE ACESSO (seção 6 do schema): recriados em bancos antigos a cada carga
+INDICES_ACESSO = {
+    'idx_notificacao_data': "notificacao (data_notificacao, municipio_notificacao_ibge) INCLUDE (notificacao_id)",
+    'idx_notificacao_municipio': "notificacao (municipio_notificacao_ibge)",
+    'idx_teste_laboratorial_notificacao': "teste_laboratorial (notificacao_id)",
+    'idx_vacina_aplicada_notificacao': "vacina_aplicada (notificacao_id, dose_numero)",
+    'idx_notificacao_sintoma_sintoma': "notificacao_sintoma (sintoma_id)",
+    'idx_notificacao_condicao_condicao': "notificacao_condicao (condicao_id)",
+}
+
+# INSTRUMENTAÇÃO: parede, CPU, pico de memória e linhas por etapa vão sempre para o relatório e para log_carga;
+# cProfile (só o processo principal) e tracemalloc ficam atrás de flags porque pesam na execução
+PERFILAR = False
+RASTREAR_MEMORIA = False
+ARQUIVO_PERFIL = os.path.join(PASTA_SAIDA, "perfil_etl")
+COLUNAS_LOG_ETAPAS = {'execucao_id': "INTEGER REFERENCES log_carga(id) ON DELETE CASCADE", 'etapa': "VARCHAR(100)",
+                      'chamadas': "INTEGER", 'duracao_s': "DOUBLE PRECISION", 'cpu_s': "DOUBLE PRECISION",
+                      'pico_memoria_mb': "DOUBLE PRECISION", 'linhas_entrada': "BIGINT", 'linhas_saida': "BIGINT"}
+
+os.makedirs(PASTA_SAIDA, exist_ok=True)
+
+# TABELA DE REFERÊNCIA (A SALVAÇÃO DO ESTADO): código IBGE -> (sigla, nome normalizado)
+UFS_IBGE = {
+    11: ("RO", "RONDONIA"), 12: ("AC", "ACRE"), 13: ("AM", "AMAZONAS"), 14: ("RR", "RORAIMA"), 15: ("PA", "PARA"),
+    16: ("AP", "AMAPA"), 17: ("TO", "TOCANTINS"), 21: ("MA", "MARANHAO"), 22: ("PI", "PIAUI"), 23: ("CE", "CEARA"),
+    24: ("RN", "RIO GRANDE DO NORTE"), 25: ("PB", "PARAIBA"), 26: ("PE", "PERNAMBUCO"), 27: ("AL", "ALAGOAS"),
+    28: ("SE", "SERGIPE"), 29: ("BA", "BAHIA"), 31: ("MG", "MINAS GERAIS"), 32: ("ES", "ESPIRITO SANTO"),
+    33: ("RJ", "RIO DE JANEIRO"), 35: ("SP", "SAO PAULO"), 41: ("PR", "PARANA"), 42: ("SC", "SANTA CATARINA"),
+    43: ("RS", "RIO GRANDE DO SUL"), 50: ("MS", "MATO GROSSO DO SUL"), 51: ("MT", "MATO GROSSO"), 52: ("GO", "GOIAS"),
+    53: ("DF", "DISTRITO FEDERAL"),
+}
+MAPA_ESTADOS_IBGE = {chave: codigo for codigo, (sigla, nome) in UFS_IBGE.items() for chave in (sigla, nome)}
+SIGLAS_IBGE = {codigo: sigla for codigo, (sigla, _) in UFS_IBGE.items()}
+NOMES_IBGE = {codigo: nome for codigo, (_, nome) in UFS_IBGE.items()}
+
+# LISTAS DE WHITELIST
+SINTOMAS_VALIDOS = [
+    "Febre", "Tosse", "Dor De Garganta", "Dificuldade Respiratoria", 
+    "Mialgia", "Dor No Corpo", "Diarreia", "Vomito", "Nausea",
+    "Perda De Olfato", "Perda De Paladar", "Coriza", "Congestao Nasal",
+    "Dor De Cabeca", "Cefaleia", "Fadiga", "Adinamia", "Fraqueza",
+    "Dor Abdominal", "Dor Toracica", "Dor Lombar", "Dor Nos Olhos",
+    "Calafrios", "Tontura", "Irritabilidade", "Sonolencia", "Mal Estar",
+    "Assintomatico", "Cianose", "Hemoptise", "Espirros", "Producao De Catarro"
+]
+
+CONDICOES_VALIDAS = [
+    "Diabetes", "Doenca Cardiovascular", "Hipertensao", "Doenca Respiratoria",
+    "Obesidade", "Imunossupressao", "Doenca Renal", "Doenca Hepatica",
+    "Doenca Neurologica", "Gestante", "Puerpera", "Sindrome De Down",
+    "Neoplasia", "Cancer", "Asma", "Bronquite", "Tabagismo",
+    "Doenca Hematologica", "Hipotireoidismo", "Idoso", "Profissional De Saude"
+]
+
+DE_PARA_FORCADO = {
+    "agia": "Dor", "algia": "Dor", "dores": "Dor", "adinafagia": "Dor De Garganta",
+    "odinofagia": "Dor De Garganta", "ansia": "Nausea", "emese": "Vomito",
+    "cabeca": "Dor De Cabeca", "enxaqueca": "Dor De Cabeca",
+    "dispineia": "Dificuldade Respiratoria", "falta de ar": "Dificuldade Respiratoria",
+    "cansaco": "Fadiga", "anosmia": "Perda De Olfato", "ageusia": "Perda De Paladar",
+    "febril": "Febre", "temperatura": "Febre", "corpo": "Dor No Corpo", "juntas": "Dor No Corpo",
+    "vertigem": "Tontura", "vertiegem": "Tontura", "disenteria": "Diarreia",
+    "cardio": "Doenca Cardiovascular", "coracao": "Doenca Cardiovascular",
+    "pulmao": "Doenca Respiratoria", "dpoc": "Doenca Respiratoria",
+    "renal": "Doenca Renal", "rim": "Doenca Renal", "figado": "Doenca Hepatica",
+    "imuno": "Imunossupressao", "gravida": "Gestante", "pressao": "Hipertensao", "has": "Hipertensao",
+    "acidente": None, "trauma": None, "fratura": None, 
+    "alzaimer": "Doenca Neurologica", "alzheimer": "Doenca Neurologica",
+    "alergia": None, "ansiedade": None, "depressao": None 
+}
+
+CANON_SINTOMAS = Canonicalizador(SINTOMAS_VALIDOS, DE_PARA_FORCADO)
+CANON_CONDICOES = Canonicalizador(CONDICOES_VALIDAS, DE_PARA_FORCADO)
+
+# GRUPOS REPETIDOS DO CSV: cada posição preenchida (Teste1..4, Primeira/SegundaDose) vira uma linha da tabela longa
+GRUPO_TESTES = {'estado_teste': 'codigoEstadoTeste{}', 'tipo_teste': 'codigoTipoTeste{}',
+                'fabricante_teste': 'codigoFabricanteTeste{}', 'resultado_teste': 'codigoResultadoTeste{}',
+                'data_coleta': 'dataColetaTeste{}'}
+POSICOES_TESTES = {1: '1', 2: '2', 3: '3', 4: '4'}
+GRUPO_VACINAS = {'data_aplicacao': 'data{}Dose', 'laboratorio': 'codigoLaboratorio{}Dose', 'lote': 'lote{}Dose'}
+POSICOES_VACINAS = {1: 'Primeira', 2: 'Segunda'}
+TAMANHOS_TEXTO = {'estado_teste': 100, 'tipo_teste': 150, 'fabricante_teste': 255, 'resultado_teste': 150,
+                  'laboratorio': 200, 'lote': 100}
+
+# DATAS: formatos exatos tentados primeiro (do mais frequente na amostra ao menos); o resto cai no parser 'mixed'
+FORMATOS_DATA = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S',
+                 '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M']
+AMOSTRA_FORMATO_DATA = 1000
+
+# FUNÇÕES DE LIMPEZA
+def normalizar_texto(texto):
+    if not isinstance(texto, str): return ""
+    texto = texto.upper().strip() 
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+def nos_distintos(serie, funcao, nulo=None):
+    """funcao(Series de valores distintos) -> array alinhado; espalhada de volta pelos códigos. Nulos viram `nulo`.
+
+    As colunas do DataSUS repetem muito (datas, UFs, códigos): o trabalho em Python cai de por célula para por valor.
+    """
+    codigos, valores = pd.factorize(serie)
+    convertidos = np.asarray(funcao(pd.Series(valores, dtype=object)), dtype=object)
+    return np.append(convertidos, np.array([nulo], dtype=object))[codigos]
+
+def _id_estado_numerico(valor):
+    try: return int(float(valor))
+    except: return None
+
+def recuperar_ids_estado(df):
+    # Código IBGE informado quando ele é numérico; senão, o nome/sigla da UF pela tabela de referência
+    n = len(df)
+    ids = nos_distintos(df['estadoNotificacaoIBGE'], lambda u: u.map(_id_estado_numerico)) \
+        if 'estadoNotificacaoIBGE' in df.columns else np.full(n, None, dtype=object)
+    if 'estadoNotificacao' in df.columns:
+        pelo_nome = nos_distintos(df['estadoNotificacao'], lambda u: u.map(lambda x: MAPA_ESTADOS_IBGE.get(normalizar_texto(str(x)))))
+        ids = np.where(pd.isna(ids), pelo_nome, ids)
+    return pd.array(ids, dtype='Int64')
+
+def limpar_string(x):
+    if isinstance(x, str):
+        x = x.strip().replace(';', ',').replace('\n', ' ').replace('\r', '').replace('\\', '')
+        if x in ["", "nan", "NaN", "null", "None", "undefined"]: return None
+        return x
+    return x
+
+def formatos_provaveis(valores):
+    # Ordem dos formatos exatos pela frequência numa amostra; os que não casam com nada nem são tentados
+    amostra = valores[:AMOSTRA_FORMATO_DATA]
+    acertos = {fmt: int(pd.to_datetime(amostra, format=fmt, errors='coerce').notna().sum()) for fmt in FORMATOS_DATA}
+    return [fmt for fmt in sorted(acertos, key=acertos.get, reverse=True) if acertos[fmt]]
+
+def converter_datas(valores):
+    # valores: Series de strings distintas e não nulas
+    valores = valores.to_numpy(dtype=object)
+    resultado = np.full(len(valores), np.datetime64('NaT'), dtype='datetime64[ns]')
+    faltam = np.ones(len(valores), dtype=bool)
+    for fmt in formatos_provaveis(valores):
+        posicoes = np.flatnonzero(faltam)
+        if not len(posicoes): break
+        parte = pd.to_datetime(valores[posicoes], format=fmt, errors='coerce').to_numpy()
+        ok = ~np.isnat(parte)
+        resultado[posicoes[ok]] = parte[ok]
+        faltam[posicoes[ok]] = False
+    if faltam.any():
+        resultado[faltam] = pd.to_datetime(valores[faltam], dayfirst=True, errors="coerce", format='mixed').to_numpy()
+    return pd.Series(resultado).dt.date
+
+def limpar_datas(df, colunas):
+    # Sempre object (date ou NaT): uma coluna só de NaT não vira datetime64 num bloco e object no seguinte
+    for col in colunas:
+        if col in df.columns:
+            df[col] = pd.Series(nos_distintos(df[col], converter_datas, nulo=pd.NaT), index=df.index, dtype=object)
+    return df
+
+def limpar_strings(df):
+    # Tipos fixos, sem inferência por bloco: texto continua object (nulos como NaN), mesmo numa coluna toda vazia
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = pd.Series(nos_distintos(df[col], lambda u: u.map(limpar_string), nulo=np.nan), index=df.index, dtype=object)
+    return df
+
+def limpar_inteiros(df, colunas):
+    for col in colunas:
+        if col in df.columns:
+            series_num = pd.to_numeric(df[col], errors='coerce')
+            df[col] = series_num.astype('Int64')
+    return df
+
+def inserir_via_copy(engine, nome_tabela, df, colunas_explicit=None, binario=COPY_BINARIO, em_massa=False, medicoes=None):
+    if df.empty: return
+    colunas = colunas_explicit or list(df.columns)
+    medicoes = medicoes or Instrumentacao()
+    try:
+        inicio = time.perf_counter()
+        with medicoes.etapa(f"carga:{nome_tabela}", len(df)) as medida, engine.connect() as conn:
+            with conn.begin(): 
+                cursor = conn.connection.cursor()
+                # Só vale dentro desta transação: desliga o gatilho de auditoria e os gatilhos de FK
+                if em_massa: cursor.execute("SET LOCAL session_replication_role = replica")
+                copiar_dataframe(cursor, nome_tabela, df, colunas, binario=binario)
+            medida['linhas_saida'] = len(df)
+        duracao = time.perf_counter() - inicio
+        print(f"  [OK] Inseridos {len(df)} registros em '{nome_tabela}' ({len(df) / duracao:,.0f} linhas/s).")
+    except Exception as e:
+        print(f"  [ERRO] Falha em '{nome_tabela}': {e}")
+        raise
+
+def gerar_relatorio_estatistico(nulos, total_linhas, outliers_idade_count, linhas_finais, medicoes=None):
+    nulos_pct = (nulos / total_linhas) * 100
+    top_nulos = nulos_pct.sort_values(ascending=False).head(10)
+    with open("relatorio_integridade.txt", "w", encoding="utf-8") as f:
+        f.write("RELATÓRIO ESTATÍSTICO DE INTEGRIDADE DE DADOS (ETL)\n\n")
+        f.write(f"TOTAL DE REGISTROS: {total_linhas}\n\n1. DADOS FALTANTES\n")
+        for col, pct in top_nulos.items(): f.write(f"{col:<30}: {pct:.2f}% nulos\n")
+        f.write(f"\n2. OUTLIERS\nIdades Inválidas: {outliers_idade_count}\n")
+        f.write(f"\n3. SUCESSO\nRegistros no Banco: {linhas_finais}\n")
+        if medicoes and medicoes.etapas:
+            f.write("\n4. DESEMPENHO POR ETAPA (somado entre blocos e processos; RSS = pico do processo)\n")
+            f.write(medicoes.tabela_texto() + "\n")
+    print("  [OK] Relatório salvo.")
+
+# ETAPAS DO PIPELINE (aplicadas ao arquivo inteiro ou a cada bloco no modo streaming)
+def listar_arquivos(entrada):
+    # Um CSV, uma pasta de exportações (uma por UF/período) ou um glob; a ordem define a numeração dos ids
+    if isinstance(entrada, (list, tuple)): return list(entrada)
+    if os.path.isdir(entrada): arquivos = sorted(glob.glob(os.path.join(entrada, "*.csv")))
+    elif glob.has_magic(entrada): arquivos = sorted(glob.glob(entrada))
+    else: arquivos = [entrada]
+    if not arquivos: raise FileNotFoundError(f"Nenhum CSV encontrado em '{entrada}'")
+    return arquivos
+
+def descrever_arquivos(arquivos):
+    return ", ".join(os.path.basename(a) for a in arquivos)
+
+def calcular_tamanho_bloco(caminho_csv, limite_memoria_mb, linhas_amostra=2000):
+    amostra = pd.read_csv(caminho_csv, sep=",", dtype=str, nrows=linhas_amostra)
+    if amostra.empty: return linhas_amostra
+    bytes_por_linha = amostra.memory_usage(deep=True).sum() / len(amostra)
+    linhas = int(limite_memoria_mb * 1024 * 1024 / (bytes_por_linha * FATOR_EXPANSAO_MEMORIA))
+    return max(linhas, 1000)
+
+def limpar_dataframe(df, medicoes):
+    n = len(df)
+    with medicoes.etapa('estado_ibge', n) as medida:
+        df['estadoNotificacaoIBGE'] = recuperar_ids_estado(df)
+        medida['linhas_saida'] = n
+
+    outliers_idade = 0
+    if 'idade' in df.columns:
+        idades_num = pd.to_numeric(df['idade'], errors='coerce')
+        outliers_idade = int(idades_num[(idades_num < 0) | (idades_num > 120)].count())
+
+    with medicoes.etapa('strings', n) as medida:
+        df = limpar_strings(df)
+        medida['linhas_saida'] = n
+    colunas_data = ["dataNotificacao", "dataInicioSintomas", "dataEncerramento", "dataPrimeiraDose", "dataSegundaDose",
+                    *(GRUPO_TESTES['data_coleta'].format(p) for p in POSICOES_TESTES.values())]
+    with medicoes.etapa('datas', n) as medida:
+        df = limpar_datas(df, colunas_data)
+        medida['linhas_saida'] = n
+
+    colunas_inteiras = ["idade", "totalTestesRealizados", "municipioNotificacaoIBGE", "municipioIBGE", "estadoIBGE"]
+    with medicoes.etapa('inteiros', n) as medida:
+        df = limpar_inteiros(df, colunas_inteiras)
+        medida['linhas_saida'] = n
+    if 'idade' in df.columns: df.loc[(df["idade"] < 0) | (df["idade"] > 130), "idade"] = None
+    return df, outliers_idade
+
+def despivotar(df, grupo, posicoes, col_posicao):
+    # Largo -> longo sem laço por linha: cada campo vira uma matriz (linhas x posições) achatada linha a linha,
+    # alinhada com o id repetido e a posição intercalada; posições sem nenhum campo preenchido são descartadas
+    n, k = len(df), len(posicoes)
+    longo = pd.DataFrame({'notificacao_id': np.repeat(df['id_gerado'].to_numpy(), k),
+                          col_posicao: np.tile(np.array(list(posicoes), dtype='int16'), n)})
+    for destino, padrao in grupo.items():
+        colunas = [padrao.format(p) for p in posicoes.values()]
+        longo[destino] = df.reindex(columns=colunas).to_numpy(dtype=object).ravel()
+    longo = longo[longo[list(grupo)].notna().any(axis=1).to_numpy()].reset_index(drop=True)
+    for destino in TAMANHOS_TEXTO.keys() & grupo.keys():
+        longo[destino] = longo[destino].str.slice(0, TAMANHOS_TEXTO[destino])
+    return longo
+
+def texto_canonico(valores):
+    # Datas em ISO (só o dia), números inteiros sem o ".0" que ganham numa coluna float, o resto como str
+    def canonico(x):
+        if isinstance(x, datetime.date): return x.isoformat()[:10]
+        if isinstance(x, (float, np.floating)) and float(x).is_integer(): return str(int(x))
+        return str(x)
+    return valores.map(canonico)
+
+def hash_registro(df):
+    if 'condicoes' not in df.columns: df = df.rename(columns={'comorbidades': 'condicoes'})
+    canonico = pd.DataFrame({col: nos_distintos(df[col], texto_canonico, nulo=NULO_HASH) if col in df.columns
+                             else np.full(len(df), NULO_HASH, dtype=object) for col in COLUNAS_HASH})
+    return pd.util.hash_pandas_object(canonico, index=False).to_numpy().view('int64')
+
+def separar_tabelas(df):
+    # Nome e sigla vêm da tabela de referência: o texto informado varia (AM, Amazonas, AMAZONAS) e o primeiro a
+    # aparecer dependeria de como a entrada foi dividida em blocos
+    df_estados = df[['estadoNotificacaoIBGE']].dropna().drop_duplicates()
+    df_estados.columns = ['estado_ibge']
+    df_estados['nome'] = df_estados['estado_ibge'].map(NOMES_IBGE)
+    df_estados['sigla'] = df_estados['estado_ibge'].map(SIGLAS_IBGE)
+
+    df_mun = df[['municipioNotificacaoIBGE', 'municipioNotificacao', 'estadoNotificacaoIBGE']].dropna(subset=['municipioNotificacaoIBGE'])
+    df_mun = df_mun.drop_duplicates(subset=['municipioNotificacaoIBGE'])
+    df_mun.columns = ['municipio_ibge', 'nome', 'estado_ibge']
+
+    df_notificacao = df[['id_gerado', 'source_id', 'dataNotificacao', 'municipioNotificacaoIBGE', 'estadoNotificacaoIBGE', 'excluido', 'validado']].copy()
+    map_bool = {'True': True, 'False': False, 'Sim': True, 'Não': False, '1': True, '0': False}
+    df_notificacao['excluido'] = df_notificacao['excluido'].map(map_bool).fillna(False)
+    df_notificacao['validado'] = df_notificacao['validado'].map(map_bool).fillna(False)
+    df_notificacao.columns = ['notificacao_id', 'source_id', 'data_notificacao', 'municipio_notificacao_ibge', 'estado_notificacao_ibge', 'excluido', 'validado']
+    # Impressão digital da linha normalizada: a carga incremental compara com a do banco para achar alterações
+    df_notificacao['hash_registro'] = hash_registro(df)
+
+    df_demog = df[['id_gerado', 'idade', 'sexo', 'racaCor', 'profissionalSaude', 'profissionalSeguranca', 'cbo', 'codigoContemComunidadeTradicional']].copy()
+    df_demog['codigoContemComunidadeTradicional'] = df_demog['codigoContemComunidadeTradicional'].map({'1': True, '0': False}).fillna(False)
+    df_demog.columns = ['notificacao_id', 'idade', 'sexo', 'raca_cor', 'is_profissional_saude', 'is_profissional_seguranca', 'cbo', 'pertence_comunidade_tradicional']
+
+    df_clin = df[['id_gerado', 'dataInicioSintomas', 'dataEncerramento', 'classificacaoFinal', 'evolucaoCaso', 'outrosSintomas', 'outrasCondicoes', 'totalTestesRealizados']].copy()
+    for c in ['classificacaoFinal', 'evolucaoCaso', 'outrosSintomas', 'outrasCondicoes']:
+        if c in df_clin.columns: df_clin[c] = df_clin[c].astype(str).str.replace(';', ',').str.slice(0, 149)
+    df_clin.columns = ['notificacao_id', 'data_inicio_sintomas', 'data_encerramento', 'classificacao_final', 'evolucao_caso', 'outros_sintomas', 'outras_condicoes', 'total_testes_realizados']
+
+    # O filtro por municípios válidos é feito por quem chama, com o conjunto global de municípios
+    df_epidem = df[['id_gerado', 'origem', 'municipioIBGE', 'estadoIBGE']].copy()
+    df_epidem.columns = ['notificacao_id', 'origem_dados', 'municipio_residencia_ibge', 'estado_residencia_ibge']
+
+    cols_gestao = ['id_gerado', 'codigoEstrategiaCovid', 'codigoBuscaAtivaAssintomatico', 'outroBuscaAtivaAssintomatico', 'codigoTriagemPopulacaoEspecifica', 'outroTriagemPopulacaoEspecifica', 'codigoLocalRealizacaoTestagem', 'outroLocalRealizacaoTestagem']
+    df_gestao = df[[c for c in cols_gestao if c in df.columns]].copy()
+    col_names = ['notificacao_id', 'codigo_estrategia_covid', 'codigo_busca_ativa_assintomatico', 'outro_busca_ativa_assintomatico', 'codigo_triagem_populacao_especifica', 'outro_triagem_populacao_especifica', 'codigo_local_realizacao_testagem', 'outro_local_realizacao_testagem']
+    df_gestao.columns = col_names[:len(df_gestao.columns)]
+
+    return {
+        'estado': df_estados, 'municipio': df_mun, 'notificacao': df_notificacao,
+        'dados_demograficos': df_demog, 'dados_clinicos': df_clin,
+        'dados_epidemiologicos': df_epidem, 'dados_gestao_estrategia': df_gestao,
+        'teste_laboratorial': despivotar(df, GRUPO_TESTES, POSICOES_TESTES, 'numero_sequencial'),
+        'vacina_aplicada': despivotar(df, GRUPO_VACINAS, POSICOES_VACINAS, 'dose_numero'),
+    }
+
+def codificar_sintomas_condicoes(df):
+    # Uma MatrizTermos por dimensão, com as linhas na ordem do bloco (linha i = id_gerado i + 1)
+    col_cond = "condicoes" if "condicoes" in df.columns else "comorbidades"
+    return {'sintoma': CANON_SINTOMAS.codificar(df, "sintomas", "outrosSintomas"),
+            'condicao': CANON_CONDICOES.codificar(df, col_cond, "outrasCondicoes")}
+
+def preparar_tabelas_dim(matriz, ids_existentes, col_id, deslocamento=0):
+    # ids_existentes (nome -> id) é compartilhado entre blocos: só termos novos ganham id e linha na dimensão.
+    # A ponte sai direto dos arrays da matriz: código -> id por um vetor do tamanho do vocabulário
+    termos = np.array(matriz.termos, dtype=object)
+    presentes = termos[np.bincount(matriz.codigos, minlength=len(termos)) > 0]
+    novos = sorted(set(presentes) - set(ids_existentes))
+    for nome in novos: ids_existentes[nome] = max(ids_existentes.values(), default=0) + 1
+    dim = pd.DataFrame({col_id: [ids_existentes[n] for n in novos], 'nome': novos}, dtype=object)
+    id_por_codigo = np.array([ids_existentes.get(t, 0) for t in termos], dtype=np.int64)
+    bridge = pd.DataFrame({'notificacao_id': matriz.linhas() + 1 + deslocamento, col_id: id_por_codigo[matriz.codigos]})
+    return dim, bridge
+
+class EstadoGlobalETL:
+    """Estado que precisa ser consistente entre blocos: ids, dimensões e deduplicação geográfica."""
+
+    def __init__(self, rastrear_memoria=False):
+        self.proximo_id = 1
+        self.estados_vistos = set()
+        self.municipios_vistos = set()
+        self.ids_sintomas = {}
+        self.ids_condicoes = {}
+        self.epidem_pendente = None  # residências cujo município ainda não apareceu como notificação
+        self.nulos = None
+        self.total_linhas = 0
+        self.outliers_idade = 0
+        self.linhas_notificacao = 0
+        self.medicoes = Instrumentacao(rastrear_memoria)  # etapas de todos os blocos e processos, para o relatório e o log_carga
+        # Só na carga incremental
+        self.proximo_id_banco = 1
+        self.mapa_pendentes = {}  # id provisório -> notificacao_id definitivo dos registros em epidem_pendente
+        self.novos = self.alterados = self.inalterados = self.sem_source_id = 0
+        self.datas_tocadas = set()  # dias cujos rollups precisam ser recalculados
+
+def limpar_bloco(df, incremental=False, medicoes=None):
+    """Parte sem estado do processamento de um bloco (roda nos processos do pool); ids locais, começando em 1."""
+    medicoes = medicoes or Instrumentacao()
+    df.columns = df.columns.str.strip()
+    sem_source_id = 0
+    if incremental:
+        with medicoes.etapa('filtro_source_id', len(df)) as medida:
+            df, sem_source_id = filtrar_source_id(df)
+            medida['linhas_saida'] = len(df)
+    df["id_gerado"] = np.arange(1, len(df) + 1)
+
+    df, outliers_idade = limpar_dataframe(df, medicoes)
+    with medicoes.etapa('separar_tabelas', len(df)) as medida:
+        tabelas = separar_tabelas(df)
+        medida['linhas_saida'] = sum(len(t) for t in tabelas.values())
+    with medicoes.etapa('sintomas_condicoes', len(df)) as medida:
+        termos = codificar_sintomas_condicoes(df)
+        medida['linhas_saida'] = sum(len(m.codigos) for m in termos.values())
+    # Linhas sem nenhum termo reconhecido entram nos nulos com os nomes das antigas colunas de lista
+    nulos = pd.concat([df.isnull().sum(), pd.Series({'lista_final_sintomas': termos['sintoma'].sem_termos(),
+                                                     'lista_final_condicoes': termos['condicao'].sem_termos()})])
+    return {'tabelas': tabelas, 'termos': termos, 'nulos': nulos, 'linhas': len(df), 'outliers_idade': outliers_idade,
+            'sem_source_id': sem_source_id, 'etapas': medicoes.etapas}
+
+def consolidar_bloco(resultado, estado):
+    # Parte com estado, sempre no processo principal e na ordem dos blocos: o resultado não depende do paralelismo
+    deslocamento = estado.proximo_id - 1
+    estado.proximo_id += resultado['linhas']
+    tabelas = resultado['tabelas']
+    for df_tabela in tabelas.values():
+        if 'notificacao_id' in df_tabela.columns: df_tabela['notificacao_id'] += deslocamento
+
+    df_estados = tabelas['estado']
+    tabelas['estado'] = df_estados[~df_estados['estado_ibge'].isin(estado.estados_vistos)]
+    estado.estados_vistos.update(tabelas['estado']['estado_ibge'].tolist())
+    df_mun = tabelas['municipio']
+    tabelas['municipio'] = df_mun[~df_mun['municipio_ibge'].isin(estado.municipios_vistos)]
+    estado.municipios_vistos.update(tabelas['municipio']['municipio_ibge'].dropna().tolist())
+
+    df_epidem = tabelas['dados_epidemiologicos']
+    if estado.epidem_pendente is not None:
+        df_epidem = pd.concat([estado.epidem_pendente, df_epidem])
+    validos = df_epidem['municipio_residencia_ibge'].isin(estado.municipios_vistos)
+    tabelas['dados_epidemiologicos'] = df_epidem[validos]
+    estado.epidem_pendente = df_epidem[~validos & df_epidem['municipio_residencia_ibge'].notna()]
+
+    termos = resultado['termos']
+    with estado.medicoes.etapa('dimensoes', resultado['linhas']) as medida:
+        tabelas['sintoma'], tabelas['notificacao_sintoma'] = preparar_tabelas_dim(termos['sintoma'], estado.ids_sintomas, 'sintoma_id', deslocamento)
+        tabelas['condicao'], tabelas['notificacao_condicao'] = preparar_tabelas_dim(termos['condicao'], estado.ids_condicoes, 'condicao_id', deslocamento)
+        medida['linhas_saida'] = len(tabelas['notificacao_sintoma']) + len(tabelas['notificacao_condicao'])
+
+    estado.nulos = resultado['nulos'] if estado.nulos is None else estado.nulos.add(resultado['nulos'], fill_value=0)
+    estado.total_linhas += resultado['linhas']
+    estado.outliers_idade += resultado['outliers_idade']
+    estado.sem_source_id += resultado['sem_source_id']
+    estado.medicoes.juntar(resultado['etapas'])
+    estado.linhas_notificacao += len(tabelas['notificacao'])
+    return tabelas
+
+def processar_bloco(df, estado, incremental=False):
+    return consolidar_bloco(limpar_bloco(df, incremental, Instrumentacao(estado.medicoes.rastrear_memoria)), estado)
+
+def carregar_tabelas(engine, tabelas, binario=COPY_BINARIO, conexoes=CONEXOES_CARGA, em_massa=False, medicoes=None):
+    def carregar(nome):
+        inserir_via_copy(engine, nome, tabelas[nome], binario=binario, em_massa=em_massa, medicoes=medicoes)
+
+    # Sem checagem de FK durante o COPY a ordem não importa: tudo pode ir em paralelo
+    dependencias = {} if em_massa else dependencias_do_schema(ARQUIVO_SCHEMA)
+    inicio = time.perf_counter()
+    tempos = carregar_em_paralelo(list(tabelas), dependencias, carregar, conexoes)
+    for nome, duracao in sorted(tempos.items(), key=lambda x: -x[1]):
+        print(f"  [TEMPO] {nome:<25}: {duracao:.2f}s")
+    print(f"  [TEMPO] Carga total ({conexoes} conexões{', em massa' if em_massa else ''}): {time.perf_counter() - inicio:.2f}s")
+    return tempos
+
+def atualizar_schema(engine):
+    # Bancos criados antes da carga incremental não têm a coluna de hash nem o índice por source_id (nem os de acesso,
+    # nem as colunas de etapa do log_carga)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE notificacao ADD COLUMN IF NOT EXISTS hash_registro BIGINT;"))
+        for coluna, tipo in COLUNAS_LOG_ETAPAS.items():
+            conn.execute(text(f"ALTER TABLE log_carga ADD COLUMN IF NOT EXISTS {coluna} {tipo};"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_notificacao_source_id ON notificacao (source_id);"))
+        for nome, definicao in INDICES_ACESSO.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {definicao};"))
+
+def carregar_estado_do_banco(engine, estado):
+    with engine.connect() as conn:
+        estado.estados_vistos = {r[0] for r in conn.execute(text("SELECT estado_ibge FROM estado"))}
+        estado.municipios_vistos = {r[0] for r in conn.execute(text("SELECT municipio_ibge FROM municipio"))}
+        estado.ids_sintomas = dict(conn.execute(text("SELECT nome, sintoma_id FROM sintoma")).fetchall())
+        estado.ids_condicoes = dict(conn.execute(text("SELECT nome, condicao_id FROM condicao")).fetchall())
+        estado.proximo_id_banco = conn.execute(text("SELECT COALESCE(MAX(notificacao_id), 0) + 1 FROM notificacao")).scalar()
+
+def filtrar_source_id(df):
+    # Sem source_id não há como casar com o banco; repetidos no bloco: vale a última ocorrência
+    chave = df['source_id'].map(limpar_string)
+    return df[chave.notna() & ~chave.duplicated(keep='last')].copy(), int(chave.isna().sum())
+
+def carregar_incremental(engine, tabelas, estado, binario=COPY_BINARIO):
+    df_notif = tabelas['notificacao']
+    chaves = pd.DataFrame({'id_provisorio': df_notif['notificacao_id'], 'source_id': df_notif['source_id'],
+                           'hash_registro': df_notif['hash_registro']})
+    inicio = time.perf_counter()
+    with estado.medicoes.etapa('carga_incremental', len(chaves)) as medida, engine.connect() as conn:
+        with conn.begin():
+            cursor = conn.connection.cursor()
+            banco = classificar_por_source_id(cursor, chaves).reindex(chaves['id_provisorio'].to_numpy())
+            novos = banco['notificacao_id'].isna().to_numpy()
+            alterados = ~novos & (banco['hash_banco'] != chaves['hash_registro'].to_numpy()).fillna(True).to_numpy()
+
+            # Alteradas mantêm o notificacao_id do banco; novas continuam a numeração a partir do maior id gravado
+            ids_finais = banco['notificacao_id'].copy()
+            ids_finais[novos] = np.arange(estado.proximo_id_banco, estado.proximo_id_banco + int(novos.sum()))
+            estado.proximo_id_banco += int(novos.sum())
+            mapa = ids_finais[novos | alterados].astype('int64')
+            # Uma notificação alterada pode ter mudado de dia: o dia antigo também precisa de rollup novo
+            if alterados.any():
+                cursor.execute("SELECT DISTINCT data_notificacao FROM notificacao WHERE notificacao_id = ANY(%s)",
+                               (banco.loc[alterados, 'notificacao_id'].astype('int64').tolist(),))
+                estado.datas_tocadas.update(r[0] for r in cursor.fetchall())
+            mapa_epidem = pd.concat([mapa, pd.Series(estado.mapa_pendentes, dtype='int64')])
+
+            for nome in ['notificacao'] + TABELAS_DEPENDENTES:
+                df = tabelas[nome]
+                ref = mapa_epidem if nome == 'dados_epidemiologicos' else mapa
+                df = df[df['notificacao_id'].isin(ref.index)].copy()
+                df['notificacao_id'] = df['notificacao_id'].map(ref)
+                tabelas[nome] = df
+
+            if estado.epidem_pendente is not None and len(estado.epidem_pendente):
+                pend = estado.epidem_pendente
+                inalterados = pend['notificacao_id'].isin(banco.index) & ~pend['notificacao_id'].isin(mapa.index)
+                estado.epidem_pendente = pend[~inalterados]
+                estado.mapa_pendentes.update(mapa[mapa.index.isin(pend['notificacao_id'])].to_dict())
+
+            for nome, chave in CHAVES_DIMENSOES.items():
+                upsert_via_staging(cursor, nome, tabelas[nome], chave, atualizar=False, binario=binario)
+            upsert_via_staging(cursor, 'notificacao', tabelas['notificacao'], ['notificacao_id'], binario=binario)
+            estado.datas_tocadas.update(None if pd.isna(d) else d for d in tabelas['notificacao']['data_notificacao'].unique())
+            if alterados.any():
+                # Satélites e pontes das notificações alteradas são regravadas do zero
+                for nome in TABELAS_DEPENDENTES:
+                    cursor.execute(f"DELETE FROM {nome} d USING stg_notificacao s WHERE d.notificacao_id = s.notificacao_id")
+            for nome in TABELAS_DEPENDENTES:
+                if nome in TABELAS_REPETIDAS:
+                    # Sem chave natural: as linhas das alteradas acabaram de ser apagadas, então é só inserir
+                    if not tabelas[nome].empty:
+                        copiar_dataframe(cursor, nome, tabelas[nome], list(tabelas[nome].columns), binario=binario)
+                    continue
+                chave = CHAVES_PONTES.get(nome, ['notificacao_id'])
+                upsert_via_staging(cursor, nome, tabelas[nome], chave, atualizar=nome not in CHAVES_PONTES, binario=binario)
+        medida['linhas_saida'] = int((novos | alterados).sum())
+
+    n_novos, n_alterados = int(novos.sum()), int(alterados.sum())
+    estado.novos += n_novos
+    estado.alterados += n_alterados
+    estado.inalterados += len(chaves) - n_novos - n_alterados
+    print(f"  [OK] Delta: {n_novos} novas, {n_alterados} alteradas, {len(chaves) - n_novos - n_alterados} inalteradas "
+          f"({time.perf_counter() - inicio:.2f}s).")
+
+def rollups_instalados(conn):
+    return conn.execute(text("SELECT to_regproc('fx_atualizar_rollups') IS NOT NULL")).scalar()
+
+def atualizar_rollups(engine, datas=None, medicoes=None):
+    # datas=None recalcula tudo (carga completa); na incremental, só os dias tocados
+    medicoes = medicoes or Instrumentacao()
+    with engine.begin() as conn:
+        if not rollups_instalados(conn):
+            print("  [AVISO] Rollups não instalados (seção 5 de 'Banco 689.0.sql'); views e painel ficarão desatualizados.")
+            return
+        inicio = time.perf_counter()
+        with medicoes.etapa('rollups', None if datas is None else len(datas)):
+            if datas is None: conn.execute(text("SELECT fx_atualizar_rollups()"))
+            else: conn.execute(text("SELECT fx_atualizar_rollups(CAST(:datas AS DATE[]))"), {'datas': list(datas)})
+    alcance = "todos os dias" if datas is None else f"{len(datas)} dias"
+    print(f"  [TEMPO] Rollups atualizados ({alcance}): {time.perf_counter() - inicio:.2f}s")
+
+def limpar_banco(engine):
+    with engine.connect() as conn:
+        conn.execute(text("TRUNCATE TABLE notificacao CASCADE;"))
+        conn.execute(text("TRUNCATE TABLE municipio CASCADE;"))
+        conn.execute(text("TRUNCATE TABLE estado CASCADE;"))
+        conn.execute(text("TRUNCATE TABLE sintoma, condicao CASCADE;"))
+        if rollups_instalados(conn): conn.execute(text("TRUNCATE TABLE rollup_casos_diario, rollup_sintomas_diario;"))
+        conn.commit()
+
+# EXECUÇÃO DO ETL
+def _limpar_tarefa(tarefa, incremental, rastrear_memoria=False):
+    # Sem streaming a tarefa é o caminho do arquivo: a leitura do CSV também sai do processo principal.
+    # As medições voltam junto com o resultado e são somadas às do processo principal na consolidação
+    medicoes = Instrumentacao(rastrear_memoria)
+    if isinstance(tarefa, str):
+        with medicoes.etapa('leitura_csv') as medida:
+            tarefa = pd.read_csv(tarefa, sep=",", dtype=str, low_memory=False)
+            medida['linhas_saida'] = len(tarefa)
+    return limpar_bloco(tarefa, incremental, medicoes)
+
+def imprimir_tempos_etapas(estado):
+    if not estado.medicoes.etapas: return
+    print("  [TEMPO] Etapas (somadas entre blocos e processos):")
+    for linha in estado.medicoes.tabela_texto().splitlines():
+        print(f"  [TEMPO]   {linha}")
+
+def _tarefas(arquivos, streaming, limite_memoria_mb):
+    for arquivo in arquivos:
+        if not streaming:
+            yield arquivo
+            continue
+        tamanho_bloco = calcular_tamanho_bloco(arquivo, limite_memoria_mb)
+        print(f"--- {os.path.basename(arquivo)}: blocos de {tamanho_bloco} linhas (limite {limite_memoria_mb} MB) ---")
+        yield from pd.read_csv(arquivo, sep=",", dtype=str, low_memory=False, chunksize=tamanho_bloco)
+
+def mapear_em_ordem(pool, funcao, itens, max_pendentes):
+    # Como pool.map, mas sem consumir o gerador inteiro: no máximo max_pendentes blocos em memória ao mesmo tempo
+    pendentes = deque()
+    for item in itens:
+        pendentes.append(pool.submit(funcao, item))
+        if len(pendentes) >= max_pendentes: yield pendentes.popleft().result()
+    while pendentes: yield pendentes.popleft().result()
+
+def ler_blocos(arquivos, estado, streaming, limite_memoria_mb, incremental=False, processos=PROCESSOS_LIMPEZA):
+    """Lê e limpa os arquivos em até `processos` processos; a consolidação (ids, dimensões) segue a ordem dos blocos."""
+    print(f"--- Lendo e limpando {len(arquivos)} arquivo(s) em {processos} processo(s) ---")
+    limpar = partial(_limpar_tarefa, incremental=incremental, rastrear_memoria=estado.medicoes.rastrear_memoria)
+    tarefas = _tarefas(arquivos, streaming, limite_memoria_mb)
+    if processos <= 1:
+        resultados = map(limpar, tarefas)
+        for n_bloco, resultado in enumerate(resultados, start=1):
+            yield _consolidar_com_aviso(resultado, estado, n_bloco)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for n_bloco, resultado in enumerate(mapear_em_ordem(pool, limpar, tarefas, processos + 1), start=1):
+            yield _consolidar_com_aviso(resultado, estado, n_bloco)
+
+def _consolidar_com_aviso(resultado, estado, n_bloco):
+    print(f"\n--- Bloco {n_bloco} (linhas {estado.proximo_id} a {estado.proximo_id + resultado['linhas'] - 1}) ---")
+    return consolidar_bloco(resultado, estado)
+
+def gerar_estagio(arquivos, estado, streaming, limite_memoria_mb, pasta=PASTA_ESTAGIO, processos=PROCESSOS_LIMPEZA):
+    print(f"--- Gravando estágio Parquet em '{pasta}' ---")
+    inicio = time.perf_counter()
+    estagio = EstagioParquet(pasta)
+    for tabelas in ler_blocos(arquivos, estado, streaming, limite_memoria_mb, processos=processos):
+        linhas = sum(len(t) for t in tabelas.values())
+        with estado.medicoes.etapa('gravar_estagio', linhas) as medida:
+            estagio.gravar(tabelas, estado.epidem_pendente)
+            medida['linhas_saida'] = linhas
+    estagio.finalizar({
+        'arquivo_csv': descrever_arquivos(arquivos), 'total_linhas': estado.total_linhas,
+        'outliers_idade': estado.outliers_idade, 'linhas_notificacao': estado.linhas_notificacao,
+        'descartados': 0 if estado.epidem_pendente is None else len(estado.epidem_pendente),
+        'nulos': {col: int(n) for col, n in estado.nulos.items()},
+    })
+    print(f"  [TEMPO] Estágio gravado ({estagio.n_bloco} blocos em {estagio.n_parte} partes): {time.perf_counter() - inicio:.2f}s")
+
+def medir_blocos(blocos, medicoes, nome):
+    # Para geradores que não se medem sozinhos (leitura do estágio): o tempo de produzir cada bloco vira a etapa `nome`
+    blocos = iter(blocos)
+    while True:
+        with medicoes.etapa(nome) as medida:
+            tabelas = next(blocos, None)
+            if tabelas is not None: medida['linhas_saida'] = sum(len(t) for t in tabelas.values())
+        if tabelas is None: return
+        yield tabelas
+
+def executar_etl(arquivo_csv, streaming=False, limite_memoria_mb=LIMITE_MEMORIA_MB, binario=COPY_BINARIO,
+                 conexoes=CONEXOES_CARGA, em_massa=CARGA_EM_MASSA, incremental=MODO_INCREMENTAL,
+                 gravar_estagio=GRAVAR_ESTAGIO, do_estagio=False, sem_carga=False, processos=PROCESSOS_LIMPEZA,
+                 rastrear_memoria=RASTREAR_MEMORIA, pasta_estagio=PASTA_ESTAGIO):
+    if em_massa and incremental:
+        raise ValueError("Carga em massa e carga incremental não podem ser usadas juntas")
+    if incremental and (gravar_estagio or do_estagio):
+        # Os ids do estágio são de uma numeração nova, não casam com os do banco
+        raise ValueError("O estágio Parquet só alimenta a carga completa, não a incremental")
+    estado = EstadoGlobalETL(rastrear_memoria)
+    arquivos = [] if do_estagio and not gravar_estagio else listar_arquivos(arquivo_csv)
+    descricao = descrever_arquivos(arquivos)
+    if gravar_estagio:
+        gerar_estagio(arquivos, estado, streaming, limite_memoria_mb, pasta=pasta_estagio, processos=processos)
+        if sem_carga:
+            imprimir_tempos_etapas(estado)
+            gerar_relatorio_estatistico(estado.nulos, estado.total_linhas, estado.outliers_idade, estado.linhas_notificacao,
+                                        estado.medicoes)
+            return estado
+        do_estagio = True
+    if do_estagio:
+        metadados = ler_metadados(pasta_estagio)
+        estado.nulos = pd.Series(metadados['nulos'], dtype='int64')
+        estado.total_linhas, estado.outliers_idade = metadados['total_linhas'], metadados['outliers_idade']
+        estado.linhas_notificacao = metadados['linhas_notificacao']
+        descricao = metadados['arquivo_csv']
+        blocos = medir_blocos(ler_estagio(pasta_estagio, por_parte=streaming), estado.medicoes, 'leitura_estagio')
+    else:
+        blocos = ler_blocos(arquivos, estado, streaming, limite_memoria_mb, incremental=incremental, processos=processos)
+
+    engine = create_engine(CONN_STRING, pool_size=conexoes, max_overflow=0)
+    carga_iniciada = False
+    indices_removidos = []
+    inicio = time.perf_counter()
+
+    if incremental:
+        atualizar_schema(engine)
+        carregar_estado_do_banco(engine, estado)
+
+    try:
+        for tabelas in blocos:
+            if incremental:
+                carregar_incremental(engine, tabelas, estado, binario=binario)
+                continue
+            if not carga_iniciada:
+                print("\n--- INICIANDO CARGA ---")
+                atualizar_schema(engine)
+                if em_massa:
+                    verificar_superusuario(engine)
+                    indices_removidos = remover_indices_secundarios(engine, TABELAS_CARGA)
+                    print(f"  [OK] Carga em massa: {len(indices_removidos)} índices secundários removidos até o fim da carga.")
+                limpar_banco(engine)
+                carga_iniciada = True
+            carregar_tabelas(engine, tabelas, binario=binario, conexoes=conexoes, em_massa=em_massa, medicoes=estado.medicoes)
+            del tabelas
+
+        if em_massa:
+            with estado.medicoes.etapa('validar_fks'):
+                validar_chaves_estrangeiras(engine, TABELAS_CARGA)
+            print("  [OK] Chaves estrangeiras validadas.")
+    except Exception:
+        # Na incremental cada bloco é uma transação só: o que já foi gravado é válido e uma nova execução retoma dali
+        if carga_iniciada:
+            # As tabelas são copiadas em conexões separadas (as satélites precisam enxergar a notificacao já
+            # commitada), então desfazer a carga = esvaziar de novo tudo o que esta execução gravou
+            print("  [ERRO] Carga interrompida, desfazendo registros já gravados...")
+            limpar_banco(engine)
+        raise
+    finally:
+        if indices_removidos:
+            with estado.medicoes.etapa('recriar_indices'):
+                recriar_indices(engine, indices_removidos)
+            print(f"  [OK] {len(indices_removidos)} índices recriados.")
+
+    if not incremental: atualizar_rollups(engine, medicoes=estado.medicoes)
+    elif estado.datas_tocadas: atualizar_rollups(engine, sorted(estado.datas_tocadas, key=lambda d: (d is None, d)), estado.medicoes)
+
+    imprimir_tempos_etapas(estado)
+    if do_estagio: descartados = metadados['descartados']
+    else: descartados = 0 if estado.epidem_pendente is None else len(estado.epidem_pendente)
+    print(f"  [OK] {descartados} registros epidemiológicos descartados (município de residência inexistente).")
+    duracao = time.perf_counter() - inicio
+    print(f"  [TEMPO] ETL completo{' (carga em massa)' if em_massa else ''}: {duracao:.2f}s")
+    if em_massa:
+        registrar_log_carga(engine, estado.linhas_notificacao,
+                            f"Carga em massa de '{descricao}' em {duracao:.1f}s; "
+                            f"auditoria por linha (log_alteracoes) e checagem de FK desligadas durante o COPY",
+                            estado.medicoes.etapas)
+    elif incremental:
+        registrar_log_carga(engine, estado.novos + estado.alterados,
+                            f"Carga incremental de '{descricao}' em {duracao:.1f}s: "
+                            f"{estado.novos} novas, {estado.alterados} alteradas, {estado.inalterados} inalteradas, "
+                            f"{estado.sem_source_id} sem source_id", estado.medicoes.etapas)
+    else:
+        registrar_log_carga(engine, estado.linhas_notificacao, f"Carga completa de '{descricao}' em {duracao:.1f}s",
+                            estado.medicoes.etapas)
+
+    gerar_relatorio_estatistico(estado.nulos, estado.total_linhas, estado.outliers_idade, estado.linhas_notificacao,
+                                estado.medicoes)
+    return estado
+
+def main():
+    parser = argparse.ArgumentParser(description="ETL DataSUS -> PostgreSQL")
+    parser.add_argument("--arquivo", default=ARQUIVO_CSV, help="CSV exportado do DataSUS, pasta de exportações ou glob")
+    parser.add_argument("--streaming", action="store_true", default=MODO_STREAMING, help="lê e carrega o CSV em blocos")
+    parser.add_argument("--limite-memoria-mb", type=int, default=LIMITE_MEMORIA_MB, help="teto de memória por bloco no modo streaming")
+    parser.add_argument("--copy-binario", action="store_true", default=COPY_BINARIO, help="usa COPY em formato binário")
+    parser.add_argument("--conexoes", type=int, default=CONEXOES_CARGA, help="conexões simultâneas na carga")
+    parser.add_argument("--processos", type=int, default=PROCESSOS_LIMPEZA, help="processos de leitura/limpeza dos arquivos")
+    parser.add_argument("--carga-em-massa", action="store_true", default=CARGA_EM_MASSA,
+                        help="COPY sem auditoria/FK por linha, recriando índices e validando FKs no final")
+    parser.add_argument("--incremental", action="store_true", default=MODO_INCREMENTAL,
+                        help="grava só notificações novas/alteradas (por source_id), sem TRUNCATE")
+    parser.add_argument("--gravar-estagio", action="store_true", default=GRAVAR_ESTAGIO,
+                        help=f"grava as tabelas limpas em Parquet ({PASTA_ESTAGIO}) e carrega a partir delas")
+    parser.add_argument("--sem-carga", action="store_true", help="com --gravar-estagio: só grava o estágio, sem tocar no banco")
+    parser.add_argument("--do-estagio", action="store_true", help="carrega o banco a partir do estágio já gravado, sem ler o CSV")
+    parser.add_argument("--perfilar", action="store_true", default=PERFILAR,
+                        help=f"grava o cProfile do processo principal em {ARQUIVO_PERFIL}.prof/.txt")
+    parser.add_argument("--rastrear-memoria", action="store_true", default=RASTREAR_MEMORIA,
+                        help="mede o pico de memória Python (tracemalloc) de cada etapa; com --perfilar, salva as maiores alocações")
+    args = parser.parse_args()
+    if args.perfilar and args.processos > 1:
+        print("[AVISO] O cProfile só cobre o processo principal: a leitura/limpeza nos processos do pool fica de fora "
+              "(use --processos 1 para perfilá-la).")
+
+    try:
+        with perfilar(ARQUIVO_PERFIL, args.rastrear_memoria) if args.perfilar else nullcontext():
+            executar_etl(args.arquivo, streaming=args.streaming, limite_memoria_mb=args.limite_memoria_mb, binario=args.copy_binario,
+                         conexoes=args.conexoes, em_massa=args.carga_em_massa, incremental=args.incremental,
+                         gravar_estagio=args.gravar_estagio, do_estagio=args.do_estagio, sem_carga=args.sem_carga,
+                         processos=args.processos, rastrear_memoria=args.rastrear_memoria)
+        print("\n--- SUCESSO! ---")
+    except Exception as e:
+        print(f"\nERRO: {e}")
+        sys.exit(1)  # status de erro para o cron/CI e para o benchmark_etl
+
+if __name__ == "__main__":
+    main()
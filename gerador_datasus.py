@@ -0,0 +1,276 @@
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from etl_datasus import UFS_IBGE, mapear_em_ordem
+
+# GERADOR SINTÉTICO: exportações no formato do DataSUS (mesmas colunas de nomes_colunas.txt), com a sujeira que o ETL
+# precisa tratar; gravado em blocos, então o tamanho (10 mil a dezenas de milhões de linhas) não depende da RAM
+ARQUIVO_COLUNAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nomes_colunas.txt")
+LINHAS_POR_BLOCO = 200_000
+MUNICIPIOS_POR_UF = 40
+DATA_INICIAL, DIAS = "2020-03-01", 1035
+INICIO_VACINACAO, DIAS_VACINACAO = "2021-01-18", 600
+SEMENTE = 42
+PROCESSOS = os.cpu_count() or 1
+
+FRAGMENTOS_SINTOMAS = [
+    "Febre", "Tosse", "Dor de Garganta", "Dispneia", "Coriza", "Outros", "Assintomático", "Dor de Cabeça",
+    "Distúrbios Gustativos", "Distúrbios Olfativos", "febril", "mialgia", "ANOSMIA", "ageusia", "cansaço",
+    "falta de ar", "enxaqueca", "dor no corpo", "vertiegem", "teste positivo", "exame igg", "diarréia",
+    "dor abdominal", "odinofagia", "calafrio", "1- tontura", "'nausea'", "mal estar", "espirro", "catarro",
+]
+FRAGMENTOS_CONDICOES = [
+    "Diabetes", "Doenças cardíacas crônicas", "Obesidade", "Gestante", "Imunossupressão", "Doenças renais crônicas",
+    "Doenças respiratórias crônicas descompensadas", "hipertensão", "has", "asma", "alergia", "dpoc",
+    "depressão", "pressao alta", "problema no coração", "alzaimer", "tabagista", "figado", "puérpera",
+]
+SEPARADORES = [", ", ";", "/", " e ", " - ", "+", " | "]
+# Texto livre de verdade quase nunca se repete: parte dos "outros" ganha um complemento único
+COMPLEMENTOS = ["há {} dias", "{} graus", "desde {}", "({})", "obs {}"]
+TAMANHO_VOCABULARIO = 5000
+
+# Datas: o formato varia por linha, como nas exportações do e-SUS Notifica juntadas de fontes diferentes
+FORMATOS_DATA = {'%Y-%m-%d': 0.40, '%d/%m/%Y': 0.30, '%Y-%m-%dT%H:%M:%S.000': 0.15, '%Y-%m-%d %H:%M:%S': 0.05,
+                 '%d/%m/%Y %H:%M': 0.05}
+DATAS_INVALIDAS = ["31/02/2021", "0000-00-00", "ignorado", "2021-13-01"]
+FRACAO_DATA_INVALIDA, FRACAO_DATA_VAZIA = 0.01, 0.03
+
+CLASSIFICACOES = {"Confirmado Laboratorial": 0.25, "Confirmado Clínico-Epidemiológico": 0.05, "Confirmado Clínico-Imagem": 0.01,
+                  "Confirmado por Critério Clínico": 0.02, "Descartado": 0.40, "Síndrome Gripal Não Especificada": 0.12, "": 0.15}
+EVOLUCOES = {"Cura": 0.55, "Obito": 0.02, "Ignorado": 0.08, "Em tratamento domiciliar": 0.15, "Cancelado": 0.01, "": 0.19}
+SEXOS = {"Feminino": 0.52, "Masculino": 0.46, "Indefinido": 0.01, "": 0.01}
+RACAS = {"Parda": 0.45, "Branca": 0.25, "Preta": 0.08, "Amarela": 0.05, "Indigena": 0.01, "Ignorado": 0.16}
+CBOS = {"": 0.80, "2235 - Enfermeiro": 0.04, "2251 - Médico clínico": 0.03, "3222 - Técnico de enfermagem": 0.05,
+        "5151 - Agente comunitário de saúde": 0.04, "null": 0.04}
+TESTES = {'codigoEstadoTeste{}': {"Concluído": 0.8, "Coletado": 0.1, "Solicitado": 0.1},
+          'codigoTipoTeste{}': {"RT-PCR": 0.4, "Teste rápido - antígeno": 0.4, "Teste rápido - anticorpo IgM": 0.1,
+                                "Sorologia IgG": 0.1},
+          'codigoFabricanteTeste{}': {"ABBOTT": 0.3, "WAMA": 0.2, "BIO-MANGUINHOS": 0.2, "ECO DIAGNÓSTICA": 0.1, "": 0.2},
+          'codigoResultadoTeste{}': {"Reagente": 0.3, "Não Reagente": 0.5, "Detectável": 0.05, "Não Detectável": 0.05,
+                                     "Inconclusivo ou Indeterminado": 0.05, "": 0.05}}
+PROBABILIDADE_TESTE = [0.8, 0.3, 0.1, 0.03]  # do teste 1 ao 4, dado que o anterior existe
+LABORATORIOS = {"ASTRAZENECA/FIOCRUZ": 0.4, "PFIZER": 0.3, "SINOVAC/BUTANTAN": 0.25, "JANSSEN": 0.05}
+
+def colunas_datasus(caminho=ARQUIVO_COLUNAS):
+    with open(caminho, encoding="utf-8") as f:
+        return [linha.strip() for linha in f if linha.strip()]
+
+def sortear(rng, n, opcoes):
+    # opcoes: lista (uniforme) ou dicionário valor -> peso
+    if isinstance(opcoes, dict):
+        valores, pesos = np.array(list(opcoes), dtype=object), np.array(list(opcoes.values()), dtype=float)
+        return valores[rng.choice(len(valores), size=n, p=pesos / pesos.sum())]
+    return np.array(opcoes, dtype=object)[rng.integers(len(opcoes), size=n)]
+
+def vocabulario(rng, fragmentos, tamanho=TAMANHO_VOCABULARIO):
+    # Combinações de 1 a 3 fragmentos com separadores variados; sorteadas com peso decrescente (poucas dominam)
+    combinacoes = []
+    for _ in range(tamanho):
+        partes = rng.choice(fragmentos, size=rng.integers(1, 4))
+        combinacoes.append(SEPARADORES[rng.integers(len(SEPARADORES))].join(partes))
+    return np.array(combinacoes, dtype=object)
+
+def texto_livre(rng, n, vocab, prob_vazio, prob_complemento=0.0):
+    pesos = 1 / np.arange(1, len(vocab) + 1)
+    valores = vocab[rng.choice(len(vocab), size=n, p=pesos / pesos.sum())]
+    com_complemento = np.flatnonzero(rng.random(n) < prob_complemento)
+    if len(com_complemento):
+        modelos = sortear(rng, len(com_complemento), COMPLEMENTOS)
+        numeros = rng.integers(1, 10_000, size=len(com_complemento))
+        valores[com_complemento] = [f"{v} {m.format(x)}" for v, m, x in zip(valores[com_complemento], modelos, numeros)]
+    valores[rng.random(n) < prob_vazio] = ""
+    return valores
+
+class TabelaDatas:
+    """Texto de cada dia em cada formato, calculado uma vez: formatar uma coluna vira indexação de matriz."""
+
+    def __init__(self, inicio, dias):
+        self.inicio = pd.Timestamp(inicio)
+        dias_idx = pd.date_range(self.inicio, periods=dias + 400, freq='D')  # folga para datas derivadas (encerramento etc.)
+        self.textos = np.stack([dias_idx.strftime(fmt).to_numpy(dtype=object) for fmt in FORMATOS_DATA], axis=1)
+        self.pesos = np.array(list(FORMATOS_DATA.values()))
+        self.pesos = self.pesos / self.pesos.sum()
+
+    def formatar(self, rng, dias, validos=None):
+        # dias: deslocamento em dias a partir do início; validos=False deixa a célula vazia
+        n = len(dias)
+        dias = np.clip(dias, 0, self.textos.shape[0] - 1)
+        textos = self.textos[dias, rng.choice(len(self.pesos), size=n, p=self.pesos)]
+        sorteio = rng.random(n)
+        textos[sorteio < FRACAO_DATA_INVALIDA] = sortear(rng, int((sorteio < FRACAO_DATA_INVALIDA).sum()), DATAS_INVALIDAS)
+        textos[(sorteio >= FRACAO_DATA_INVALIDA) & (sorteio < FRACAO_DATA_INVALIDA + FRACAO_DATA_VAZIA)] = ""
+        if validos is not None: textos[~validos] = ""
+        return textos
+
+class GeradorDataSUS:
+    def __init__(self, semente=SEMENTE, ufs=None, municipios_por_uf=MUNICIPIOS_POR_UF):
+        self.semente = semente
+        self.colunas = colunas_datasus()
+        rng = np.random.default_rng(semente)
+        ufs = sorted(ufs or UFS_IBGE)
+        # Código IBGE = UF * 100000 + i (mesma convenção do benchmark_consultas); poucos municípios concentram os casos
+        self.municipios = np.array([uf * 100_000 + i for uf in ufs for i in range(1, municipios_por_uf + 1)])
+        self.nomes_municipios = np.array([f"Municipio {m % 100_000} {UFS_IBGE[m // 100_000][0]}" for m in self.municipios], dtype=object)
+        pesos = rng.pareto(1.2, size=len(self.municipios)) + 0.01
+        self.pesos_municipios = pesos / pesos.sum()
+        self.vocab_sintomas = vocabulario(rng, FRAGMENTOS_SINTOMAS)
+        self.vocab_condicoes = vocabulario(rng, FRAGMENTOS_CONDICOES)
+        self.datas = TabelaDatas(DATA_INICIAL, DIAS)
+        self.inicio_vacinacao = (pd.Timestamp(INICIO_VACINACAO) - self.datas.inicio).days
+
+    def _estado(self, rng, ufs):
+        # Nome da UF em grafias diferentes, sigla ou vazio; o código IBGE às vezes vem como float, vazio ou lixo
+        n = len(ufs)
+        nomes = np.array([UFS_IBGE[u][1] for u in ufs], dtype=object)
+        grafia = rng.integers(4, size=n)
+        nome = np.where(grafia == 0, np.char.title(nomes.astype(str)).astype(object),
+                        np.where(grafia == 1, np.array([UFS_IBGE[u][0] for u in ufs], dtype=object), nomes))
+        codigo = ufs.astype(str).astype(object)
+        sorteio = rng.random(n)
+        codigo[sorteio < 0.10] = [f"{u}.0" for u in ufs[sorteio < 0.10]]
+        codigo[(sorteio >= 0.10) & (sorteio < 0.25)] = ""
+        codigo[(sorteio >= 0.25) & (sorteio < 0.26)] = "XX"
+        return nome, codigo
+
+    def _codigo_municipio(self, rng, codigos):
+        texto = codigos.astype(str).astype(object)
+        sorteio = rng.random(len(codigos))
+        texto[sorteio < 0.02] = ""
+        texto[(sorteio >= 0.02) & (sorteio < 0.03)] = "9999999"  # código que não existe no IBGE
+        texto[(sorteio >= 0.03) & (sorteio < 0.05)] = [f"{c}.0" for c in codigos[(sorteio >= 0.03) & (sorteio < 0.05)]]
+        return texto
+
+    def bloco(self, inicio, n):
+        """Linhas [inicio, inicio + n) da exportação; a mesma semente e os mesmos blocos dão sempre o mesmo conteúdo."""
+        rng = np.random.default_rng([self.semente, inicio])
+        df = {c: np.full(n, "", dtype=object) for c in self.colunas}
+
+        i_mun = rng.choice(len(self.municipios), size=n, p=self.pesos_municipios)
+        codigos = self.municipios[i_mun]
+        ufs = codigos // 100_000
+        df['estadoNotificacao'], df['estadoNotificacaoIBGE'] = self._estado(rng, ufs)
+        df['municipioNotificacao'] = self.nomes_municipios[i_mun]
+        df['municipioNotificacaoIBGE'] = self._codigo_municipio(rng, codigos)
+        # Residência: quase sempre o município da notificação
+        mudou = rng.random(n) < 0.15
+        i_res = np.where(mudou, rng.choice(len(self.municipios), size=n, p=self.pesos_municipios), i_mun)
+        df['municipio'], df['municipioIBGE'] = self.nomes_municipios[i_res], self._codigo_municipio(rng, self.municipios[i_res])
+        df['estado'] = np.array([UFS_IBGE[u][1] for u in self.municipios[i_res] // 100_000], dtype=object)
+        df['estadoIBGE'] = (self.municipios[i_res] // 100_000).astype(str).astype(object)
+
+        # Ondas de casos: mais notificações em alguns trechos do período
+        dias = np.clip((rng.beta(2, 2, size=n) * 0.7 + rng.random(n) * 0.3) * DIAS, 0, DIAS - 1).astype(int)
+        df['dataNotificacao'] = self.datas.formatar(rng, dias)
+        df['dataInicioSintomas'] = self.datas.formatar(rng, dias - rng.integers(0, 15, size=n))
+        df['dataEncerramento'] = self.datas.formatar(rng, dias + rng.integers(5, 30, size=n), rng.random(n) < 0.6)
+
+        df['sintomas'] = texto_livre(rng, n, self.vocab_sintomas, 0.05)
+        df['outrosSintomas'] = texto_livre(rng, n, self.vocab_sintomas, 0.75, 0.3)
+        df['condicoes'] = texto_livre(rng, n, self.vocab_condicoes, 0.6)
+        df['outrasCondicoes'] = texto_livre(rng, n, self.vocab_condicoes, 0.9, 0.3)
+
+        idades = np.clip(rng.normal(40, 18, size=n), 0, 105).astype(int).astype(str).astype(object)
+        sorteio = rng.random(n)
+        idades[sorteio < 0.05] = [f"{x}.0" for x in idades[sorteio < 0.05]]
+        idades[(sorteio >= 0.05) & (sorteio < 0.06)] = sortear(rng, int(((sorteio >= 0.05) & (sorteio < 0.06)).sum()), ["-3", "150", "999"])
+        idades[(sorteio >= 0.06) & (sorteio < 0.08)] = ""
+        df['idade'] = idades
+        df['sexo'], df['racaCor'], df['cbo'] = sortear(rng, n, SEXOS), sortear(rng, n, RACAS), sortear(rng, n, CBOS)
+        df['profissionalSaude'] = sortear(rng, n, {"Não": 0.9, "Sim": 0.07, "": 0.03})
+        df['profissionalSeguranca'] = sortear(rng, n, {"Não": 0.95, "Sim": 0.02, "": 0.03})
+        df['codigoContemComunidadeTradicional'] = sortear(rng, n, {"0": 0.8, "1": 0.02, "": 0.18})
+        df['classificacaoFinal'], df['evolucaoCaso'] = sortear(rng, n, CLASSIFICACOES), sortear(rng, n, EVOLUCOES)
+        df['origem'] = sortear(rng, n, ["1", "2"])
+        for coluna in ['codigoEstrategiaCovid', 'codigoBuscaAtivaAssintomatico', 'codigoTriagemPopulacaoEspecifica',
+                       'codigoLocalRealizacaoTestagem']:
+            df[coluna] = sortear(rng, n, {"1": 0.4, "2": 0.2, "3": 0.1, "": 0.3})
+        df['source_id'] = np.array([f"sint{self.semente}-{i:010d}" for i in range(inicio, inicio + n)], dtype=object)
+        sorteio = rng.random(n)
+        df['source_id'][sorteio < 0.005] = ""
+        repetidos = np.flatnonzero((sorteio >= 0.005) & (sorteio < 0.01))  # reenvio: mesma notificação duas vezes
+        df['source_id'][repetidos] = df['source_id'][np.maximum(repetidos - 1, 0)]
+        df['excluido'] = sortear(rng, n, {"False": 0.97, "True": 0.02, "": 0.01})
+        df['validado'] = sortear(rng, n, {"True": 0.6, "False": 0.4})
+
+        # Vacinas: zero, uma ou duas doses (grupo Primeira/Segunda)
+        doses = rng.choice(3, size=n, p=[0.3, 0.2, 0.5])
+        df['codigoRecebeuVacina'] = np.where(doses > 0, "1", sortear(rng, n, ["2", ""])).astype(object)
+        df['codigoDosesVacina'] = np.where(doses > 0, doses.astype(str), "").astype(object)
+        primeira = self.inicio_vacinacao + rng.integers(0, DIAS_VACINACAO, size=n)
+        for posicao, dia, tem in [('Primeira', primeira, doses >= 1), ('Segunda', primeira + rng.integers(21, 90, size=n), doses >= 2)]:
+            df[f'data{posicao}Dose'] = self.datas.formatar(rng, dia, tem)
+            df[f'codigoLaboratorio{posicao}Dose'] = np.where(tem, sortear(rng, n, LABORATORIOS), "").astype(object)
+            df[f'lote{posicao}Dose'] = np.where(tem, [f"L{x}" for x in rng.integers(1000, 99999, size=n)], "").astype(object)
+
+        # Testes: grupos repetidos 1..4, cada um só existe se o anterior existe
+        tem = np.ones(n, dtype=bool)
+        total = np.zeros(n, dtype=int)
+        for k, probabilidade in enumerate(PROBABILIDADE_TESTE, start=1):
+            tem &= rng.random(n) < probabilidade
+            total += tem
+            for padrao, opcoes in TESTES.items():
+                df[padrao.format(k)] = np.where(tem, sortear(rng, n, opcoes), "").astype(object)
+            df[f'dataColetaTeste{k}'] = self.datas.formatar(rng, dias + rng.integers(0, 10, size=n), tem)
+        df['totalTestesRealizados'] = np.where(rng.random(n) < 0.1, "", total.astype(str)).astype(object)
+        return pd.DataFrame(df, columns=self.colunas)
+
+def _csv_do_bloco(gerador, intervalo):
+    # O writer do Arrow (C++) é umas 3x mais rápido que o to_csv; célula vazia sai como campo vazio, texto entre aspas
+    inicio, n = intervalo
+    df = gerador.bloco(inicio, n)
+    tabela = pa.table({c: pa.array(np.where(df[c].to_numpy() == "", None, df[c].to_numpy()), type=pa.string()) for c in df.columns})
+    saida = io.BytesIO()
+    pa_csv.write_csv(tabela, saida, pa_csv.WriteOptions(include_header=False))
+    return saida.getvalue()
+
+def gerar_csv(saida, linhas, semente=SEMENTE, arquivos=1, linhas_por_bloco=LINHAS_POR_BLOCO, ufs=None, processos=PROCESSOS):
+    """Grava `linhas` linhas em um CSV (arquivos=1) ou em `arquivos` partes numa pasta; devolve os caminhos.
+
+    Os blocos são gerados em `processos` processos e gravados na ordem: o conteúdo não depende do paralelismo.
+    """
+    gerador = GeradorDataSUS(semente, ufs)
+    if arquivos > 1:
+        os.makedirs(saida, exist_ok=True)
+        caminhos = [os.path.join(saida, f"parte{i:03d}.csv") for i in range(arquivos)]
+    else:
+        os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+        caminhos = [saida]
+    limites = np.linspace(0, linhas, len(caminhos) + 1).astype(int)
+    inicio = time.perf_counter()
+    gerar = partial(_csv_do_bloco, gerador)
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for caminho, de, ate in zip(caminhos, limites[:-1], limites[1:]):
+            intervalos = [(b, min(linhas_por_bloco, ate - b)) for b in range(de, ate, linhas_por_bloco)]
+            blocos = map(gerar, intervalos) if processos <= 1 else mapear_em_ordem(pool, gerar, intervalos, processos + 1)
+            with open(caminho + ".tmp", "wb") as f:
+                f.write((",".join(gerador.colunas) + "\n").encode("utf-8"))
+                for conteudo in blocos: f.write(conteudo)
+            os.replace(caminho + ".tmp", caminho)
+    duracao = time.perf_counter() - inicio
+    print(f"  [TEMPO] {linhas:,} linhas sintéticas em {len(caminhos)} arquivo(s): {duracao:.1f}s ({linhas / duracao:,.0f} linhas/s)")
+    return caminhos
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera exportações sintéticas no formato do DataSUS")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--saida", default="DataSUS_sintetico.csv", help="CSV (ou pasta, com --arquivos > 1)")
+    parser.add_argument("--arquivos", type=int, default=1, help="divide as linhas em N CSVs numa pasta (uma exportação por parte)")
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    parser.add_argument("--ufs", type=int, nargs="*", help="códigos IBGE das UFs (padrão: todas)")
+    parser.add_argument("--linhas-por-bloco", type=int, default=LINHAS_POR_BLOCO)
+    parser.add_argument("--processos", type=int, default=PROCESSOS)
+    args = parser.parse_args()
+    caminhos = gerar_csv(args.saida, args.linhas, args.semente, args.arquivos, args.linhas_por_bloco, args.ufs, args.processos)
+    print(f"[OK] Gravado em {args.saida if args.arquivos > 1 else caminhos[0]}")
+
+if __name__ == "__main__":
+    main()
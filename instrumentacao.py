@@ -0,0 +1,109 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # só existe em Unix; sem ele o pico de RSS fica de fora
+except ImportError:
+    resource = None
+
+LINHAS_PERFIL = 40
+
+def pico_rss_mb(filhos=False):
+    # filhos=True: o maior pico entre os processos filhos já encerrados (ex.: os do pool de limpeza)
+    if resource is None: return None
+    quem = resource.RUSAGE_CHILDREN if filhos else resource.RUSAGE_SELF
+    return resource.getrusage(quem).ru_maxrss / 1024  # ru_maxrss vem em KB no Linux
+
+def _somar(a, b):
+    if a is None: return b
+    if b is None: return a
+    return a + b
+
+def _maximo(a, b):
+    if a is None: return b
+    if b is None: return a
+    return max(a, b)
+
+class Instrumentacao:
+    """Tempo de parede, CPU, pico de memória e linhas de entrada/saída por etapa nomeada.
+
+    Etapas com o mesmo nome se acumulam (blocos, arquivos, processos do pool). A CPU é a da thread que rodou a
+    etapa, porque as cargas de tabela rodam em threads. pico_rss_mb é o maior RSS do processo até o fim da etapa;
+    com rastrear_memoria, pico_python_mb é o pico do tracemalloc dentro da etapa (aproximado se houver threads).
+    """
+
+    def __init__(self, rastrear_memoria=False):
+        self.rastrear_memoria = rastrear_memoria
+        self.etapas = {}
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        # O bloco pode preencher medida['linhas_saida'] (e corrigir linhas_entrada) antes de sair
+        medida = {'linhas_entrada': linhas_entrada, 'linhas_saida': None}
+        if self.rastrear_memoria:
+            if not tracemalloc.is_tracing(): tracemalloc.start()
+            tracemalloc.reset_peak()
+        parede, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield medida
+        finally:
+            medida['parede_s'] = time.perf_counter() - parede
+            medida['cpu_s'] = time.thread_time() - cpu
+            medida['pico_rss_mb'] = pico_rss_mb()
+            medida['pico_python_mb'] = tracemalloc.get_traced_memory()[1] / 2**20 if self.rastrear_memoria else None
+            medida['chamadas'] = 1
+            self.juntar({nome: medida})
+
+    def juntar(self, etapas):
+        # etapas: dicionário nome -> medidas, como o de outra Instrumentacao (ex.: devolvido por um processo do pool)
+        with self._trava:
+            for nome, m in etapas.items():
+                atual = self.etapas.setdefault(nome, {'chamadas': 0, 'parede_s': 0.0, 'cpu_s': 0.0, 'pico_rss_mb': None,
+                                                      'pico_python_mb': None, 'linhas_entrada': None, 'linhas_saida': None})
+                atual['chamadas'] += m['chamadas']
+                atual['parede_s'] += m['parede_s']
+                atual['cpu_s'] += m['cpu_s']
+                atual['pico_rss_mb'] = _maximo(atual['pico_rss_mb'], m['pico_rss_mb'])
+                atual['pico_python_mb'] = _maximo(atual['pico_python_mb'], m['pico_python_mb'])
+                atual['linhas_entrada'] = _somar(atual['linhas_entrada'], m['linhas_entrada'])
+                atual['linhas_saida'] = _somar(atual['linhas_saida'], m['linhas_saida'])
+
+    def ordenadas(self):
+        return sorted(self.etapas.items(), key=lambda x: -x[1]['parede_s'])
+
+    def tabela_texto(self):
+        def numero(v, fmt): return "-" if v is None else format(v, fmt)
+        linhas = [f"{'ETAPA':<32} {'CHAMADAS':>8} {'PAREDE s':>9} {'CPU s':>8} {'RSS MB':>8} {'PY MB':>8} {'ENTRADA':>11} {'SAÍDA':>11}"]
+        for nome, m in self.ordenadas():
+            linhas.append(f"{nome:<32} {m['chamadas']:>8} {m['parede_s']:>9.2f} {m['cpu_s']:>8.2f} "
+                          f"{numero(m['pico_rss_mb'], '.0f'):>8} {numero(m['pico_python_mb'], '.1f'):>8} "
+                          f"{numero(m['linhas_entrada'], ','):>11} {numero(m['linhas_saida'], ','):>11}")
+        return "\n".join(linhas)
+
+@contextmanager
+def perfilar(caminho_base, rastrear_memoria=False):
+    """cProfile do processo principal em <caminho_base>.prof (+ resumo .txt); com rastrear_memoria, as linhas que
+    ainda seguram mais memória no fim da execução em <caminho_base>_memoria.txt."""
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        if rastrear_memoria and tracemalloc.is_tracing():
+            # As alocações do próprio profiler não interessam
+            filtros = [tracemalloc.Filter(False, m.__file__) for m in (cProfile, pstats, tracemalloc)]
+            estatisticas = tracemalloc.take_snapshot().filter_traces(filtros).statistics("lineno")[:LINHAS_PERFIL]
+            with open(caminho_base + "_memoria.txt", "w", encoding="utf-8") as f:
+                for estatistica in estatisticas: f.write(f"{estatistica}\n")
+        perfil.dump_stats(caminho_base + ".prof")
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+        with open(caminho_base + ".txt", "w", encoding="utf-8") as f: f.write(saida.getvalue())
+        print(f"  [OK] Perfil salvo em {caminho_base}.prof / .txt")
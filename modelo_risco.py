@@ -0,0 +1,190 @@
+import argparse
+import datetime
+import glob
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sqlalchemy import create_engine
+
+from consultas import SQL_STATUS, classificar_status, mapear_categorias, versao_do_banco, versao_do_estagio
+from estagio import ler_tabela
+
+# MODELO DE RISCO: treinado fora do painel (depois do ETL) e salvo como artefato versionado; o app só carrega e prediz
+PASTA_MODELOS = "modelos"
+PREFIXO_ARTEFATO = "modelo_risco_"
+N_ARVORES = 200
+PROFUNDIDADE_MAXIMA = 12
+N_JOBS = -1  # todas as CPUs no treino
+AMOSTRA_MAXIMA_POR_CLASSE = 500_000
+FRACAO_TESTE = 0.2
+SEMENTE = 42
+SEPARADOR_LISTA = ";"  # sintomas/condições no CSV de pontuação em lote: "Febre;Tosse"
+
+SQL_CASOS = f"""
+    SELECT n.notificacao_id, COALESCE(dd.idade, 0) AS idade, COALESCE(dd.sexo, 'Indefinido') AS sexo,
+           COALESCE(v.doses, 0) AS doses, {SQL_STATUS} AS status
+    FROM notificacao n
+    LEFT JOIN dados_clinicos dc ON n.notificacao_id = dc.notificacao_id
+    LEFT JOIN status_classificacao sc ON dc.classificacao_final = sc.classificacao_final
+    LEFT JOIN dados_demograficos dd ON n.notificacao_id = dd.notificacao_id
+    LEFT JOIN (SELECT notificacao_id, MAX(dose_numero) AS doses FROM vacina_aplicada GROUP BY notificacao_id) v
+           ON n.notificacao_id = v.notificacao_id
+    WHERE {SQL_STATUS} IN ('Confirmado', 'Descartado')
+"""
+SQL_SINTOMAS = "SELECT ns.notificacao_id, s.nome FROM notificacao_sintoma ns JOIN sintoma s ON ns.sintoma_id = s.sintoma_id"
+SQL_CONDICOES = "SELECT nc.notificacao_id, c.nome FROM notificacao_condicao nc JOIN condicao c ON nc.condicao_id = c.condicao_id"
+
+def ler_base_banco(engine):
+    with engine.connect() as conn:
+        casos = pd.read_sql(SQL_CASOS, conn)
+        sintomas = pd.read_sql(SQL_SINTOMAS, conn)
+        condicoes = pd.read_sql(SQL_CONDICOES, conn)
+    return casos, sintomas, condicoes, versao_do_banco(engine)
+
+def ler_base_estagio(pasta):
+    casos = ler_tabela(pasta, 'dados_demograficos', ['notificacao_id', 'idade', 'sexo'])
+    dc = ler_tabela(pasta, 'dados_clinicos', ['notificacao_id', 'classificacao_final'])
+    v = ler_tabela(pasta, 'vacina_aplicada', ['notificacao_id', 'dose_numero'])
+    casos = ler_tabela(pasta, 'notificacao', ['notificacao_id']).merge(casos, on='notificacao_id', how='left')
+    casos = casos.merge(dc, on='notificacao_id', how='left')
+    if v is not None:
+        v = v.groupby('notificacao_id', as_index=False)['dose_numero'].max().rename(columns={'dose_numero': 'doses'})
+        casos = casos.merge(v, on='notificacao_id', how='left')
+    else: casos['doses'] = 0
+    casos['status'] = np.asarray(mapear_categorias(casos['classificacao_final'], classificar_status), dtype=object)
+    casos = casos[casos['status'].isin(['Confirmado', 'Descartado'])]
+    casos = casos.assign(idade=pd.to_numeric(casos['idade'], errors='coerce').fillna(0),
+                         sexo=casos['sexo'].fillna('Indefinido'), doses=casos['doses'].fillna(0))
+
+    pares = []
+    for ponte, dimensao, chave in [('notificacao_sintoma', 'sintoma', 'sintoma_id'), ('notificacao_condicao', 'condicao', 'condicao_id')]:
+        p, d = ler_tabela(pasta, ponte), ler_tabela(pasta, dimensao)
+        if p is None or d is None: p = pd.DataFrame({'notificacao_id': [], 'nome': []})
+        else: p = p.merge(d, on=chave)[['notificacao_id', 'nome']]
+        pares.append(p)
+    return casos.drop(columns=['classificacao_final']), pares[0], pares[1], versao_do_estagio(pasta)
+
+def _marcar(matriz, posicoes, colunas, nomes, offset):
+    # Uma coluna 0/1 por nome conhecido; nomes fora do vocabulário do modelo são ignorados
+    indice = pd.Index(colunas)
+    j = indice.get_indexer(nomes)
+    ok = (posicoes >= 0) & (j >= 0)
+    matriz[posicoes[ok], offset + j[ok]] = 1
+
+def montar_features(casos, sintomas, condicoes, vocabulario):
+    """Matriz de features (idade, doses, sexo, sintomas e condições one-hot) na ordem fixa do vocabulário."""
+    nomes_colunas = ['idade', 'doses'] + [f"sexo_{s}" for s in vocabulario['sexos']] \
+        + [f"sintoma_{s}" for s in vocabulario['sintomas']] + [f"condicao_{c}" for c in vocabulario['condicoes']]
+    matriz = np.zeros((len(casos), len(nomes_colunas)), dtype=np.float32)
+    matriz[:, 0] = casos['idade'].to_numpy(dtype=np.float32)
+    matriz[:, 1] = casos['doses'].to_numpy(dtype=np.float32)
+
+    linhas = pd.Index(casos['notificacao_id'])
+    offset = 2
+    _marcar(matriz, np.arange(len(casos)), vocabulario['sexos'], casos['sexo'].astype(str).to_numpy(), offset)
+    offset += len(vocabulario['sexos'])
+    _marcar(matriz, linhas.get_indexer(sintomas['notificacao_id']), vocabulario['sintomas'], sintomas['nome'].to_numpy(), offset)
+    offset += len(vocabulario['sintomas'])
+    _marcar(matriz, linhas.get_indexer(condicoes['notificacao_id']), vocabulario['condicoes'], condicoes['nome'].to_numpy(), offset)
+    return pd.DataFrame(matriz, columns=nomes_colunas)
+
+def balancear(casos, maximo_por_classe):
+    n = min(casos['status'].value_counts().min(), maximo_por_classe)
+    return pd.concat([g.sample(n, random_state=SEMENTE) for _, g in casos.groupby('status')], ignore_index=True)
+
+def treinar(casos, sintomas, condicoes, versao_dados, n_arvores=N_ARVORES, n_jobs=N_JOBS):
+    casos = balancear(casos, AMOSTRA_MAXIMA_POR_CLASSE)
+    vocabulario = {
+        'sexos': sorted(casos['sexo'].astype(str).unique()),
+        'sintomas': sorted(sintomas['nome'].dropna().unique()),
+        'condicoes': sorted(condicoes['nome'].dropna().unique()),
+    }
+    X = montar_features(casos, sintomas, condicoes, vocabulario)
+    y = (casos['status'] == 'Confirmado').astype(int).to_numpy()
+    X_treino, X_teste, y_treino, y_teste = train_test_split(X, y, test_size=FRACAO_TESTE, stratify=y, random_state=SEMENTE)
+
+    modelo = RandomForestClassifier(n_estimators=n_arvores, max_depth=PROFUNDIDADE_MAXIMA, n_jobs=n_jobs, random_state=SEMENTE)
+    modelo.fit(X_treino, y_treino)
+    probabilidades = modelo.predict_proba(X_teste)[:, 1]
+    return {
+        'modelo': modelo,
+        'vocabulario': vocabulario,
+        'colunas': list(X.columns),
+        'versao_dados': versao_dados,
+        'treinado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        'n_treino': len(X_treino),
+        'metricas': {'acuracia': accuracy_score(y_teste, probabilidades > 0.5), 'auc': roc_auc_score(y_teste, probabilidades)},
+    }
+
+def salvar_artefato(artefato, pasta=PASTA_MODELOS):
+    os.makedirs(pasta, exist_ok=True)
+    carimbo = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    caminho = os.path.join(pasta, f"{PREFIXO_ARTEFATO}{carimbo}.joblib")
+    joblib.dump(artefato, caminho + ".tmp")
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+def ultimo_artefato(pasta=PASTA_MODELOS):
+    # O carimbo no nome ordena as versões: a última é a que o painel serve
+    arquivos = sorted(glob.glob(os.path.join(pasta, f"{PREFIXO_ARTEFATO}*.joblib")))
+    return arquivos[-1] if arquivos else None
+
+def carregar_artefato(caminho):
+    artefato = joblib.load(caminho)
+    artefato['modelo'].n_jobs = 1  # predições pequenas: paralelizar só adiciona latência
+    return artefato
+
+def _explodir_lista(df, coluna):
+    pares = df[['notificacao_id', coluna]].dropna()
+    pares = pares.assign(nome=pares[coluna].astype(str).str.split(SEPARADOR_LISTA)).explode('nome')
+    return pares.assign(nome=pares['nome'].str.strip())[['notificacao_id', 'nome']]
+
+def pontuar(artefato, df):
+    """Probabilidade de 'Confirmado' por linha de df (colunas idade, sexo, doses, sintomas, condicoes; faltantes = 0/vazio)."""
+    casos = pd.DataFrame({
+        'notificacao_id': np.arange(len(df)),
+        'idade': pd.to_numeric(df.get('idade', 0), errors='coerce'),
+        'sexo': df.get('sexo', 'Indefinido'),
+        'doses': pd.to_numeric(df.get('doses', 0), errors='coerce'),
+        'sintomas': df.get('sintomas'),
+        'condicoes': df.get('condicoes'),
+    }).fillna({'idade': 0, 'doses': 0, 'sexo': 'Indefinido'})
+    X = montar_features(casos, _explodir_lista(casos, 'sintomas'), _explodir_lista(casos, 'condicoes'), artefato['vocabulario'])
+    return artefato['modelo'].predict_proba(X)[:, 1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o modelo de risco do painel e salva o artefato versionado")
+    parser.add_argument("--estagio", help="lê o estágio Parquet nesta pasta em vez do banco")
+    parser.add_argument("--arvores", type=int, default=N_ARVORES)
+    parser.add_argument("--jobs", type=int, default=N_JOBS, help="processos no treino (-1 = todas as CPUs)")
+    parser.add_argument("--pasta", default=PASTA_MODELOS)
+    args = parser.parse_args()
+
+    inicio = time.time()
+    if args.estagio:
+        casos, sintomas, condicoes, versao = ler_base_estagio(args.estagio)
+    else:
+        from etl_datasus import CONN_STRING
+        casos, sintomas, condicoes, versao = ler_base_banco(create_engine(CONN_STRING))
+    print(f"[OK] {len(casos):,} casos Confirmado/Descartado lidos ({versao}) em {time.time() - inicio:.1f}s")
+
+    if casos['status'].nunique() < 2:
+        print("[ERRO] É preciso haver casos confirmados e descartados para treinar.")
+        return
+
+    inicio = time.time()
+    artefato = treinar(casos, sintomas, condicoes, versao, args.arvores, args.jobs)
+    caminho = salvar_artefato(artefato, args.pasta)
+    metricas = artefato['metricas']
+    print(f"[TEMPO] Treino: {time.time() - inicio:.1f}s ({artefato['n_treino']:,} linhas, {len(artefato['colunas'])} features)")
+    print(f"[OK] Acurácia {metricas['acuracia']:.3f} | AUC {metricas['auc']:.3f} (teste balanceado)")
+    print(f"[OK] Artefato salvo em {caminho}")
+
+if __name__ == "__main__":
+    main()